@@ -0,0 +1,208 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Time each rule of the L10N and I18N renderers on fixture documents stressing one construct each.
+
+For each rule, `tokens/s` is the number of tokens the rule handled per second spent in the rule,
+and `bytes/s` is the size of the fixture per second spent in the rule. Times of rules are inclusive.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_renderers [--size N] [--repeat R] [--fixture NAME]
+                                         [--save PATH] [--baseline PATH]
+
+Results saved with `--save` can be passed as `--baseline` to a later run to compare with.
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from markdown_it import MarkdownIt
+
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.extraction.e_domain import HugoDomainE
+from hugo_gettext.extraction.index import Extraction
+from hugo_gettext.extraction.renderer_hugo_i18n import RendererHugoI18N
+from hugo_gettext.generation.g_domain import HugoDomainG
+from hugo_gettext.generation.g_lang import HugoLangG
+from hugo_gettext.generation.index import Generation
+from hugo_gettext.generation.renderer_hugo_l10n import RendererHugoL10N
+from hugo_gettext.utils import MemorySiteFiles
+
+HUGO_CONFIG = {
+    'markup': {'goldmark': {'parser': {'attribute': {'block': True, 'title': True}}}},
+    'i18n': {
+        'package': 'bench',
+        'shortcodes': {'params': {'alert': ['text'], '*': ['title']}}
+    }
+}
+FRONT_MATTER = '---\ntitle: Benchmark page\ndescription: A page stressing one construct\n---\n\n'
+
+
+def make_deep_lists(size: int) -> str:
+    lines = []
+    for i in range(size):
+        for depth in range(8):
+            lines.append(f'{"  " * depth}- Item {i}.{depth} with *emphasis* and a [link](/page/{i})')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def make_large_tables(size: int) -> str:
+    columns = 6
+    lines = ['| ' + ' | '.join(f'Header {c}' for c in range(columns)) + ' |',
+             '|' + '---|' * columns]
+    for i in range(size * 8):
+        lines.append('| ' + ' | '.join(f'Cell {i}.{c} with `code`' for c in range(columns)) + ' |')
+    return '\n'.join(lines) + '\n'
+
+
+def make_shortcodes(size: int) -> str:
+    blocks = []
+    for i in range(size * 4):
+        blocks.append(f'{{{{< alert title="Note {i}" text="Some **text** number {i}" color="info" >}}}}')
+        blocks.append(f'A paragraph with an inline {{{{< icon name="star" title="Star {i}" >}}}} shortcode.')
+        blocks.append(f'{{{{% notice title="Notice {i}" %}}}}\nNotice body {i}.\n{{{{% /notice %}}}}')
+    return '\n\n'.join(blocks) + '\n'
+
+
+def make_attributes(size: int) -> str:
+    blocks = []
+    for i in range(size * 4):
+        blocks.append(f'## Heading {i} {{#heading-{i} .section}}')
+        blocks.append(f'Paragraph {i} with some _text_.\n{{.note data-index="{i}"}}')
+        blocks.append(f'> Quote {i}\n{{.quote}}')
+    return '\n\n'.join(blocks) + '\n'
+
+
+def make_definition_lists(size: int) -> str:
+    blocks = []
+    for i in range(size * 4):
+        blocks.append(f'Term {i}\n: Definition {i} with *emphasis*\n: Another definition of term {i}')
+    return '\n\n'.join(blocks) + '\n'
+
+
+FIXTURES: Dict[str, Callable[[int], str]] = {
+    'deep-lists': make_deep_lists,
+    'large-tables': make_large_tables,
+    'shortcodes': make_shortcodes,
+    'attributes': make_attributes,
+    'definition-lists': make_definition_lists,
+}
+
+
+class RuleTimer:
+    """Replaces the rules of a renderer with wrappers counting calls and accumulating time
+    """
+    def __init__(self, mdi: MarkdownIt):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+        rules = mdi.renderer.rules
+        for name, rule in rules.items():
+            rules[name] = self._wrap(name, rule)
+
+    def _wrap(self, name: str, rule: Callable) -> Callable:
+        def timed_rule(*args):
+            start = time.perf_counter()
+            r = rule(*args)
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+            return r
+        return timed_rule
+
+    def reset(self):
+        self.calls.clear()
+        self.seconds.clear()
+
+
+def _l10n_env(hg_config: Config, mdi: MarkdownIt) -> Dict:
+    g = Generation({}, hg_config, mdi, MemorySiteFiles({}))
+    lang_g = HugoLangG(g, 'de')
+    # a new object for every message, so that all messages are considered translated
+    lang_g.default_domain_g = HugoDomainG(lang_g, str.upper)
+    return {'parse_fence': hg_config.parse_fence, 'domain_generation': HugoDomainG(lang_g, str.upper)}
+
+
+def _i18n_env(hg_config: Config, mdi: MarkdownIt) -> Dict:
+    e = Extraction(hg_config, mdi, MemorySiteFiles({}))
+    return {'path': 'bench.md', 'parse_fence': hg_config.parse_fence,
+            'domain_extraction': HugoDomainE(e), 'with_line': True}
+
+
+def run(size: int, repeat: int, fixture_names: List[str]) -> Dict:
+    """
+    :return: a dict with fixture names, then renderer names, then rule names as keys,
+    and dicts of `calls`, `seconds`, `tokens_per_s` and `bytes_per_s` as values
+    """
+    hg_config = Config(HUGO_CONFIG, paths=[])
+    results = {}
+    for fixture_name in fixture_names:
+        text = FRONT_MATTER + FIXTURES[fixture_name](size)
+        n_bytes = len(text.encode())
+        results[fixture_name] = {}
+        for renderer_name, renderer_cls, make_env in (('l10n', RendererHugoL10N, _l10n_env),
+                                                      ('i18n', RendererHugoI18N, _i18n_env)):
+            mdi = make_mdi(renderer_cls, hg_config)
+            timer = RuleTimer(mdi)
+            tokens = mdi.parse(text, make_env(hg_config, mdi))
+            best: Dict[str, float] = {}
+            calls: Dict[str, int] = {}
+            for _ in range(repeat):
+                env = make_env(hg_config, mdi)
+                timer.reset()
+                mdi.renderer.render(tokens, mdi.options, env)
+                calls = dict(timer.calls)
+                for name, seconds in timer.seconds.items():
+                    best[name] = min(best.get(name, seconds), seconds)
+            results[fixture_name][renderer_name] = {
+                name: {
+                    'calls': calls[name],
+                    'seconds': best[name],
+                    'tokens_per_s': calls[name] / best[name] if best[name] else 0.0,
+                    'bytes_per_s': n_bytes / best[name] if best[name] else 0.0,
+                } for name in sorted(best, key=best.get, reverse=True)
+            }
+    return results
+
+
+def report(results: Dict, baseline: Dict):
+    for fixture_name, renderers in results.items():
+        for renderer_name, rules in renderers.items():
+            print(f'\n{fixture_name} / {renderer_name}')
+            print(f'  {"rule":<20} {"calls":>8} {"ms":>9} {"tokens/s":>12} {"MiB/s":>9}'
+                  + (f' {"vs baseline":>12}' if baseline else ''))
+            for name, r in rules.items():
+                line = (f'  {name:<20} {r["calls"]:>8} {r["seconds"] * 1000:>9.2f} '
+                        f'{r["tokens_per_s"]:>12,.0f} {r["bytes_per_s"] / 1024 / 1024:>9.2f}')
+                base = baseline.get(fixture_name, {}).get(renderer_name, {}).get(name)
+                if base and base['bytes_per_s']:
+                    line += f' {r["bytes_per_s"] / base["bytes_per_s"]:>11.2f}x'
+                print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=500, help='scale of the fixture documents')
+    parser.add_argument('--repeat', type=int, default=3, help='number of renders to time for each fixture')
+    parser.add_argument('--fixture', action='append', choices=sorted(FIXTURES),
+                        help='fixture to run, can be repeated. All fixtures by default')
+    parser.add_argument('--save', help='path of a JSON file to save the results to')
+    parser.add_argument('--baseline', help='path of a JSON file saved by a previous run to compare with')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = run(args.size, args.repeat, args.fixture or list(FIXTURES))
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
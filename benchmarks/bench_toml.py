@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Compare read-only and round-trip loading of large TOML data files.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_toml [--entries N] [--repeat R]
+"""
+
+import argparse
+import timeit
+
+import tomlkit
+
+from hugo_gettext.utils import TextFormat
+
+
+def make_toml(entries: int) -> str:
+    """Make a TOML data file similar to a site's data file, e.g. a list of people with nested info
+    :param entries: number of array-of-tables entries
+    :return: the TOML text
+    """
+    doc = tomlkit.document()
+    people = tomlkit.aot()
+    for i in range(entries):
+        person = tomlkit.table()
+        person['name'] = f'Person {i}'
+        person['bio'] = f'Person number {i} works on *many* things, see [the page](/people/{i}).'
+        person['tags'] = ['translation', 'documentation', f'team-{i % 10}']
+        person['social'] = {'website': f'https://example.org/{i}', 'weight': i}
+        people.append(person)
+    doc['people'] = people
+    return tomlkit.dumps(doc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=5000, help='number of entries in the data file')
+    parser.add_argument('--repeat', type=int, default=3, help='number of loads to time for each parser')
+    args = parser.parse_args()
+
+    content = make_toml(args.entries)
+    size_mb = len(content.encode()) / 1024 / 1024
+    print(f'TOML data file: {args.entries} entries, {size_mb:.2f} MiB')
+
+    timings = {}
+    for name, round_trip in (('read-only', False), ('round-trip', True)):
+        seconds = min(timeit.repeat(lambda: TextFormat.TOML.load_content(content, round_trip),
+                                    number=1, repeat=args.repeat))
+        timings[name] = seconds
+        print(f'{name:>10}: {seconds * 1000:10.1f} ms  {size_mb / seconds:8.2f} MiB/s')
+    print(f'speedup: {timings["round-trip"] / timings["read-only"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""In-memory API: extraction and generation with no filesystem access and no command line arguments"""
+
+import copy
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Union, Optional
+
+from markdown_gettext.domain_extraction import I18NEntry
+from markdown_it import MarkdownIt
+
+from .config import Config, make_mdi
+from .domain_split import ShardMap
+from .extraction.index import Extraction
+from .extraction.renderer_hugo_i18n import RendererHugoI18N
+from .generation.g_catalog import resolve_catalogs
+from .generation.g_selection import Selection
+from .generation.index import Generation
+from .generation.renderer_hugo_l10n import RendererHugoL10N
+from .utils import MemorySiteFiles
+
+# {lang_code: {domain_name: {msgid: msgstr}}}
+Catalogs = Dict[str, Dict[str, Dict[str, str]]]
+
+
+@dataclass
+class GenerationResult:
+    # target files keyed by paths: texts of content files, objects of data and string files
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    # config sections of the languages that are added or changed, keyed by Hugo language codes
+    languages: Dict[str, Dict] = field(default_factory=dict)
+
+
+def _make_config(hugo_config: Union[Config, Dict], sources: Dict[str, str], customs_path: str,
+                 shard_map: Optional[ShardMap]) -> Config:
+    """Make a `Config` whose file lists are resolved against `sources` when `hugo_config` is a dict
+    """
+    if isinstance(hugo_config, Config):
+        return hugo_config
+    return Config(hugo_config, customs_path=customs_path, paths=sources.keys(), shard_map=shard_map)
+
+
+def extract_entries(hugo_config: Union[Config, Dict],
+                    sources: Dict[str, str],
+                    customs_path: str = '',
+                    mdi: Optional[MarkdownIt] = None,
+                    shard_map: Optional[ShardMap] = None) -> Dict[str, List[I18NEntry]]:
+    """Extract messages from in-memory source files
+    :param hugo_config: a `Config`, or the Hugo config as a dict
+    :param sources: texts of source files (content, data, and string files) keyed by paths
+    :param customs_path: path to Python file containing custom functions, used when `hugo_config` is a dict
+    :param mdi: a `MarkdownIt` object made with `RendererHugoI18N` to reuse, one is made if not provided
+    :param shard_map: shard assignments of domains split by number of messages, used when `hugo_config` is a dict.
+    It's updated with the assignments of new units
+    :return: a dict with domain names as keys and lists of entries as values
+    """
+    hg_config = _make_config(hugo_config, sources, customs_path, shard_map)
+    mdi = mdi or make_mdi(RendererHugoI18N, hg_config)
+    extraction = Extraction(hg_config, mdi, MemorySiteFiles(sources))
+    return {domain_name: domain_e.entries for domain_name, domain_e in extraction.i12ize().items()}
+
+
+def generate_outputs(hugo_config: Union[Config, Dict],
+                     sources: Dict[str, str],
+                     catalogs: Catalogs,
+                     customs_path: str = '',
+                     mdi: Optional[MarkdownIt] = None,
+                     selection: Optional[Selection] = None,
+                     shard_map: Optional[ShardMap] = None) -> GenerationResult:
+    """Generate target files from in-memory source files and catalogs
+    :param hugo_config: a `Config`, or the Hugo config as a dict. It isn't modified
+    :param sources: texts of source files (content, data, and string files) keyed by paths
+    :param catalogs: translations of the languages to generate
+    :param customs_path: path to Python file containing custom functions, used when `hugo_config` is a dict
+    :param mdi: a `MarkdownIt` object made with `RendererHugoL10N` to reuse, one is made if not provided
+    :param selection: a `Selection` restricting generation, languages not selected aren't generated
+    :param shard_map: shard assignments of domains split by number of messages, as given by `extract_entries`,
+    used when `hugo_config` is a dict
+    :return: a `GenerationResult`
+    """
+    hg_config = copy.copy(_make_config(hugo_config, sources, customs_path, shard_map))
+    # generation modifies the config's language sections
+    hg_config.hugo_config = copy.deepcopy(hg_config.hugo_config)
+    original_languages = copy.deepcopy(hg_config.hugo_config.get('languages', {}))
+    files = MemorySiteFiles(sources)
+    if hg_config.do_strings and hg_config.string_file_path:
+        src_strings = files.read_obj(hg_config.string_file_path)
+    else:
+        src_strings = {}
+    mdi = mdi or make_mdi(RendererHugoL10N, hg_config)
+
+    g = Generation(src_strings, hg_config, mdi, files, selection=selection)
+    g.catalogs = resolve_catalogs(catalogs)
+    g.generate_langs([lang_code for lang_code in catalogs if g.selection.has_lang(lang_code)])
+
+    languages = {hugo_lang_code: section
+                 for hugo_lang_code, section in hg_config.hugo_config.get('languages', {}).items()
+                 if original_languages.get(hugo_lang_code) != section}
+    return GenerationResult(files.outputs, languages)
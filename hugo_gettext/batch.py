@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Generation of many sites in one process, or in a pool of worker processes,
+reusing `MarkdownIt` objects and catalogs between sites"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from markdown_it import MarkdownIt
+
+from . import utils
+from .config import Config, make_mdi
+from .generation.g_catalog import CatalogCache
+from .generation.index import generate_site
+from .generation.renderer_hugo_l10n import RendererHugoL10N
+from .progress import Progress
+
+# state of a process, reused by all sites generated in the process
+_state: Dict = {}
+
+
+def read_sites(path: str) -> List[str]:
+    """Read a sites file: one site root per line, relative to the file's directory.
+    Blank lines and lines starting with `#` are ignored
+    :param path: path of the sites file
+    :return: absolute paths of the site roots
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.normpath(os.path.join(base_dir, line)) for line in lines if line and not line.startswith('#')]
+
+
+def _markdown_settings(hg_config: Config) -> Tuple:
+    """Settings `make_mdi` depends on. Sites with the same settings share a `MarkdownIt` object
+    """
+    return (hg_config.parse_table, hg_config.parse_definition_list,
+            hg_config.parse_attribute_block, hg_config.parse_attribute_title)
+
+
+def _get_mdi(hg_config: Config) -> MarkdownIt:
+    mdis = _state.setdefault('mdis', {})
+    if (mdi := mdis.get(key := _markdown_settings(hg_config))) is None:
+        mdi = mdis[key] = make_mdi(RendererHugoL10N, hg_config)
+    return mdi
+
+
+def generate_in_site(root: str, keep_locale: bool, progress: Optional[Progress] = None) -> str:
+    """Generate target files of a site, with the `MarkdownIt` objects and catalogs of the process
+    :param root: path of the site's root
+    :param keep_locale: do not delete the site's locale folder
+    :param progress: a `Progress` to emit progress events to
+    :return: `root`
+    """
+    catalog_cache = _state.setdefault('catalogs', CatalogCache())
+    with utils.working_dir(root):
+        hg_config = Config.from_config_file('')
+        generate_site(hg_config, _get_mdi(hg_config), keep_locale, progress=progress, catalog_cache=catalog_cache)
+    return root
+
+
+def batch(args):
+    """Generate target files of many sites, each with its own config file and `locale` folder
+    :param args: arguments passed in command line, containing
+        - sites: path of a file listing the sites' roots, one per line, relative to the file's directory
+        - keep_locale (optional): do not delete locale folders, default False
+        - jobs (optional): number of worker processes, sites are generated one by one in this process by default
+        - progress (optional): a `Progress` to emit progress events to. Sites generated in worker processes
+        only emit the events of the batch
+    :return: None
+    """
+    roots = read_sites(args.sites)
+    progress = getattr(args, 'progress', None) or Progress()
+    with progress.phase('batch', len(roots)):
+        if not args.jobs or args.jobs <= 1:
+            for root in roots:
+                logging.info(root)
+                generate_in_site(root, args.keep_locale, progress)
+                progress.file_processed('batch', root)
+            return
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            for root in executor.map(generate_in_site, roots, [args.keep_locale] * len(roots)):
+                logging.info(root)
+                progress.file_processed('batch', root)
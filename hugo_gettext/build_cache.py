@@ -0,0 +1,161 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Content-addressed cache of extraction entries and rendered outputs, shareable between machines.
+Keys are digests of the tool version, the config fingerprint, and what the cached work depends on,
+e.g. the source text and the language's catalogs, so entries never need to be invalidated.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import urllib.error
+import urllib.request
+from importlib import metadata
+from typing import Any, Optional, Protocol
+
+_DISTRIBUTIONS = ['hugo-gettext', 'mdit-py-i18n', 'markdown-it-py', 'mdit-py-hugo', 'mdit-py-plugins']
+
+
+def _tool_version() -> str:
+    versions = []
+    for distribution in _DISTRIBUTIONS:
+        try:
+            versions.append(f'{distribution}={metadata.version(distribution)}')
+        except metadata.PackageNotFoundError:
+            versions.append(f'{distribution}=?')
+    return ','.join(versions)
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class CacheStore(Protocol):
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def put(self, key: str, data: bytes):
+        ...
+
+
+class LocalStore:
+    """
+    Implements `CacheStore`, with an entry per file in a local directory
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class HTTPStore:
+    """
+    Implements `CacheStore`, with `GET` and `PUT` requests of `{base_url}/{key}`.
+    A failing server only makes entries missing, it doesn't fail the run
+    """
+    def __init__(self, base_url: str, timeout: float = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with urllib.request.urlopen(f'{self.base_url}/{key}', timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                logging.warning(f'Build cache: GET {key} failed with {e.code}')
+            return None
+        except OSError as e:
+            logging.warning(f'Build cache: GET {key} failed: {e}')
+            return None
+
+    def put(self, key: str, data: bytes):
+        request = urllib.request.Request(f'{self.base_url}/{key}', data=data, method='PUT',
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except OSError as e:
+            logging.warning(f'Build cache: PUT {key} failed: {e}')
+
+
+def open_store(location: str) -> CacheStore:
+    """
+    :param location: an `http://` or `https://` URL, or the path of a local directory
+    """
+    if location.startswith(('http://', 'https://')):
+        return HTTPStore(location)
+    return LocalStore(location)
+
+
+def config_fingerprint(hg_config) -> str:
+    """Digest of the parts of the config that extraction and generation depend on:
+    the i18n and markup sections, the default language, and the content of the custom functions file
+    """
+    hugo_config = hg_config.hugo_config
+    relevant = {
+        'i18n': hugo_config.get('i18n', {}),
+        'markup': hugo_config.get('markup', {}),
+        'defaultContentLanguage': hugo_config.get('defaultContentLanguage', 'en'),
+    }
+    if customs_path := getattr(hg_config, 'customs_path', ''):
+        with open(customs_path, 'rb') as f:
+            relevant['customs'] = hashlib.sha256(f.read()).hexdigest()
+    return text_digest(json.dumps(relevant, sort_keys=True, default=str))
+
+
+class BuildCache:
+    """Values are stored as JSON. Lookups are counted as hits and misses
+    """
+    def __init__(self, store: CacheStore, fingerprint: str):
+        """
+        :param store: where entries are stored
+        :param fingerprint: fingerprint of the config, see `config_fingerprint`
+        """
+        self.store = store
+        self.prefix = f'{_tool_version()}\0{fingerprint}'
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts: str) -> str:
+        return text_digest('\0'.join([self.prefix, *parts]))
+
+    def get(self, key: str) -> Optional[Any]:
+        if (data := self.store.get(key)) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(data)
+
+    def put(self, key: str, value):
+        self.store.put(key, json.dumps(value).encode())
+
+
+def open_build_cache(location: Optional[str], hg_config) -> Optional[BuildCache]:
+    """
+    :param location: location of the store, see `open_store`, or `None` for no cache
+    :param hg_config: the config, see `config_fingerprint`
+    """
+    if not location:
+        return None
+    return BuildCache(open_store(location), config_fingerprint(hg_config))
@@ -0,0 +1,155 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Change detection with the local git repository, to limit extraction and generation to what changed since a ref"""
+
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import yaml
+
+from . import utils
+from .config import Config
+
+
+def _git(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(['git', *args], capture_output=True, text=True)
+
+
+def changed_files(since: str) -> Set[str]:
+    """Files changed in the working directory since a git ref, including uncommitted, deleted, and untracked ones
+    :param since: the git ref, e.g. a branch name or a commit
+    :return: paths relative to the working directory
+    """
+    diff = _git('diff', '--name-only', '--relative', since)
+    if diff.returncode != 0:
+        raise ValueError(f'Could not compare with {since}: {diff.stderr.strip()}')
+    untracked = _git('ls-files', '--others', '--exclude-standard')
+    return {os.path.normpath(p) for p in (diff.stdout + untracked.stdout).splitlines() if p}
+
+
+def _config_parts(hugo_config: Dict) -> Dict:
+    """Parts of the Hugo config that extraction and generation depend on,
+    except for the default language's section, which only matters to the config fields
+    """
+    return json.loads(json.dumps({
+        'i18n': hugo_config.get('i18n', {}),
+        'markup': hugo_config.get('markup', {}),
+        'defaultContentLanguage': hugo_config.get('defaultContentLanguage', 'en'),
+    }, default=str))
+
+
+def _old_config(since: str, config_path: str) -> Optional[Dict]:
+    """
+    :return: the config file as of `since`, or `None` if it didn't exist
+    """
+    show = _git('show', f'{since}:./{config_path}')
+    if show.returncode != 0:
+        return None
+    return utils.TextFormat.decide_by_path(config_path).load_content(show.stdout)
+
+
+@dataclass
+class ChangeSet:
+    # everything has to be processed again, e.g. because the i18n config changed
+    everything: bool = False
+    # changed content and data files, and content files whose conditions depend on them
+    paths: Set[str] = field(default_factory=set)
+    # the string file or the config fields of the default language changed
+    others: bool = False
+    # languages whose PO files changed
+    lang_codes: Set[str] = field(default_factory=set)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.everything and not self.paths and not self.others and not self.lang_codes
+
+
+def _condition_items(text: str) -> List[str]:
+    """Items of the conditions in the front matter of a content file, i.e. paths of other content files or 'strings'
+    """
+    if 'i18n_configs' not in text or not text.startswith('---'):
+        return []
+    fm = yaml.safe_load(text.split('---', 2)[1]) or {}
+    conditions = fm.get('i18n_configs', {}).get('conditions', [])
+    return [cond if isinstance(cond, str) else list(cond)[0] for cond in conditions]
+
+
+def detect_changes(hg_config: Config, changed: Set[str], since: str) -> ChangeSet:
+    """Work out what has to be extracted or generated again
+    :param hg_config: the current config
+    :param changed: files changed since `since`, see `changed_files`
+    :param since: the git ref
+    :return: a `ChangeSet`
+    """
+    changes = ChangeSet()
+    default_lang = hg_config.default_lang
+    if hg_config.customs_path and os.path.normpath(hg_config.customs_path) in changed:
+        changes.everything = True
+        return changes
+    if os.path.normpath(hg_config.config_path) in changed:
+        old_config = _old_config(since, hg_config.config_path)
+        if old_config is None or _config_parts(old_config) != _config_parts(hg_config.hugo_config):
+            changes.everything = True
+            return changes
+        old_section = old_config.get('languages', {}).get(default_lang)
+        new_section = hg_config.hugo_config.get('languages', {}).get(default_lang)
+        if json.dumps(old_section, default=str) != json.dumps(new_section, default=str):
+            changes.others = True
+
+    content_paths = {p for domain_paths in hg_config.content.values() for p in domain_paths}
+    data_paths = set(hg_config.data)
+    for path in changed:
+        if path.endswith('.po'):
+            changes.lang_codes.add(os.path.basename(os.path.dirname(path)))
+        elif path in content_paths or path in data_paths:
+            changes.paths.add(path)
+        elif hg_config.string_file_path and path == os.path.normpath(hg_config.string_file_path):
+            changes.others = True
+        elif not os.path.exists(path) and (path.startswith(f'{hg_config.src_dir}/') or path.startswith('data/')):
+            # a removed source file, whose targets have to be removed too
+            changes.everything = True
+            return changes
+
+    if changes.paths & content_paths or changes.others:
+        conditions = {}
+        for path in content_paths - changes.paths:
+            if os.path.isfile(path):
+                with open(path) as f:
+                    if items := _condition_items(f.read()):
+                        conditions[path] = items
+        changes.paths |= condition_dependents(conditions, changes.paths, changes.others)
+    return changes
+
+
+def condition_dependents(conditions: Dict[str, List[str]], paths: Set[str], strings: bool = False) -> Set[str]:
+    """Pages whose conditions depend on changed pages or strings, directly or through other pages
+    :param conditions: items of the conditions of pages, see `_condition_items`
+    :param paths: the changed pages
+    :param strings: whether strings changed
+    :return: paths of the dependent pages
+    """
+    conditions = dict(conditions)
+    changed = set(paths)
+    while dependents := {path for path, items in conditions.items()
+                         if any(item in changed or (item == 'strings' and strings) for item in items)}:
+        changed |= dependents
+        for path in dependents:
+            del conditions[path]
+    return changed - set(paths)
+
+
+def changed_domains(hg_config: Config, changes: ChangeSet) -> Optional[Set[str]]:
+    """
+    :return: the content domains to extract again, as in `Config.content`, or `None` for all domains
+    """
+    if changes.everything:
+        return None
+    domains = {domain for domain, domain_paths in hg_config.content.items() if changes.paths & set(domain_paths)}
+    if changes.others or changes.paths & set(hg_config.data):
+        domains.add('default')
+    return domains
+
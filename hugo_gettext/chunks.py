@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Processing of very large content files in chunks, on worker processes forked for the file.
+
+A file is split at top-level block boundaries, where renderers carry no state from one block to the next, i.e.
+outside lists, block quotes, tables, and definition lists, and only up to the first `hg_stop` shortcode. Workers are
+forked, so they have the tokens, the catalogs, and the caches of the parent process without pickling them, and only
+the results of the chunks are sent back, to be put together in the order of the chunks.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from markdown_it.token import Token
+
+from .utils import HG_STOP
+
+# files with fewer lines are processed in one go, forking wouldn't pay off
+LARGE_FILE_LINES = 10000
+
+# the function processing a chunk, set by `map_chunks` before workers are forked
+_chunk_job: Dict[str, Callable] = {}
+
+
+def _is_stop(token: Token) -> bool:
+    return token.type == 'inline' and len(token.children) == 1 \
+        and (sc := token.children[0]).type == 'shortcode' and sc.meta['name'] == HG_STOP
+
+
+def chunk_bounds(tokens: Sequence[Token], jobs: int, min_lines: int = LARGE_FILE_LINES) -> List[Tuple[int, int]]:
+    """
+    :param tokens: block tokens of a file, without the front matter
+    :param jobs: number of worker processes
+    :param min_lines: minimum number of lines of a file to split it
+    :return: [start, end) bounds of chunks of about the same number of lines, covering the tokens up to the first
+    `hg_stop` shortcode. An empty list if the file isn't split: it's too small, there's only one job,
+    or processes can't be forked on this platform
+    """
+    if jobs < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        return []
+    end = next((i for i, token in enumerate(tokens) if _is_stop(token)), len(tokens))
+    lines = max((token.map[1] for token in tokens[:end] if token.map), default=0)
+    if lines < min_lines:
+        return []
+    boundaries = [i for i in range(1, end) if tokens[i].level == 0 and tokens[i].nesting >= 0 and tokens[i].map]
+    chunk_lines = lines / jobs
+    bounds = []
+    start = 0
+    for i in boundaries:
+        if tokens[i].map[0] >= chunk_lines * (len(bounds) + 1):
+            bounds.append((start, i))
+            start = i
+    bounds.append((start, end))
+    return bounds
+
+
+def _process_chunk(bounds: Tuple[int, int]):
+    return _chunk_job['process'](*bounds)
+
+
+def map_chunks(process: Callable[[int, int], Any], bounds: List[Tuple[int, int]], jobs: int) -> List:
+    """Process chunks on forked worker processes
+    :param process: function processing the tokens in [start, end), its result must be picklable
+    :param bounds: bounds of the chunks, see `chunk_bounds`
+    :param jobs: number of worker processes
+    :return: results of the chunks, in the order of `bounds`
+    """
+    _chunk_job['process'] = process
+    try:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(bounds)),
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            return list(executor.map(_process_chunk, bounds))
+    finally:
+        _chunk_job.clear()
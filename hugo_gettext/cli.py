@@ -4,14 +4,20 @@
 import logging
 from argparse import ArgumentParser, RawTextHelpFormatter
 
+from .batch import batch
 from .extraction import extract
 from .generation import generate
+from .one_pass import extract_generate
 from .compilation import compile_po
+from .pipeline import build
+from .progress import Progress, ProgressDisplay, JSONLinesSink
+from .serving import serve
 
 
 def main():
     parser = ArgumentParser(description='I18n tool with gettext for Hugo projects')
     parser.add_argument('-q', '--quiet', action='store_true', help='stop showing INFO or lower logs')
+    parser.add_argument('--events', help='path of a file to write progress events to, as newline-delimited JSON')
     subparsers = parser.add_subparsers(description="used in the process from extracting source files' messages "
                                                    'to generating target files')
 
@@ -20,6 +26,14 @@ def main():
     extract_cmd.add_argument('pot', help='path of the directory containing the target pot file(s)')
     extract_cmd.add_argument('-c', '--customs', help='path to Python file containing custom functions')
     extract_cmd.add_argument('-f', '--config', help='path to config file')
+    extract_cmd.add_argument('--cache', help='location of a build cache shared between runs and machines:\n'
+                             'a local directory or an http(s):// URL')
+    extract_cmd.add_argument('--since', metavar='REF',
+                             help='only extract domains with files changed since a git ref,\n'
+                                  'other POT files are kept')
+    extract_cmd.add_argument('--file-jobs', type=int,
+                             help='number of processes to extract a very large content file with,\n'
+                                  'split at top-level blocks, default 1')
     extract_cmd.set_defaults(func=extract)
 
     generate_cmd = subparsers.add_parser('generate', help='generate target messages and files',
@@ -27,15 +41,111 @@ def main():
     generate_cmd.add_argument('-c', '--customs', help='path to Python file containing custom functions')
     generate_cmd.add_argument('-f', '--config', help='path to config file')
     generate_cmd.add_argument('-k', '--keep-locale', action='store_true', help='do not delete locale folder')
+    generate_cmd.add_argument('--text-cache-size', type=int,
+                              help='maximum size of localized texts kept for reuse in each language in MiB, '
+                                   'default 16')
+    generate_cmd.add_argument('-l', '--lang', action='append',
+                              help='gettext code of a language to generate, can be repeated, all languages by default')
+    generate_cmd.add_argument('-d', '--domain', action='append',
+                              help='content domain to generate, can be repeated, all domains by default.\n'
+                                   'Data files are only generated with the default domain')
+    generate_cmd.add_argument('-p', '--path', action='append',
+                              help='glob pattern of content and data files to generate, can be repeated,\n'
+                                   'all files by default. `*` also matches `/`')
+    generate_cmd.add_argument('--cache', help='location of a build cache shared between runs and machines:\n'
+                              'a local directory or an http(s):// URL')
+    generate_cmd.add_argument('--since', metavar='REF',
+                              help='only generate what changed since a git ref: content, data, string,\n'
+                                   'and PO files, previous outputs are kept for everything else')
+    generate_cmd.add_argument('--file-jobs', type=int,
+                              help='number of processes to render a very large content file with,\n'
+                                   'split at top-level blocks, default 1')
+    generate_cmd.add_argument('--resume', action='store_true',
+                              help='resume the last run if it was interrupted, skipping languages and files done')
     generate_cmd.set_defaults(func=generate)
 
+    extract_generate_cmd = subparsers.add_parser('extract-generate',
+                                                 help='extract messages and generate target files in one pass',
+                                                 formatter_class=RawTextHelpFormatter)
+    extract_generate_cmd.add_argument('pot', help='path of the directory containing the target pot file(s)')
+    extract_generate_cmd.add_argument('-c', '--customs', help='path to Python file containing custom functions')
+    extract_generate_cmd.add_argument('-f', '--config', help='path to config file')
+    extract_generate_cmd.add_argument('-k', '--keep-locale', action='store_true', help='do not delete locale folder')
+    extract_generate_cmd.add_argument('--text-cache-size', type=int,
+                                      help='maximum size of parsed and localized texts kept for reuse in MiB, '
+                                           'default 16')
+    extract_generate_cmd.add_argument('--cache', help='location of a build cache shared between runs and machines:\n'
+                                      'a local directory or an http(s):// URL')
+    extract_generate_cmd.add_argument('--file-jobs', type=int,
+                                      help='number of processes to process a very large content file with,\n'
+                                           'split at top-level blocks, default 1')
+    extract_generate_cmd.set_defaults(func=extract_generate)
+
     compile_po_cmd = subparsers.add_parser('compile', help='compile translated messages to binary format',
                                            formatter_class=RawTextHelpFormatter)
     compile_po_cmd.add_argument('dir', help='path of the directory containing subdirectories with PO files inside,\n'
                                             'in the form of {dir}/{lang}/*.po')
+    compile_po_cmd.add_argument('--compact', action='store_true',
+                                help='also compile each language to a compact catalog file that is memory-mapped\n'
+                                     'in generation instead of loading MO files')
     compile_po_cmd.set_defaults(func=compile_po)
 
+    build_cmd = subparsers.add_parser('build', help='compile and generate, pipelined per language',
+                                      formatter_class=RawTextHelpFormatter)
+    build_cmd.add_argument('dir', help='path of the directory containing subdirectories with PO files inside,\n'
+                                       'in the form of {dir}/{lang}/*.po')
+    build_cmd.add_argument('-c', '--customs', help='path to Python file containing custom functions')
+    build_cmd.add_argument('-f', '--config', help='path to config file')
+    build_cmd.add_argument('-k', '--keep-locale', action='store_true', help='do not delete locale folder')
+    build_cmd.add_argument('-j', '--jobs', type=int, help='number of worker processes, the number of CPUs by default')
+    build_cmd.add_argument('--compact', action='store_true',
+                           help='also compile each language to a compact catalog file')
+    build_cmd.add_argument('--text-cache-size', type=int,
+                           help='maximum size of localized texts kept for reuse in each language in MiB, default 16')
+    build_cmd.add_argument('--cache', help='location of a build cache shared between runs and machines:\n'
+                           'a local directory or an http(s):// URL')
+    build_cmd.add_argument('--max-memory', type=int,
+                           help='memory budget of the worker processes in MiB: fewer languages run at once\n'
+                                'when their estimated memory, from PO and content file sizes, exceeds it,\n'
+                                'and data files are generated for fewer languages at once')
+    build_cmd.set_defaults(func=build)
+
+    batch_cmd = subparsers.add_parser('batch', help='generate target files of many sites in one process',
+                                      formatter_class=RawTextHelpFormatter)
+    batch_cmd.add_argument('sites', help="path of a file listing the sites' roots, one per line,\n"
+                                         "relative to the file's directory. Each site is generated like with\n"
+                                         '`generate` run in its root, with its own config file and locale folder')
+    batch_cmd.add_argument('-k', '--keep-locale', action='store_true', help='do not delete locale folders')
+    batch_cmd.add_argument('-j', '--jobs', type=int,
+                           help='number of worker processes, sites are generated one by one in one process by default')
+    batch_cmd.set_defaults(func=batch)
+
+    serve_cmd = subparsers.add_parser('serve', help='serve localized pages rendered on demand',
+                                      formatter_class=RawTextHelpFormatter)
+    serve_cmd.add_argument('-c', '--customs', help='path to Python file containing custom functions')
+    serve_cmd.add_argument('-f', '--config', help='path to config file')
+    serve_cmd.add_argument('--host', default='127.0.0.1', help='address to listen on, default 127.0.0.1')
+    serve_cmd.add_argument('-p', '--port', type=int, default=8000, help='port to listen on, default 8000')
+    serve_cmd.add_argument('--cache-size', type=int, default=64,
+                           help='maximum size of the cache of rendered pages in MiB, default 64')
+    serve_cmd.set_defaults(func=serve)
+
     args = parser.parse_args()
+    if getattr(args, 'func', None) is generate and args.since:
+        # a run since a ref makes its own selections, and can't be resumed
+        excluded = [option for option, value in (('-l/--lang', args.lang), ('-d/--domain', args.domain),
+                                                 ('-p/--path', args.path), ('--resume', args.resume)) if value]
+        if excluded:
+            generate_cmd.error(f'argument --since: not allowed with argument {excluded[0]}')
     level = logging.WARNING if args.quiet else logging.INFO
     logging.basicConfig(format='%(levelname)s: %(message)s', level=level)
-    args.func(args)
+    args.progress = Progress([] if args.quiet else [ProgressDisplay()])
+    sink = None
+    if args.events:
+        sink = JSONLinesSink(args.events)
+        args.progress.listeners.append(sink)
+    try:
+        args.func(args)
+    finally:
+        if sink:
+            sink.close()
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Compact, read-only, hash-indexed catalog of all domains of a language, made to be memory-mapped.
+
+Layout, all integers are unsigned 32-bit little-endian:
+- header: magic, version, number of buckets, number of entries, number of domains
+- domains: (offset, length) of each domain name in the string pool
+- buckets: 1-based index of an entry, 0 when the bucket is empty. Collisions are resolved by linear probing
+- entries: (key offset, key length, value offset, value length) of each message in the string pool,
+the key being the domain name and the msgid separated by a NUL
+- string pool: UTF-8 encoded strings
+"""
+
+import mmap
+import struct
+import zlib
+from typing import Dict, List, Optional
+
+MAGIC = b'HGCC'
+VERSION = 1
+HEADER = struct.Struct('<4sIIII')
+PAIR = struct.Struct('<II')
+BUCKET = struct.Struct('<I')
+ENTRY = struct.Struct('<IIII')
+COMPACT_CATALOG_NAME = 'catalog.hgc'
+_NOT_PROBED = object()
+
+
+def _key(domain_name: str, msgid: str) -> bytes:
+    return f'{domain_name}\0{msgid}'.encode()
+
+
+def write_compact_catalog(path: str, domain_catalogs: Dict[str, Dict[str, str]]):
+    """Write the catalogs of all domains of a language to a compact catalog file
+    :param path: path of the file
+    :param domain_catalogs: a dict with domain names as keys and dicts of msgids and translations as values
+    """
+    pool = bytearray()
+
+    def add_to_pool(b: bytes):
+        offset = len(pool)
+        pool.extend(b)
+        return offset, len(b)
+
+    domains = [add_to_pool(domain_name.encode()) for domain_name in domain_catalogs]
+    keys: List[bytes] = []
+    entries = []
+    for domain_name, catalog in domain_catalogs.items():
+        for msgid, msgstr in catalog.items():
+            key = _key(domain_name, msgid)
+            keys.append(key)
+            entries.append(add_to_pool(key) + add_to_pool(msgstr.encode()))
+
+    # keep the load factor at most 0.5 so that probing stays short
+    n_buckets = max(1, len(entries) * 2)
+    buckets = [0] * n_buckets
+    for i, key in enumerate(keys):
+        b = zlib.crc32(key) % n_buckets
+        while buckets[b]:
+            b = (b + 1) % n_buckets
+        buckets[b] = i + 1
+
+    entries_offset = HEADER.size + PAIR.size * len(domains) + BUCKET.size * n_buckets
+    pool_offset = entries_offset + ENTRY.size * len(entries)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n_buckets, len(entries), len(domains)))
+        for offset, length in domains:
+            f.write(PAIR.pack(pool_offset + offset, length))
+        f.write(struct.pack(f'<{n_buckets}I', *buckets))
+        for key_offset, key_len, value_offset, value_len in entries:
+            f.write(ENTRY.pack(pool_offset + key_offset, key_len, pool_offset + value_offset, value_len))
+        f.write(pool)
+
+
+class CompactCatalog:
+    """A memory-mapped compact catalog file. Messages are looked up directly in the mapped file,
+    nothing is parsed in advance, and the OS page cache shares the file between processes.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_buckets, self.n_entries, n_domains = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a compact catalog file of version {VERSION}')
+        self.domain_names = []
+        for i in range(n_domains):
+            offset, length = PAIR.unpack_from(self.mm, HEADER.size + PAIR.size * i)
+            self.domain_names.append(self.mm[offset:offset + length].decode())
+        self.buckets_offset = HEADER.size + PAIR.size * n_domains
+        self.entries_offset = self.buckets_offset + BUCKET.size * self.n_buckets
+
+    def lookup(self, domain_name: str, msgid: str) -> Optional[str]:
+        """
+        :return: the translation of `msgid` in the domain, or `None` if there's none
+        """
+        key = _key(domain_name, msgid)
+        b = zlib.crc32(key) % self.n_buckets
+        while True:
+            i = BUCKET.unpack_from(self.mm, self.buckets_offset + BUCKET.size * b)[0]
+            if i == 0:
+                return None
+            entry_offset = self.entries_offset + ENTRY.size * (i - 1)
+            key_offset, key_len, value_offset, value_len = ENTRY.unpack_from(self.mm, entry_offset)
+            if key_len == len(key) and self.mm[key_offset:key_offset + key_len] == key:
+                return self.mm[value_offset:value_offset + value_len].decode()
+            b = (b + 1) % self.n_buckets
+
+    def domain(self, domain_name: str) -> 'CompactDomainCatalog':
+        return CompactDomainCatalog(self, domain_name)
+
+
+class CompactDomainCatalog:
+    """Translations of a domain in a compact catalog, probed lazily
+    """
+    def __init__(self, catalog: CompactCatalog, domain_name: str):
+        self.catalog = catalog
+        self.domain_name = domain_name
+        # translations already probed, `None` for messages with no translation
+        self.probed: Dict[str, Optional[str]] = {}
+
+    def l10n_func(self, msgid: str) -> str:
+        """Same as `gettext`: the message itself, not a copy, is returned when there's no translation
+        """
+        if (msgstr := self.probed.get(msgid, _NOT_PROBED)) is _NOT_PROBED:
+            msgstr = self.probed[msgid] = self.catalog.lookup(self.domain_name, msgid)
+        return msgid if msgstr is None else msgstr
@@ -4,46 +4,97 @@
 import logging
 import os
 import subprocess
+import time
+from typing import Optional
 
 import polib
 
+from .compact_catalog import COMPACT_CATALOG_NAME, write_compact_catalog
+from .progress import Progress
 
-def compile_po(args):
-    """Compile translated messages to binary format stored in 'locale/{lang}/LC_MESSAGES' directory
-    :param args: arguments passed in command line, containing
-        - dir: path of the directory containing subdirectories with PO files inside, in the form of {dir}/{lang}/*.po
-    :return: None
+
+def compile_compact(src_path: str, target_path: str):
+    """Compile all PO files of a language to one compact catalog file
+    :param src_path: path of the directory containing the language's PO files
+    :param target_path: path of the compact catalog file
     """
-    po_dir = args.dir
+    domain_catalogs = {}
+    for po in os.listdir(src_path):
+        # like MO files used with `gettext`: only translated messages with no context, no plural forms
+        domain_catalogs[po[:-3]] = {e.msgid: e.msgstr for e in polib.pofile(f'{src_path}/{po}').translated_entries()
+                                    if e.msgid and not e.msgctxt and not e.msgid_plural}
+    write_compact_catalog(target_path, domain_catalogs)
 
-    with_gettext = True
+
+def has_msgfmt() -> bool:
+    """Check whether GNU gettext's `msgfmt` is available"""
     test_gettext_cmd = 'msgfmt -V'
     try:
         # do not show the output of running test_gettext_cmd
         subprocess.run(test_gettext_cmd, shell=True, check=True, capture_output=True)
     except subprocess.CalledProcessError:
-        with_gettext = False
-
-    for lang in os.listdir(po_dir):
-        target_path = f'locale/{lang}/LC_MESSAGES'
-        os.makedirs(target_path, exist_ok=True)
-        src_path = f'{po_dir}/{lang}'
-
-        for po in os.listdir(src_path):
-            po_path = f'{src_path}/{po}'
-            mo_path = f'{target_path}/{po[:-2]}mo'
-            if not with_gettext:
-                polib.pofile(po_path).save_as_mofile(mo_path)
-                continue
-
-            command = f'msgfmt {po_path} -o {mo_path}'
-            try:
-                os.remove(mo_path)
-                logging.info(f'Removed {mo_path}')
-            except OSError:
-                if os.path.exists(mo_path):
-                    logging.info(f"{mo_path} could not be removed")
-                pass
-            subprocess.run(command, shell=True, check=True)
-            logging.info(f'Created {mo_path}')
-        logging.info(f'Compiled {lang}')
+        return False
+    return True
+
+
+def compile_lang(po_dir: str, lang: str, with_gettext: bool, compact: bool = False,
+                 progress: Optional[Progress] = None):
+    """Compile PO files of a language to 'locale/{lang}'
+    :param po_dir: path of the directory containing subdirectories with PO files inside,
+    in the form of {po_dir}/{lang}/*.po
+    :param lang: the language to compile
+    :param with_gettext: whether to compile with `msgfmt`, `polib` is used otherwise
+    :param compact: also compile the language to a compact catalog file
+    :param progress: a `Progress` to emit progress events to
+    :return: None
+    """
+    progress = progress or Progress()
+    start = time.perf_counter()
+    target_path = f'locale/{lang}/LC_MESSAGES'
+    os.makedirs(target_path, exist_ok=True)
+    src_path = f'{po_dir}/{lang}'
+
+    for po in os.listdir(src_path):
+        po_path = f'{src_path}/{po}'
+        mo_path = f'{target_path}/{po[:-2]}mo'
+        if not with_gettext:
+            polib.pofile(po_path).save_as_mofile(mo_path)
+            progress.file_processed('compile', mo_path, lang)
+            continue
+
+        command = f'msgfmt {po_path} -o {mo_path}'
+        try:
+            os.remove(mo_path)
+            logging.debug(f'Removed {mo_path}')
+        except OSError:
+            if os.path.exists(mo_path):
+                logging.info(f"{mo_path} could not be removed")
+            pass
+        subprocess.run(command, shell=True, check=True)
+        progress.file_processed('compile', mo_path, lang)
+
+    compact_path = f'locale/{lang}/{COMPACT_CATALOG_NAME}'
+    if compact:
+        compile_compact(src_path, compact_path)
+        progress.file_processed('compile', compact_path, lang)
+    elif os.path.isfile(compact_path):
+        # a stale compact catalog would be used instead of the new MO files
+        os.remove(compact_path)
+    progress.language_done('compile', lang, time.perf_counter() - start)
+
+
+def compile_po(args):
+    """Compile translated messages to binary format stored in 'locale/{lang}/LC_MESSAGES' directory
+    :param args: arguments passed in command line, containing
+        - dir: path of the directory containing subdirectories with PO files inside, in the form of {dir}/{lang}/*.po
+        - compact (optional): also compile each language to a compact catalog file 'locale/{lang}/catalog.hgc',
+        used in generation instead of the language's MO files. Default False
+        - progress (optional): a `Progress` to emit progress events to
+    :return: None
+    """
+    with_gettext = has_msgfmt()
+    progress = getattr(args, 'progress', None) or Progress()
+    lang_codes = os.listdir(args.dir)
+    with progress.phase('compile', len(lang_codes)):
+        for lang in lang_codes:
+            compile_lang(args.dir, lang, with_gettext, getattr(args, 'compact', False), progress)
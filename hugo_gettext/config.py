@@ -1,12 +1,14 @@
 # SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
+import copy
+import fnmatch
 import glob
 import importlib.util
 import inspect
 import logging
 import os
-from typing import List, Dict, Callable, Set, Type, Tuple
+from typing import List, Dict, Callable, Set, Type, Tuple, Optional, Collection
 
 from markdown_it import MarkdownIt
 from markdown_it.renderer import RendererProtocol
@@ -14,13 +16,30 @@ from mdit_py_hugo.attribute import attribute_plugin
 from mdit_py_hugo.shortcode import shortcode_plugin
 from mdit_py_plugins.deflist import deflist_plugin
 from mdit_py_plugins.front_matter import front_matter_plugin
+from tomlkit.items import Item
 
 from . import utils
+from .domain_split import DomainSplit, ShardMap, read_shard_map
 
 
-def _read_domain_config(domain_config) -> List[str]:
+def _glob(pattern: str, paths: Optional[Collection[str]]) -> List[str]:
+    """Find files matching `pattern`, like `glob.glob`
+    :param pattern: the glob pattern
+    :param paths: paths to match against, or `None` to search the filesystem
+    :return: list of matching paths
+    """
+    if paths is None:
+        return glob.glob(pattern)
+    pattern_parts = pattern.split('/')
+    return [p for p in paths
+            if len(parts := p.split('/')) == len(pattern_parts)
+            and all(fnmatch.fnmatchcase(part, pattern_part) for part, pattern_part in zip(parts, pattern_parts))]
+
+
+def _read_domain_config(domain_config, paths: Optional[Collection[str]] = None) -> List[str]:
     """Get files of a domain
     :param domain_config: config of the domain to read
+    :param paths: paths to match globs against, or `None` to search the filesystem
     :return: list of files of the domain
     """
     if 'files' not in domain_config and 'globs' not in domain_config:
@@ -30,28 +49,30 @@ def _read_domain_config(domain_config) -> List[str]:
         domain_files |= set([os.path.normpath(p) for p in domain_config['files']])
     if 'globs' in domain_config:
         for g in domain_config['globs']:
-            domain_files |= set([os.path.normpath(p) for p in glob.glob(g)])
+            domain_files |= set([os.path.normpath(p) for p in _glob(g, paths)])
     if 'excludedFiles' in domain_config:
         domain_files -= set([os.path.normpath(p) for p in domain_config['excludedFiles']])
     if 'excludedGlobs' in domain_config:
         excluded_files = set()
         for g in domain_config['excludedGlobs']:
-            excluded_files |= set([os.path.normpath(p) for p in glob.glob(g)])
+            excluded_files |= set([os.path.normpath(p) for p in _glob(g, paths)])
         domain_files -= excluded_files
     return sorted(domain_files)
 
 
-def _read_data_config(i18n_config) -> List[str]:
+def _read_data_config(i18n_config, paths: Optional[Collection[str]] = None) -> List[str]:
     """Retrieve a list of data files to extract
     :param i18n_config: the i18n config section
+    :param paths: paths to match globs against, or `None` to search the filesystem
     :return: a list of file paths
     """
-    return _read_domain_config(i18n_config['data']) if 'data' in i18n_config else []
+    return _read_domain_config(i18n_config['data'], paths) if 'data' in i18n_config else []
 
 
-def _read_content_config(i18n_config) -> Dict[str, List[str]]:
+def _read_content_config(i18n_config, paths: Optional[Collection[str]] = None) -> Dict[str, List[str]]:
     """Retrieve lists of content files, grouped by domains
     :param i18n_config: the i18n config section
+    :param paths: paths to match globs against, or `None` to search the filesystem
     :return: a dict with domain names as keys and file lists as values
     """
     if 'content' not in i18n_config:
@@ -60,18 +81,28 @@ def _read_content_config(i18n_config) -> Dict[str, List[str]]:
     content_config = i18n_config['content']
     content_files: Dict[str, List[str]] = {}
     for domain in content_config:
-        content_files[domain] = _read_domain_config(content_config[domain])
+        content_files[domain] = _read_domain_config(content_config[domain], paths)
     return content_files
 
 
-def _find_string_file(default_lang: str) -> str:
-    if not os.path.isdir('i18n'):
+def _read_splits(i18n_config, src_dir: str) -> Dict[str, DomainSplit]:
+    """Retrieve the splits of content domains
+    :param i18n_config: the i18n config section
+    :param src_dir: the source directory
+    :return: a dict with names of split domains as keys and their splits as values
+    """
+    return {domain: DomainSplit(domain_config['split'], src_dir)
+            for domain, domain_config in i18n_config.get('content', {}).items() if 'split' in domain_config}
+
+
+def _find_string_file(default_lang: str, paths: Optional[Collection[str]] = None) -> str:
+    if paths is None and not os.path.isdir('i18n'):
         return ''
     possible_paths = [f'i18n/{default_lang}.toml',
                       f'i18n/{default_lang}.yaml',
                       f'i18n/{default_lang}.json']
     for path in possible_paths:
-        if os.path.isfile(path):
+        if os.path.isfile(path) if paths is None else path in paths:
             return path
     return ''
 
@@ -91,6 +122,18 @@ excluded_keys = {'aliases', 'date',
                  'type', 'url'}
 
 
+def _unwrap(obj):
+    """
+    :return: `obj` with plain Python objects in place of `tomlkit` items, e.g. of a round-trip TOML config,
+    which other formats can't dump
+    """
+    if isinstance(obj, dict):
+        return {key: _unwrap(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_unwrap(value) for value in obj]
+    return obj.unwrap() if isinstance(obj, Item) else obj
+
+
 def _get_customs_functions(customs_path: str) -> Dict[str, Callable]:
     if not customs_path:
         return {}
@@ -136,7 +179,16 @@ def _get_parse_fence() -> bool:
 
 
 class Config:
-    def __init__(self, hugo_config, config_path: str = '', customs_path: str = ''):
+    def __init__(self, hugo_config, config_path: str = '', customs_path: str = '',
+                 paths: Optional[Collection[str]] = None, shard_map: Optional[ShardMap] = None):
+        """
+        :param hugo_config: the Hugo config as a dict
+        :param config_path: path of the config file
+        :param customs_path: path to Python file containing custom functions
+        :param paths: paths of the site's files to resolve file lists against, or `None` to search the filesystem
+        :param shard_map: shard assignments of the domains split by number of messages, updated by extraction.
+        Read from the shard map file if `None` and `paths` is `None`, see `domain_split`
+        """
         if 'i18n' not in hugo_config:
             return
 
@@ -149,6 +201,7 @@ class Config:
 
         # command line arg. > config value
         customs_path = customs_path or i18n_config.get('customs', '')
+        self.customs_path = customs_path
         customs_functions = _get_customs_functions(customs_path)
         # value directly set in config file > value gotten by calling custom function
         #   default_domain_name
@@ -190,18 +243,27 @@ class Config:
         self.gen_to_other_dir = i18n_config.get('genToOtherDir', False)
         self.src_dir = i18n_config.get('srcDir', 'content')
         self.gen_dir = i18n_config.get('genDir', 'content-trans')
+        # path of a config fragment per language, with `{lang}` for the Hugo language code
+        self.config_fragments = i18n_config.get('configFragments', '')
         self.do_title = 'others' in i18n_config and 'title' in i18n_config['others']
         self.do_description = 'others' in i18n_config and 'description' in i18n_config['others']
         self.do_menu = 'others' in i18n_config and 'menu' in i18n_config['others']
         self.do_strings = 'others' in i18n_config and 'strings' in i18n_config['others']
-        self.data = _read_data_config(i18n_config)
-        self.content = _read_content_config(i18n_config)
+        self.data = _read_data_config(i18n_config, paths)
+        # content files grouped by domains as configured, and the splits of domains
+        self.domain_files = _read_content_config(i18n_config, paths)
+        self.splits = _read_splits(i18n_config, self.src_dir)
+        if shard_map is None:
+            shard_map = read_shard_map() \
+                if paths is None and any(split.max_messages for split in self.splits.values()) else {}
+        self.shard_map: ShardMap = shard_map
+        self.content = self.split_content()
         self.excluded_data_keys = set(i18n_config.get('excludedDataKeys', '').split())
         self.excluded_keys = excluded_keys | custom_excluded_keys | set(i18n_config.get('excludedKeys', '').split())
         self.shortcodes = i18n_config.get('shortcodes', {})
 
         self.default_lang = hugo_config.get('defaultContentLanguage', 'en')
-        self.string_file_path = _find_string_file(self.default_lang)
+        self.string_file_path = _find_string_file(self.default_lang, paths)
         if self.do_strings and not self.string_file_path:
             logging.warning('Strings specified as an i18n target, but no string file in the default language found')
 
@@ -215,18 +277,74 @@ class Config:
 
         self.hugo_config = hugo_config
 
+    def get_domain_name(self, domain: str) -> str:
+        return domain if domain != 'default' else self.default_domain_name
+
+    def split_content(self) -> Dict[str, List[str]]:
+        """Content files grouped by domains, with split domains replaced by their sub-domains.
+        A split domain keeps its own entry, with its files that don't belong to a sub-domain
+        :return: a dict with domain names as keys and file lists as values
+        """
+        content: Dict[str, List[str]] = {}
+        # {sub-domain: the split domain}
+        self.domain_parents: Dict[str, str] = {}
+        for domain, domain_paths in self.domain_files.items():
+            if (split := self.splits.get(domain)) is None:
+                content[domain] = domain_paths
+                continue
+            domain_name = self.get_domain_name(domain)
+            content[domain] = []
+            for unit, unit_paths in split.group(domain_paths).items():
+                sub_domain = split.sub_domain_name(domain_name, unit, self.shard_map.get(domain_name))
+                if sub_domain == domain_name:
+                    content[domain].extend(unit_paths)
+                elif sub_domain in self.domain_files:
+                    raise ValueError(f'Sub-domain {sub_domain} of domain {domain_name} is also a configured domain')
+                else:
+                    # shards pack several units
+                    content.setdefault(sub_domain, []).extend(unit_paths)
+                    self.domain_parents[sub_domain] = domain
+            content[domain].sort()
+        return content
+
+    def copy_hugo_config(self) -> Dict:
+        """
+        :return: a copy of what `write_hugo_config` compares the Hugo config with after generation, the whole config,
+        or only its language sections with `config_fragments`
+        """
+        if not self.config_fragments:
+            return copy.deepcopy(self.hugo_config)
+        return {'languages': copy.deepcopy(self.hugo_config.get('languages', {}))}
+
+    def write_hugo_config(self, original_hugo_config: Dict, files: utils.SiteFiles):
+        """Write what generation changed in the Hugo config: the whole config file if it changed, or, with
+        `config_fragments`, each language section generation added or changed to its own fragment file
+        :param original_hugo_config: the Hugo config before generation, see `copy_hugo_config`
+        :param files: where fragments are written. With the `StagedSiteFiles` of the run, they're moved into place
+        along with its target files, only if their content changes, and fragments of languages that aren't
+        generated anymore are removed
+        """
+        if not self.config_fragments:
+            if self.hugo_config != original_hugo_config:
+                utils.write_file(self.config_path, self.hugo_config)
+            return
+        original_languages = original_hugo_config.get('languages', {})
+        for hugo_lang_code, section in self.hugo_config.get('languages', {}).items():
+            if hugo_lang_code == self.default_lang or section == original_languages.get(hugo_lang_code):
+                continue
+            path = self.config_fragments.format(lang=hugo_lang_code)
+            files.write_text(path, utils.TextFormat.decide_by_path(path).dump_obj(_unwrap(section)))
+
     @classmethod
     def from_config_file(cls, config_path: str, customs_path: str = ''):
         if not config_path:
             config_path = _find_config_file()
-        hugo_config = utils.read_file(config_path)
+        # the config may be written back in generation, keep its style
+        hugo_config = utils.read_file(config_path, round_trip=True)
         return cls(hugo_config, config_path, customs_path)
 
 
-def initialize(renderer_cls: Type[RendererProtocol],
-               customs_path: str = '',
-               config_path: str = '') -> Tuple[Config, MarkdownIt]:
-    hg_config = Config.from_config_file(config_path, customs_path)
+def make_mdi(renderer_cls: Type[RendererProtocol], hg_config: Config) -> MarkdownIt:
     mdi = MarkdownIt(renderer_cls=renderer_cls).use(front_matter_plugin).use(shortcode_plugin)
     if hg_config.parse_table:
         mdi = mdi.enable('table')
@@ -234,4 +352,11 @@ def initialize(renderer_cls: Type[RendererProtocol],
         mdi = mdi.use(deflist_plugin)
     if hg_config.parse_attribute_title or hg_config.parse_attribute_block:
         mdi = mdi.use(attribute_plugin, block=hg_config.parse_attribute_block, title=hg_config.parse_attribute_title)
-    return hg_config, mdi
+    return mdi
+
+
+def initialize(renderer_cls: Type[RendererProtocol],
+               customs_path: str = '',
+               config_path: str = '') -> Tuple[Config, MarkdownIt]:
+    hg_config = Config.from_config_file(config_path, customs_path)
+    return hg_config, make_mdi(renderer_cls, hg_config)
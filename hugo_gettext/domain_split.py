@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Splitting of content domains into sub-domains, each with its own POT, PO, and MO files.
+
+Units of a split domain are the directories at `depth` levels below the source directory. Files less deep stay in
+the domain itself. A domain is split either into a sub-domain per unit, or, with `maxMessages`, into numbered
+shards packing units up to a number of messages. Units are assigned to shards during extraction and the assignments
+are kept in a shard map, so a unit never moves to another shard: shards only grow, and new units go to the first
+shard with room for them, or to a new shard.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+SHARD_MAP_PATH = '.hugo_gettext_shards.json'
+
+# {domain name: {unit: shard number}}
+ShardMap = Dict[str, Dict[str, int]]
+
+
+class DomainSplit:
+    def __init__(self, split_config: Dict, src_dir: str):
+        """
+        :param split_config: the `split` field of a domain's config
+        :param src_dir: the source directory, see `Config.src_dir`
+        """
+        self.depth: int = split_config.get('depth', 1)
+        self.max_messages: int = split_config.get('maxMessages', 0)
+        if self.depth < 1 or self.max_messages < 0:
+            raise ValueError('A domain split needs a positive `depth` and a non-negative `maxMessages`')
+        self.src_dir = src_dir
+
+    def unit(self, path: str) -> str:
+        """
+        :return: the directory at `depth` levels below the source directory containing `path`,
+        or an empty string if `path` is less deep
+        """
+        parts = os.path.relpath(path, self.src_dir).split(os.sep)
+        if len(parts) <= self.depth or parts[0] == os.pardir:
+            return ''
+        return '/'.join(parts[:self.depth])
+
+    def group(self, domain_paths: List[str]) -> Dict[str, List[str]]:
+        """
+        :return: files of the domain grouped by units, files less deep than units with an empty string as key
+        """
+        units: Dict[str, List[str]] = {}
+        for path in domain_paths:
+            units.setdefault(self.unit(path), []).append(path)
+        return {unit: units[unit] for unit in sorted(units)}
+
+    def sub_domain_name(self, domain_name: str, unit: str, shards: Optional[Dict[str, int]] = None) -> str:
+        """
+        :param domain_name: name of the split domain
+        :param unit: a unit of the domain
+        :param shards: shard numbers of the domain's units, only used with `max_messages`
+        :return: name of the sub-domain of the unit, or `domain_name` if the unit stays in the domain,
+        i.e. it's the empty unit or a unit not assigned to a shard yet
+        """
+        if not unit:
+            return domain_name
+        if not self.max_messages:
+            return f'{domain_name}-{unit.replace("/", "-")}'
+        if shards is None or unit not in shards:
+            return domain_name
+        return f'{domain_name}-{shards[unit]}'
+
+    def pack(self, message_counts: Dict[str, int], shards: Dict[str, int]) -> Dict[str, int]:
+        """Assign units to shards, keeping previous assignments of the units still existing
+        :param message_counts: numbers of messages of the domain's units
+        :param shards: previous shard numbers of the domain's units
+        :return: shard numbers of all units in `message_counts`
+        """
+        packed = {unit: shard for unit, shard in shards.items() if unit in message_counts}
+        sizes: Dict[int, int] = {}
+        for unit, shard in packed.items():
+            sizes[shard] = sizes.get(shard, 0) + message_counts[unit]
+        for unit, count in message_counts.items():
+            if not unit or unit in packed:
+                continue
+            shard = next((shard for shard in sorted(sizes) if sizes[shard] + count <= self.max_messages),
+                         max(sizes, default=0) + 1)
+            packed[unit] = shard
+            sizes[shard] = sizes.get(shard, 0) + count
+        return packed
+
+
+def read_shard_map(path: str = SHARD_MAP_PATH) -> ShardMap:
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_shard_map(shard_map: ShardMap, path: str = SHARD_MAP_PATH):
+    with open(path, 'w') as f:
+        json.dump(shard_map, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -1,15 +1,16 @@
 # SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
-import logging
-import os
-from typing import Set, Optional, List
+from datetime import datetime
+from typing import Set, Optional, List, Tuple, Dict
 
+import polib
 import yaml
-from markdown_gettext.domain_extraction import DomainExtraction
+from markdown_gettext.domain_extraction import DomainExtraction, I18NEntry
 from markdown_it import MarkdownIt
 from mdit_py_i18n import utils
 
+from ..build_cache import text_digest
 from ..utils import HugoEProtocol
 
 
@@ -20,6 +21,33 @@ class HugoDomainE(DomainExtraction):
     def __init__(self, e: HugoEProtocol):
         super().__init__()
         self.e = e
+        # (msgid, line_num, comment, msgctxt) of entries added while a file is extracted, to be cached
+        self.recorded: Optional[List[Tuple[str, int, str, str]]] = None
+        # entries by (msgid, msgctxt), to add occurrences in constant time
+        self.entry_index: Dict[Tuple[str, str], I18NEntry] = {}
+
+    def _add_entry(self, path: str, msgid: str, line_num: int, comment: str = '', msgctxt: str = ''):
+        """Like `DomainExtraction.add_entry`, with a lookup in `entry_index` instead of a scan of `entries`
+        """
+        if not msgid:
+            return
+        if (entry := self.entry_index.get((msgid, msgctxt))) is not None:
+            entry.occurrences.append((path, line_num))
+            return
+        entry = self.entry_index[(msgid, msgctxt)] = I18NEntry(msgid, [(path, line_num)], comment, msgctxt)
+        self.entries.append(entry)
+
+    def add_entry(self, path: str, msgid: str, line_num: int, comment: str = '', msgctxt: str = ''):
+        if self.recorded is not None:
+            self.recorded.append((msgid, line_num, comment, msgctxt))
+        self._add_entry(path, msgid, line_num, comment, msgctxt)
+
+    def merge(self, other: 'HugoDomainE'):
+        """Add the entries of another domain's extraction, in their order
+        """
+        for entry in other.entries:
+            for path, line_num in entry.occurrences:
+                self._add_entry(path, entry.msgid, line_num, entry.comment, entry.msgctxt)
 
     def i12ize_object(self, o, excluded_keys: Set[str], path: str, mdi: Optional[MarkdownIt] = None):
         """Internationalize an object, either in front matters or in data files.
@@ -45,26 +73,95 @@ class HugoDomainE(DomainExtraction):
                 if key not in excluded_keys:
                     self.i12ize_object(value, excluded_keys, path, mdi)
 
-    def render_front_matter(self, path: str, content: str, markup: str):
-        fm = yaml.safe_load(content)
+    def render_front_matter(self, path: str, content: str, markup: str, fm=None):
+        """
+        :param fm: the front matter already parsed from `content`, if any
+        """
+        if fm is None:
+            fm = yaml.safe_load(content)
         self.i12ize_object(fm, self.e.hg_config.excluded_keys, path)
 
     def i12ize_content_file(self, path: str):
-        with open(path) as f_content:
-            env = {
-                'path': path,
-                'parse_fence': self.e.hg_config.parse_fence,
-                'domain_extraction': self,
-                'with_line': True
-            }
-            self.e.mdi.render(f_content.read(), env)
+        """Extract messages from a content file, or add the entries cached for the same text in the build cache.
+        The file is parsed by the source cache if there's one
+        """
+        source = self.e.sources.get(path) if self.e.sources else None
+        text = source.text if source else self.e.files.read_text(path)
+        if build_cache := self.e.build_cache:
+            key = build_cache.key('extract', text_digest(text))
+            if (recorded := build_cache.get(key)) is not None:
+                for msgid, line_num, comment, msgctxt in recorded:
+                    self._add_entry(path, msgid, line_num, comment, msgctxt)
+                return
+            self.recorded = []
+        env = {
+            'path': path,
+            'parse_fence': self.e.hg_config.parse_fence,
+            'domain_extraction': self,
+            'with_line': True,
+            'file_jobs': self.e.file_jobs
+        }
+        if source:
+            source.render(self.e.mdi, env)
+        else:
+            self.e.mdi.render(text, env)
+        if build_cache:
+            build_cache.put(key, self.recorded)
+            self.recorded = None
 
     def i12ize_content_domain(self, domain_paths: List[str]):
         for path in domain_paths:
-            if os.path.isfile(path):
+            if self.e.files.is_file(path):
                 self.i12ize_content_file(path)
-                logging.info(path)
+                self.e.progress.file_processed('extract', path)
 
-    def to_pot(self, dest_path: str):
-        super().make_pot(self.e.hg_config.package, self.e.hg_config.report_address, self.e.hg_config.team_address,
-                         dest_path)
+    @staticmethod
+    def _pot_state(pot: polib.POFile) -> Tuple[Dict[str, str], List[Tuple[str, str, List, str]]]:
+        """
+        :return: what makes POT files different: the metadata except the creation date,
+        and the context, message, references, and comment of each entry
+        """
+        metadata = {key: value for key, value in pot.metadata.items() if key != 'POT-Creation-Date'}
+        return metadata, [(e.msgctxt or '', e.msgid, [tuple(o) for o in e.occurrences], e.comment) for e in pot]
+
+    def _make_pot_file(self, package: str, report_address: str, team_address: str,
+                       existing_pot: Optional[polib.POFile]) -> polib.POFile:
+        """Make the POT file of the domain, keeping comments of the existing POT file for entries with no comment
+        :param existing_pot: the existing POT file, if any
+        :return: the POT file, not saved
+        """
+        pot = polib.POFile()
+        pot.metadata = {
+            'Project-Id-Version': f'{package} 1.0',
+            'Report-Msgid-Bugs-To': report_address,
+            'POT-Creation-Date': datetime.now().astimezone().strftime('%Y-%m-%d %H:%M%z'),
+            'PO-Revision-Date': 'YEAR-MO-DA HO:MI+ZONE',
+            'Last-Translator': 'FULL NAME <EMAIL@ADDRESS>',
+            'Language-Team': f'LANGUAGE <{team_address}>',
+            'MIME-Version': '1.0',
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Content-Transfer-Encoding': '8bit',
+        }
+        for e in self.entries:
+            # preserve existing comments
+            if not e.comment and existing_pot and e.msgid in existing_pot.map_by_id:
+                e.comment = existing_pot.map_by_id[e.msgid].comment
+            pot.append(e.to_poentry())
+        return pot
+
+    def make_pot(self, package: str, report_address: str, team_address: str, dest_path: str):
+        self._make_pot_file(package, report_address, team_address, self.open_existing_pot(dest_path)).save(dest_path)
+
+    def to_pot(self, dest_path: str) -> bool:
+        """Make a POT file like `make_pot`, but only write it if it's different from the existing file,
+        the creation date aside, so that unchanged POT files are left untouched
+        :param dest_path: path of the POT file
+        :return: whether the file is written
+        """
+        hg_config = self.e.hg_config
+        existing_pot = self.open_existing_pot(dest_path)
+        pot = self._make_pot_file(hg_config.package, hg_config.report_address, hg_config.team_address, existing_pot)
+        if existing_pot is not None and self._pot_state(existing_pot) == self._pot_state(pot):
+            return False
+        pot.save(dest_path)
+        return True
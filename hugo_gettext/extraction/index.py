@@ -3,32 +3,53 @@
 
 import logging
 import os
+from typing import Dict, Optional, Collection
 
 from markdown_it import MarkdownIt
 
 from .e_domain import HugoDomainE
 from .renderer_hugo_i18n import RendererHugoI18N
 from .. import utils
+from ..build_cache import BuildCache, open_build_cache
+from ..changes import changed_files, detect_changes, changed_domains
 from ..config import Config, initialize
+from ..domain_split import write_shard_map
+from ..progress import Progress
 
 
 class Extraction:
     """
     Implements `HugoEProtocol`
     """
-    def __init__(self, hg_config: Config, mdi: MarkdownIt):
+    def __init__(self,
+                 hg_config: Config,
+                 mdi: MarkdownIt,
+                 files: Optional[utils.SiteFiles] = None,
+                 progress: Optional[Progress] = None,
+                 build_cache: Optional[BuildCache] = None,
+                 sources: Optional[utils.SourceCache] = None,
+                 file_jobs: int = 1):
         self.hg_config = hg_config
         self.mdi = mdi
+        self.files = files or utils.SiteFiles()
+        self.progress = progress or Progress()
+        self.build_cache = build_cache
+        # content files parsed once for extraction and generation, see `extract_generate`
+        self.sources = sources
+        # number of processes to extract a very large content file with, see `chunks`
+        self.file_jobs = file_jobs
         self.default_domain_e = HugoDomainE(self)
 
+    def i12ize_data_file(self, path: str, data):
+        self.default_domain_e.i12ize_object(data, self.hg_config.excluded_data_keys, path, self.mdi)
+
     def i12ize_data_files(self):
-        for path, data in utils.read_data_files(self.hg_config.data).items():
-            self.default_domain_e.i12ize_object(data, self.hg_config.excluded_data_keys, path, self.mdi)
-            logging.info(path)
+        for path, data in self.files.read_data_files(self.hg_config.data):
+            self.i12ize_data_file(path, data)
+            self.progress.file_processed('extract', path)
 
-    def i12ize_data_others(self):
+    def i12ize_config_fields(self):
         hg_config = self.hg_config
-        # config fields
         default_language_config = hg_config.hugo_config.get('languages', {}).get(hg_config.default_lang, {})
         if hg_config.do_title:
             if 'title' not in default_language_config:
@@ -45,29 +66,128 @@ class Extraction:
         if hg_config.do_menu:
             for menu_entry in default_language_config['menu']['main']:
                 self.default_domain_e.add_entry(hg_config.config_path, menu_entry['name'], 0)
-        # data
-        if hg_config.data:
-            self.i12ize_data_files()
-        # strings
+
+    def i12ize_strings(self, src_strings: Optional[Dict] = None):
+        """
+        :param src_strings: the string file already read, if any
+        """
+        hg_config = self.hg_config
         if hg_config.do_strings and hg_config.string_file_path:
-            src_strings = utils.read_file(hg_config.string_file_path)
+            if src_strings is None:
+                src_strings = self.files.read_obj(hg_config.string_file_path)
             for _, string in src_strings.items():
                 self.default_domain_e.add_entry(hg_config.string_file_path,
                                                 string['other'],
                                                 0,
                                                 string.get('comment', ''))
 
-    def extract(self, target_dir: str):
+    def i12ize_data_others(self):
+        self.i12ize_config_fields()
+        if self.hg_config.data:
+            self.i12ize_data_files()
+        self.i12ize_strings()
+
+    def i12ize_shards(self, domain: str) -> Dict[str, HugoDomainE]:
+        """Extract messages from the files of a domain split by number of messages, assigning new units to shards,
+        see `assign_shards`
+        :param domain: the split domain, as in `Config.domain_files`
+        :return: a dict with the domain's name and its shards' names as keys, and their extraction objects as values
+        """
+        units = self.hg_config.splits[domain].group(self.hg_config.domain_files[domain])
+        domain_e = self.default_domain_e if domain == 'default' else HugoDomainE(self)
+        domain_e.i12ize_content_domain(units.pop('', []))
+        unit_es = {}
+        for unit, unit_paths in units.items():
+            unit_es[unit] = HugoDomainE(self)
+            unit_es[unit].i12ize_content_domain(unit_paths)
+        return self.assign_shards(domain, domain_e, unit_es)
+
+    def assign_shards(self, domain: str, domain_e: HugoDomainE,
+                      unit_es: Dict[str, HugoDomainE]) -> Dict[str, HugoDomainE]:
+        """Assign the units of a domain split by number of messages to shards, and merge their entries by shards.
+        The shard map and the content of the config are updated with the assignments
+        :param domain: the split domain, as in `Config.domain_files`
+        :param domain_e: extraction of the domain's files that don't belong to a unit
+        :param unit_es: extractions of the domain's units
+        :return: a dict with the domain's name and its shards' names as keys, and their extraction objects as values
+        """
+        hg_config = self.hg_config
+        split = hg_config.splits[domain]
+        domain_name = hg_config.get_domain_name(domain)
+        shards = split.pack({unit: len(unit_e.entries) for unit, unit_e in unit_es.items()},
+                            hg_config.shard_map.get(domain_name, {}))
+        hg_config.shard_map[domain_name] = shards
+        hg_config.content = hg_config.split_content()
+
+        domain_es = {domain_name: domain_e}
+        for unit, unit_e in unit_es.items():
+            shard_name = split.sub_domain_name(domain_name, unit, shards)
+            if shard_name in domain_es:
+                domain_es[shard_name].merge(unit_e)
+            else:
+                domain_es[shard_name] = unit_e
+        return domain_es
+
+    def i12ize(self, domains: Optional[Collection[str]] = None) -> Dict[str, HugoDomainE]:
+        """Extract messages from all source files
+        :param domains: content domains to extract, as in `Config.content`, all domains if `None`.
+        Data files, strings, and config fields belong to the default domain.
+        Domains split by number of messages are extracted as a whole if any of their shards is
+        :return: a dict with domain names as keys and the domains' extraction objects as values
+        """
+        hg_config = self.hg_config
+        if domains is not None:
+            requested_parents = {hg_config.domain_parents.get(domain, domain) for domain in domains}
+            domains = set(domains) | {domain for domain in requested_parents
+                                      if domain in hg_config.splits and hg_config.splits[domain].max_messages}
+        domain_es = {}
+        if domains is None or 'default' in domains:
+            self.i12ize_data_others()
+            domain_es[hg_config.default_domain_name] = self.default_domain_e
+        for domain in hg_config.domain_files:
+            split = hg_config.splits.get(domain)
+            if split and split.max_messages:
+                if domains is None or domain in domains:
+                    domain_es.update(self.i12ize_shards(domain))
+                continue
+            for sub_domain in [domain] + [d for d, parent in hg_config.domain_parents.items() if parent == domain]:
+                if domains is not None and sub_domain not in domains:
+                    continue
+                if sub_domain == 'default':
+                    self.default_domain_e.i12ize_content_domain(hg_config.content[sub_domain])
+                else:
+                    domain_e = HugoDomainE(self)
+                    domain_e.i12ize_content_domain(hg_config.content[sub_domain])
+                    domain_es[sub_domain] = domain_e
+        return domain_es
+
+    def extract(self, target_dir: str, domains: Optional[Collection[str]] = None):
+        """Extract messages to POT files, one per domain. POT files of the domains not extracted aren't touched
+        :param target_dir: path of the directory containing the POT files
+        :param domains: content domains to extract, see `i12ize`
+        """
         os.makedirs(target_dir, exist_ok=True)
-        self.i12ize_data_others()
-        for domain, domain_paths in self.hg_config.content.items():
-            if domain == 'default':
-                self.default_domain_e.i12ize_content_domain(domain_paths)
+        file_total_count = len(self.hg_config.data) + sum(len(paths) for paths in self.hg_config.content.values())
+        with self.progress.phase('extract', file_total_count):
+            self.write_pots(target_dir, self.i12ize(domains))
+
+    def write_pots(self, target_dir: str, domain_es: Dict[str, HugoDomainE]) -> int:
+        """Write a POT file per domain, and the shard map if domains are split by number of messages.
+        POT files whose messages are unchanged aren't rewritten, see `HugoDomainE.to_pot`
+        :param target_dir: path of the directory containing the POT files
+        :param domain_es: a dict with domain names as keys and the domains' extraction objects as values
+        :return: number of POT files written
+        """
+        written = 0
+        for domain_name, domain_e in domain_es.items():
+            if domain_e.to_pot(pot_path := f'{target_dir}/{domain_name}.pot'):
+                written += 1
             else:
-                domain_e = HugoDomainE(self)
-                domain_e.i12ize_content_domain(domain_paths)
-                domain_e.to_pot(f'{target_dir}/{domain}.pot')
-        self.default_domain_e.to_pot(f'{target_dir}/{self.hg_config.default_domain_name}.pot')
+                logging.info(f'{pot_path}: unchanged')
+        logging.info(f'POT files: {written} changed, {len(domain_es) - written} unchanged')
+        if self.hg_config.shard_map:
+            write_shard_map(self.hg_config.shard_map)
+        return written
 
 
 def extract(args):
@@ -76,8 +196,18 @@ def extract(args):
         - pot: path of the directory containing the target pot file(s)
         - customs (optional): path to Python file containing custom functions
         - config (optional): path to config file
+        - progress (optional): a `Progress` to emit progress events to
+        - cache (optional): location of a build cache, a local directory or an HTTP URL
+        - since (optional): a git ref, only domains with files changed since the ref are extracted
+        - file_jobs (optional): number of processes to extract a very large content file with, default 1
     :return: None. Data, config fields, and strings are extracted to the default domain,
     while content files are extracted to configured domains.
     """
     hg_config, mdi = initialize(RendererHugoI18N, args.customs, args.config)
-    Extraction(hg_config, mdi).extract(args.pot)
+    domains = None
+    if since := getattr(args, 'since', None):
+        domains = changed_domains(hg_config, detect_changes(hg_config, changed_files(since), since))
+        logging.info(f'Domains changed since {since}: {", ".join(sorted(domains)) if domains is not None else "all"}')
+    build_cache = open_build_cache(getattr(args, 'cache', None), hg_config)
+    Extraction(hg_config, mdi, progress=getattr(args, 'progress', None), build_cache=build_cache,
+               file_jobs=getattr(args, 'file_jobs', None) or 1).extract(args.pot, domains)
@@ -1,13 +1,14 @@
 # SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
-from typing import Sequence, List
+from typing import Sequence, List, Tuple
 
 from markdown_it.token import Token
 from markdown_it.utils import EnvType, OptionsDict
 from mdit_py_i18n import utils
 from mdit_py_i18n.renderer_i18n import MdCtx, RendererMarkdownI18N
 
+from .. import chunks
 from ..utils import HugoDomainEProtocol, HG_STOP, SHORTCODE_QUOTES
 
 
@@ -31,16 +32,41 @@ class RendererHugoI18N(RendererMarkdownI18N):
             - 'path': path of the source file
             - 'domain_extraction': an object compatible with `HugoDomainEProtocol`
             - 'with_line': whether to include line number in the extraction
+            - 'file_jobs' (optional): the number of processes to extract a very large file with, see `chunks`
         :return: None
         """
         md_ctx = HugoMdCtx(env)
 
-        for i, token in enumerate(tokens):
-            if token.type in self.rules:
-                r = self.rules[token.type](tokens, i, md_ctx)
+        jobs = env.get('file_jobs', 1)
+        if bounds := chunks.chunk_bounds(tokens, jobs):
+            domain_e = md_ctx.domain_e
+
+            # entries of a chunk are recorded in the worker, then added in order in this process
+            def extract_chunk(start: int, end: int) -> List[Tuple[str, int, str, str]]:
+                domain_e.recorded = []
+                self._render_tokens(tokens, start, end, HugoMdCtx(env))
+                return domain_e.recorded
+
+            for recorded in chunks.map_chunks(extract_chunk, bounds, jobs):
+                for msgid, line_num, comment, msgctxt in recorded:
+                    domain_e.add_entry(md_ctx.path, msgid, line_num, comment, msgctxt)
+        else:
+            self._render_tokens(tokens, 0, len(tokens), md_ctx)
+        self._link_ref(env, md_ctx)
+
+    def _render_tokens(self, tokens: Sequence[Token], start: int, end: int, md_ctx: HugoMdCtx):
+        """Extract messages from the tokens in [start, end), stopping at an `hg_stop` shortcode
+        """
+        for i in range(start, end):
+            if (token_type := tokens[i].type) in self.rules:
+                r = self.rules[token_type](tokens, i, md_ctx)
                 if r == -1:
                     break
-        self._link_ref(env, md_ctx)
+
+    @classmethod
+    def front_matter(cls, tokens: Sequence[Token], idx: int, md_ctx: HugoMdCtx):
+        token = tokens[idx]
+        md_ctx.domain_e.render_front_matter(md_ctx.path, token.content, token.markup, token.meta.get('front_matter'))
 
     @classmethod
     def inline(cls, tokens: Sequence[Token], idx: int, md_ctx: HugoMdCtx):
@@ -50,8 +76,8 @@ class RendererHugoI18N(RendererMarkdownI18N):
             if sc.meta['name'] == HG_STOP:
                 return -1
             sc_params_config = md_ctx.domain_e.e.hg_config.shortcodes.get('params', {})
-            sc_params_to_i12ize: List = sc_params_config.get(sc.meta['name'], [])
-            sc_params_to_i12ize.extend(sc_params_config.get('*', []))
+            # a new list, the config's lists must not grow with every shortcode
+            sc_params_to_i12ize: List = [*sc_params_config.get(sc.meta['name'], []), *sc_params_config.get('*', [])]
             sc_params_used = sc.meta['params']
             for param in sc_params_to_i12ize:
                 if param in sc_params_used:
@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import hashlib
+import os
+from typing import Dict, List, Union, Tuple
+
+import polib
+
+from ..compact_catalog import COMPACT_CATALOG_NAME, CompactCatalog, CompactDomainCatalog
+from ..utils import file_digest, SizedLRUCache
+
+# maximum total size of the catalog files of the languages kept by a `CatalogCache`
+DEFAULT_CATALOG_CACHE_SIZE = 64 * 1024 * 1024
+
+# {lang_code: {domain_name: catalog}}
+LangCatalogs = Dict[str, Dict[str, Union['DomainCatalog', CompactDomainCatalog]]]
+
+
+class MsgidTable:
+    """Interns the msgids of a domain used across the site, so that the catalogs of all languages share
+    one string object per msgid
+    """
+    def __init__(self):
+        self.msgids: Dict[str, str] = {}
+
+    def intern(self, msgid: str) -> str:
+        return self.msgids.setdefault(msgid, msgid)
+
+    def resolve(self, catalog: Dict[str, str]) -> 'DomainCatalog':
+        """Resolve a language's catalog against the table in one batch
+        :param catalog: a dict of msgids and their translations
+        :return: a `DomainCatalog`, keyed by the table's msgids
+        """
+        return DomainCatalog({self.intern(msgid): msgstr for msgid, msgstr in catalog.items()})
+
+
+class DomainCatalog:
+    """Translations of a domain in a language, keyed by the interned msgids of a `MsgidTable`
+    """
+    def __init__(self, translations: Dict[str, str]):
+        self.translations = translations
+
+    def l10n_func(self, msgid: str) -> str:
+        """Same as `gettext`: the message itself, not a copy, is returned when there's no translation
+        """
+        return self.translations.get(msgid, msgid)
+
+
+def read_mo(mo_path: str) -> Dict[str, str]:
+    """Read the singular messages of an MO file
+    :param mo_path: path of the MO file
+    :return: a dict of msgids and their translations
+    """
+    # plural forms and messages with a context aren't used
+    return {entry.msgid: entry.msgstr for entry in polib.mofile(mo_path)
+            if not entry.msgid_plural and not entry.msgctxt}
+
+
+def resolve_catalogs(raw: Dict[str, Dict[str, Dict[str, str]]]) -> LangCatalogs:
+    """Intern the msgids of all languages into one table per domain,
+    then resolve each language's catalogs against those tables
+    :param raw: a dict of languages and their catalogs, as dicts of msgids and translations, keyed by domain names
+    :return: a dict of languages and their catalogs keyed by domain names
+    """
+    tables: Dict[str, MsgidTable] = {}
+    return {lang_code: {domain_name: tables.setdefault(domain_name, MsgidTable()).resolve(catalog)
+                        for domain_name, catalog in domain_catalogs.items()}
+            for lang_code, domain_catalogs in raw.items()}
+
+
+def load_catalogs(lang_codes: List[str], locale_dir: str = 'locale') -> LangCatalogs:
+    """Load the catalogs of all languages.
+    A language's compact catalog file is memory-mapped if there's one, otherwise its MO files are read and resolved,
+    see `resolve_catalogs`
+    :param lang_codes: the languages to load
+    :param locale_dir: directory containing MO files, in the form of {locale_dir}/{lang}/LC_MESSAGES/{domain}.mo,
+    and compact catalog files, in the form of {locale_dir}/{lang}/catalog.hgc
+    :return: a dict of languages and their catalogs keyed by domain names
+    """
+    raw: Dict[str, Dict[str, Dict[str, str]]] = {}
+    compact: LangCatalogs = {}
+    for lang_code in lang_codes:
+        if os.path.isfile(compact_path := f'{locale_dir}/{lang_code}/{COMPACT_CATALOG_NAME}'):
+            catalog = CompactCatalog(compact_path)
+            compact[lang_code] = {domain_name: catalog.domain(domain_name) for domain_name in catalog.domain_names}
+            continue
+        mo_dir = f'{locale_dir}/{lang_code}/LC_MESSAGES'
+        if not os.path.isdir(mo_dir):
+            continue
+        raw[lang_code] = {mo[:-3]: read_mo(f'{mo_dir}/{mo}')
+                          for mo in sorted(os.listdir(mo_dir)) if mo.endswith('.mo')}
+    return {**resolve_catalogs(raw), **compact}
+
+
+def _catalog_paths(lang_code: str, locale_dir: str) -> List[str]:
+    paths = [f'{locale_dir}/{lang_code}/{COMPACT_CATALOG_NAME}']
+    if os.path.isdir(mo_dir := f'{locale_dir}/{lang_code}/LC_MESSAGES'):
+        paths.extend(f'{mo_dir}/{mo}' for mo in sorted(os.listdir(mo_dir)) if mo.endswith('.mo'))
+    return [path for path in paths if os.path.isfile(path)]
+
+
+def catalog_key(lang_code: str, locale_dir: str = 'locale') -> Tuple:
+    """Identify the catalogs of a language by the content of its catalog files
+    :return: names and digests of the language's catalog files, equal for languages compiled from the same PO files
+    """
+    return tuple((os.path.basename(path), file_digest(path)) for path in _catalog_paths(lang_code, locale_dir))
+
+
+def catalog_digest(lang_code: str, locale_dir: str = 'locale') -> str:
+    """Digest of `catalog_key`, as a string
+    """
+    return hashlib.sha256(repr(catalog_key(lang_code, locale_dir)).encode()).hexdigest()
+
+
+class CatalogCache:
+    """Catalogs loaded by earlier runs, e.g. for other sites, reused for languages whose catalog files have
+    the same content. The least recently used catalogs are dropped beyond a total size of catalog files
+    """
+    def __init__(self, max_size: int = DEFAULT_CATALOG_CACHE_SIZE):
+        """
+        :param max_size: maximum total size of the catalog files of the languages kept
+        """
+        # {catalog key: {domain_name: catalog}}
+        self.entries = SizedLRUCache(max_size)
+
+    def load(self, lang_codes: List[str], locale_dir: str = 'locale') -> LangCatalogs:
+        """Same as `load_catalogs`, only languages not loaded yet are loaded
+        """
+        keys = {lang_code: key for lang_code in lang_codes if (key := catalog_key(lang_code, locale_dir))}
+        catalogs = {lang_code: lang_catalogs for lang_code, key in keys.items()
+                    if (lang_catalogs := self.entries.get(key)) is not None}
+        missing = [lang_code for lang_code in keys if lang_code not in catalogs]
+        for lang_code, lang_catalogs in load_catalogs(missing, locale_dir).items():
+            catalogs[lang_code] = lang_catalogs
+            size = sum(os.path.getsize(path) for path in _catalog_paths(lang_code, locale_dir))
+            self.entries.put(keys[lang_code], lang_catalogs, size)
+        return {lang_code: catalogs[lang_code] for lang_code in keys if lang_code in catalogs}
@@ -1,16 +1,17 @@
 # SPDX-FileCopyrightText: 2021 Phu Hung Nguyen <phuhnguyen@outlook.com>
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
+import copy
 import os
-from typing import Set, Tuple, List, Optional
+from typing import Set, Tuple, List, Optional, Callable
 
 import yaml
-from markdown_gettext.domain_generation import gettext_func
 from markdown_it import MarkdownIt
 from mdit_py_i18n import utils
 from mdit_py_i18n.utils import L10NFunc, L10NResult
 
-from ..utils import HugoLangGProtocol
+from ..build_cache import text_digest
+from ..utils import HugoLangGProtocol, Source
 
 DEFAULT_RATE_THRESHOLD = 0.75
 
@@ -19,9 +20,28 @@ class HugoDomainG:
     """
     Implements `HugoDomainGProtocol`
     """
-    def __init__(self, lang_g: HugoLangGProtocol, l10n_func: L10NFunc):
+    def __init__(self, lang_g: HugoLangGProtocol, l10n_func: L10NFunc, domain_name: str = ''):
+        """
+        :param domain_name: name of the domain, keys its segments in the segment cache of the language
+        """
         self.lang_g = lang_g
         self.l10n_func = l10n_func
+        self.domain_name = domain_name
+
+    def localize_segment(self, kind: str, source: str, localize: Callable[[], L10NResult]) -> L10NResult:
+        """Get a localized segment from the segment cache of the language, or localize and cache it.
+        Segments are keyed by the domain name too, so that domains don't share results.
+        :param kind: kind of the segment, segments of different kinds are localized differently
+        :param source: the source segment
+        :param localize: function localizing the segment when it's not in the cache. Its result mustn't be modified
+        :return: an `L10NResult` of the segment
+        """
+        segments = self.lang_g.l10n_segments
+        key = (kind, self.domain_name, source)
+        if (result := segments.get(key)) is None:
+            result = localize()
+            segments.put(key, result, len(source) + len(result.localized))
+        return result
 
     def localize_object_string(self, s: str, mdi: Optional[MarkdownIt]) -> L10NResult:
         """Localize `s` as Markdown using `mdi` if it's provided, otherwise, using `l10n_func`.
@@ -34,7 +54,7 @@ class HugoDomainG:
                 'parse_fence': self.lang_g.g.hg_config.parse_fence,
                 'domain_generation': self
             }
-            _, content_result = mdi.render(s, env)
+            content_result = self.localize_segment('markdown', s, lambda: mdi.render(s, env)[1])
         else:
             localized_s = self.l10n_func(s)
             # in front matters only count translations that are different from source messages
@@ -76,6 +96,23 @@ class HugoDomainG:
             return L10NResult(o, total_count, l10n_count)
         return L10NResult(o, total_count, l10n_count)
 
+    def count_object(self, o, excluded_keys: Set[str]) -> L10NResult:
+        """Count strings and translations of an object the way `localize_object` does without `mdi`,
+        leaving the object as it is
+        :return: an `L10NResult` with `o` as the localized object
+        """
+        total_count, l10n_count = 0, 0
+        if isinstance(o, str) and o and not utils.SPACES_PATTERN.fullmatch(o):
+            return L10NResult(o, 1, 1 if self.l10n_func(o) != o else 0)
+        if isinstance(o, list) or isinstance(o, dict):
+            for key, value in (enumerate(o) if isinstance(o, list) else o.items()):
+                if key in excluded_keys:
+                    continue
+                item_result = self.count_object(value, excluded_keys)
+                total_count += item_result.total_count
+                l10n_count += item_result.l10n_count
+        return L10NResult(o, total_count, l10n_count)
+
     def _process_fm_conditions(self, fm):
         hg_config = self.lang_g.g.hg_config
         l10n_results = self.lang_g.l10n_results
@@ -98,22 +135,21 @@ class HugoDomainG:
                 if domain == 'default':
                     domain = hg_config.default_domain_name
 
-                l10n_func = gettext_func(domain)
                 if item == 'strings':
                     if not hg_config.do_strings or not src_strings:
                         continue
                     strings_result = self.lang_g.localize_strings()
                     rate = strings_result.rate
                 else:
-                    cond_fm_result, content_result = self.__class__(self.lang_g, l10n_func).render_content_file(item)
+                    # counts are enough, the file is rendered in its own turn if it's translated enough
+                    domain_g = self.__class__(self.lang_g, self.lang_g.get_l10n_func(domain), domain)
+                    cond_fm_result, content_result = domain_g.count_content_file(item)
                     rate = (cond_fm_result + content_result).rate
             else:
                 if item == 'strings':
                     rate = l10n_results[item][0].rate
                 else:
-                    cond_fm_result = l10n_results[item][0]
-                    content_result = l10n_results[item][1]
-                    rate = cond_fm_result.sum_rate_with(content_result)
+                    rate = (l10n_results[item][0] + l10n_results[item][1]).rate
             if rate < threshold:
                 fm['i18n_configs']['warning'] = True
                 conditions_met = False
@@ -122,8 +158,11 @@ class HugoDomainG:
         if conditions_met and 'i18n_configs' in fm and 'warning' in fm['i18n_configs']:
             del fm['i18n_configs']['warning']
 
-    def render_front_matter(self, content: str, markup: str) -> L10NResult:
-        fm = yaml.safe_load(content)
+    def render_front_matter(self, content: str, markup: str, fm=None) -> L10NResult:
+        """
+        :param fm: the front matter already parsed from `content`, if any. It's copied, as it's localized in place
+        """
+        fm = yaml.safe_load(content) if fm is None else copy.deepcopy(fm)
 
         fm_result = self.localize_object(fm, self.lang_g.g.hg_config.excluded_keys)
         self._process_fm_conditions(fm)
@@ -132,41 +171,155 @@ class HugoDomainG:
         fm_result.localized = f'{markup}\n{rendered_localized_fm}\n{markup}\n'
         return fm_result
 
-    def render_content_file(self, path: str) -> Tuple[L10NResult, L10NResult]:
-        if path in self.lang_g.l10n_results:
-            results = self.lang_g.l10n_results[path]
+    def count_front_matter(self, content: str, fm=None) -> L10NResult:
+        """
+        :param fm: the front matter already parsed from `content`, if any
+        :return: an `L10NResult` of the front matter with an empty localized text, see `count_object`
+        """
+        fm = yaml.safe_load(content) if fm is None else fm
+        fm_result = self.count_object(fm, self.lang_g.g.hg_config.excluded_keys)
+        return L10NResult('', fm_result.total_count, fm_result.l10n_count)
+
+    def get_source(self, path: str) -> Source:
+        """
+        :return: the source of a content file, from the source cache if there's one
+        """
+        if self.lang_g.g.sources:
+            return self.lang_g.g.sources.get(path)
+        return Source(self.lang_g.g.files.read_text(path), self.lang_g.g.mdi)
+
+    def _keep_counts(self, path: str, fm_result: L10NResult, content_result: L10NResult):
+        self.lang_g.l10n_results[path] = [L10NResult('', fm_result.total_count, fm_result.l10n_count),
+                                          L10NResult('', content_result.total_count, content_result.l10n_count)]
+
+    def count_content_file(self, path: str, source: Optional[Source] = None) -> Tuple[L10NResult, L10NResult]:
+        """Count messages and translations of a content file without rendering it, see `RendererHugoL10N.count`,
+        or get the counts from `l10n_results` if it's counted or rendered already.
+        Counts are kept in `l10n_results` like those of rendered files.
+        :param path: path of the source file
+        :param source: the source of the file if it's at hand already
+        :return: results of the front matter and the content, with empty localized texts
+        """
+        if (results := self.lang_g.l10n_results.get(path)) is not None:
             return results[0], results[1]
-        with open(path) as f_content:
+        source = source or self.get_source(path)
+        env = {
+            'parse_fence': self.lang_g.g.hg_config.parse_fence,
+            'domain_generation': self
+        }
+        fm_result, content_result = self.lang_g.g.mdi.renderer.count(source.tokens, {**source.env, **env})
+        self._keep_counts(path, fm_result, content_result)
+        return fm_result, content_result
+
+    @staticmethod
+    def has_conditions(source: Source) -> bool:
+        """
+        :return: whether the front matter of a content file has `i18n_configs.conditions`. The file is only parsed
+        if its text mentions `i18n_configs`
+        """
+        return 'i18n_configs' in source.text and bool((source.front_matter.get('i18n_configs') or {}).get('conditions'))
+
+    def render_content_file(self, path: str, source: Optional[Source] = None) -> Tuple[L10NResult, L10NResult]:
+        """Render a content file, or get the results from the text cache of the language if it's rendered already,
+        or from the build cache if it's rendered with the same catalogs before, e.g. on another machine.
+        Only counts of the results are kept for the whole language run in `l10n_results`,
+        the localized texts are kept in the size-bounded `l10n_texts` until released by `generate_content_domain`.
+        :param path: path of the source file
+        :param source: the source of the file if it's at hand already
+        :return: results of the front matter and the content
+        """
+        if (results := self.lang_g.l10n_texts.get(path)) is not None:
+            return results
+        source = source or self.get_source(path)
+        text = source.text
+        build_cache = self.lang_g.g.build_cache
+        key = ''
+        # conditions depend on other files, so files with them aren't cached
+        if build_cache and not self.has_conditions(source):
+            key = build_cache.key('generate', self.lang_g.lang_code, self.lang_g.catalog_digest, text_digest(text))
+        if key and (cached := build_cache.get(key)) is not None:
+            fm_result, content_result = L10NResult(*cached[0]), L10NResult(*cached[1])
+        else:
             env = {
                 'parse_fence': self.lang_g.g.hg_config.parse_fence,
-                'domain_generation': self
+                'domain_generation': self,
+                'file_jobs': self.lang_g.g.file_jobs
             }
-            fm_result, content_result = self.lang_g.g.mdi.render(f_content.read(), env)
-            self.lang_g.l10n_results[path] = [fm_result, content_result]
-            return fm_result, content_result
+            fm_result, content_result = source.render(self.lang_g.g.mdi, env)
+            if key:
+                build_cache.put(key, [[r.localized, r.total_count, r.l10n_count] for r in (fm_result, content_result)])
+        self._keep_counts(path, fm_result, content_result)
+        self.lang_g.l10n_texts.put(path, (fm_result, content_result),
+                                   len(fm_result.localized) + len(content_result.localized))
+        return fm_result, content_result
+
+    def mirror_resources(self, src_path: str):
+        """Mirror the resources of the page bundle of a content file next to its target file, with `genToOtherDir`.
+        Resources are hardlinked, not copied for every language
+        """
+        hg_config = self.lang_g.g.hg_config
+        files = self.lang_g.g.files
+        target_dir = f'{hg_config.gen_dir}/{self.lang_g.hugo_lang_code}/'
+        for resource_path in files.bundle_resources(src_path):
+            files.mirror_file(resource_path, resource_path.replace(f'{hg_config.src_dir}/', target_dir))
 
     def write_content_file(self, fm: str, content: str, src_path: str):
         hg_config = self.lang_g.g.hg_config
         hugo_lang_code = self.lang_g.hugo_lang_code
+        files = self.lang_g.g.files
         if hg_config.gen_to_other_dir:
             target_path = src_path.replace(f'{hg_config.src_dir}/',
                                            f'{hg_config.gen_dir}/{hugo_lang_code}/')
+            self.mirror_resources(src_path)
         else:
             extension = os.path.splitext(src_path)[1]
             basename = os.path.splitext(src_path)[0].split('.')[0]
             target_path = f'{basename}.{hugo_lang_code}{extension}'
-        os.makedirs(os.path.dirname(target_path), exist_ok=True)
-        with open(target_path, 'w+') as f_target:
-            f_target.write(fm)
-            f_target.write(content)
+        files.write_text(target_path, fm + content)
+
+    @staticmethod
+    def is_translated(fm_result: L10NResult, content_result: L10NResult) -> bool:
+        """
+        :return: whether a content file with these results is translated enough to be written
+        """
+        return fm_result.l10n_count > 0 or content_result.rate == -1 or content_result.rate > 0.5
+
+    def generate_content_file(self, src_path: str) -> bool:
+        """Render a content file and write it if it's translated enough.
+        Unless the file is rendered already or a build cache may have it, it's counted first,
+        and only rendered if the counts show it's translated enough
+        :return: whether the file is written
+        """
+        if self.lang_g.l10n_texts.get(src_path) is None and not self.lang_g.g.build_cache:
+            source = self.get_source(src_path)
+            if not self.is_translated(*self.count_content_file(src_path, source)):
+                return False
+        else:
+            source = None
+        fm_result, content_result = self.render_content_file(src_path, source)
+        written = self.is_translated(fm_result, content_result)
+        if written:
+            # print(f'{src_path}: {fm_result}; {content_result}')
+            self.write_content_file(fm_result.localized, content_result.localized, src_path)
+        # the text isn't needed anymore, only counts are kept for conditions
+        self.lang_g.l10n_texts.pop(src_path)
+        return written
 
     def generate_content_domain(self, domain_paths: List[str]):
         file_l10n_count = 0
+        journal = self.lang_g.g.journal
+        lang_code = self.lang_g.lang_code
         for src_path in domain_paths:
-            if os.path.isfile(src_path):
-                fm_result, content_result = self.render_content_file(src_path)
-                if fm_result.l10n_count > 0 or content_result.rate == -1 or content_result.rate > 0.5:
-                    # print(f'{src_path}: {fm_result}; {content_result}')
-                    self.write_content_file(fm_result.localized, content_result.localized, src_path)
-                    file_l10n_count += 1
+            if self.lang_g.g.files.is_file(src_path):
+                if journal and (written := journal.file_written(lang_code, src_path)) is not None:
+                    # staged by the run being resumed, mirrors aren't staged though
+                    if written and self.lang_g.g.hg_config.gen_to_other_dir:
+                        self.mirror_resources(src_path)
+                else:
+                    written = self.generate_content_file(src_path)
+                    if journal:
+                        journal.file_done(lang_code, src_path, written,
+                                          journal.source_digest(self.lang_g.g.files, src_path))
+                file_l10n_count += written
+                self.lang_g.g.progress.file_processed(self.lang_g.g.phase, src_path, lang_code)
         return file_l10n_count
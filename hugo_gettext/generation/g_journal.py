@@ -0,0 +1,186 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Checkpoints of generation runs, so that a run that didn't finish can be resumed.
+
+The journal is a newline-delimited JSON file, appended to as the run goes: a header identifying the run, then for
+each language, a record when it starts with the digest of its catalogs, a record per content file done with the
+digest of its source, and a record when it's done with its counts and its config section. Target files are staged
+before they're recorded, and the staging directory is kept for the next run, so a resumed run skips what's recorded
+and stages only the rest. Files whose sources changed since are generated again, along with their languages.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional, Any, Tuple, List
+
+from .g_catalog import catalog_digest
+from .g_selection import Selection
+from ..build_cache import text_digest
+from ..changes import _condition_items, condition_dependents
+from ..config import Config
+from ..utils import SiteFiles
+
+JOURNAL_PATH = '.hugo_gettext_journal.ndjson'
+
+
+def run_key(hg_config: Config, selection: Selection) -> str:
+    """
+    :return: a digest of what a run depends on, apart from catalogs and content files: the config,
+    except for the sections of target languages, which runs write, the string file, and the selection
+    """
+    hugo_config = hg_config.hugo_config
+    languages = hugo_config.get('languages', {})
+    strings = None
+    if hg_config.do_strings and hg_config.string_file_path and os.path.isfile(hg_config.string_file_path):
+        with open(hg_config.string_file_path) as f:
+            strings = text_digest(f.read())
+    inputs = {
+        'config': {key: value for key, value in hugo_config.items() if key != 'languages'},
+        'default_language': languages.get(hg_config.default_lang),
+        'strings': strings,
+        'selection': [selection.lang_codes, selection.domains, selection.path_patterns],
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class GenerationJournal:
+    def __init__(self, key: str, path: str = JOURNAL_PATH):
+        """
+        :param key: identifies the run, see `run_key`
+        :param path: path of the journal file
+        """
+        self.key = key
+        self.path = path
+        # languages done, {lang_code: {'file_l10n_count': int, 'data_qualified': bool, 'section': dict or None}}
+        self.langs: Dict[str, Dict[str, Any]] = {}
+        # content files done, {lang_code: {path: (written, digest of the source)}}
+        self.files: Dict[str, Dict[str, Tuple[bool, str]]] = {}
+        # digests of the sources read in this run, {path: digest}
+        self.digests: Dict[str, str] = {}
+        self._file = None
+
+    def load(self) -> bool:
+        """Read the journal of a run that didn't finish
+        :return: whether the run can be resumed: it's the same run, it didn't reach the commit of target files,
+        and the catalogs of its languages haven't changed since
+        """
+        if not os.path.isfile(self.path):
+            return False
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f if line.endswith('\n')]
+        if not records or records[0].get('key') != self.key:
+            return False
+        for record in records[1:]:
+            lang_code = record.get('lang')
+            if 'catalog' in record:
+                if record['catalog'] != catalog_digest(lang_code):
+                    logging.info(f'Catalogs of {lang_code} changed, the run is started over')
+                    return False
+                self.files[lang_code] = {}
+            elif 'path' in record:
+                self.files[lang_code][record['path']] = (record['written'], record['digest'])
+                # files are only done after their language when it's generated again
+                self.langs.pop(lang_code, None)
+            elif 'done' in record:
+                self.langs[lang_code] = record['done']
+            elif record.get('commit'):
+                # some staged files may have been moved into place already
+                return False
+        return True
+
+    def source_digest(self, files: SiteFiles, path: str) -> str:
+        """
+        :return: the digest of the source of a content file, read once per run
+        """
+        if (digest := self.digests.get(path)) is None:
+            digest = self.digests[path] = text_digest(files.read_text(path))
+        return digest
+
+    def check_sources(self, files: SiteFiles):
+        """Forget the content files whose sources changed or were removed since they were done, along with the
+        files whose conditions depend on them, and the languages they were done in, so that they're generated again.
+        A changed string file changes the run, see `run_key`
+        :param files: the site's files
+        """
+        conditions: Optional[Dict[str, List[str]]] = None
+        for lang_code, lang_files in self.files.items():
+            changed = {path for path, (_, digest) in lang_files.items()
+                       if not files.is_file(path) or self.source_digest(files, path) != digest}
+            if changed:
+                if conditions is None:
+                    conditions = self._conditions(files)
+                changed |= condition_dependents(conditions, changed)
+            for path in changed & lang_files.keys():
+                del lang_files[path]
+            if changed and self.langs.pop(lang_code, None) is not None:
+                logging.info(f'Source files of {lang_code} changed, the language is generated again')
+
+    def _conditions(self, files: SiteFiles) -> Dict[str, List[str]]:
+        """
+        :return: items of the conditions of the content files done, see `changes._condition_items`
+        """
+        conditions = {}
+        for path in {path for lang_files in self.files.values() for path in lang_files}:
+            if files.is_file(path) and (items := _condition_items(files.read_text(path))):
+                conditions[path] = items
+        return conditions
+
+    def clear(self):
+        self.langs, self.files, self.digests = {}, {}, {}
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def _record(self, record: Dict):
+        if self._file is None:
+            is_new = not os.path.isfile(self.path)
+            self._file = open(self.path, 'a')
+            if is_new:
+                self._file.write(json.dumps({'key': self.key}) + '\n')
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def lang_started(self, lang_code: str):
+        if lang_code not in self.files:
+            self.files[lang_code] = {}
+            self._record({'lang': lang_code, 'catalog': catalog_digest(lang_code)})
+
+    def file_done(self, lang_code: str, path: str, written: bool, digest: str):
+        """
+        :param digest: digest of the file's source, see `source_digest`
+        """
+        self.files[lang_code][path] = (written, digest)
+        self._record({'lang': lang_code, 'path': path, 'written': written, 'digest': digest})
+
+    def file_written(self, lang_code: str, path: str) -> Optional[bool]:
+        """
+        :return: whether the file was written if it's done in the language, `None` if it isn't done
+        """
+        if (done := self.files.get(lang_code, {}).get(path)) is None:
+            return None
+        return done[0]
+
+    def lang_done(self, lang_code: str, file_l10n_count: int, data_qualified: bool, section: Optional[Dict]):
+        """
+        :param section: the language's config section if generation added or changed it
+        """
+        self.langs[lang_code] = done = {'file_l10n_count': file_l10n_count, 'data_qualified': data_qualified,
+                                        'section': section}
+        self._record({'lang': lang_code, 'done': done})
+
+    def committing(self):
+        """Record that target files start being moved into place, past which the run can't be resumed
+        """
+        self._record({'commit': True})
+
+    def close(self, finished: bool = False):
+        """
+        :param finished: whether the run finished, then the journal is removed
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if finished:
+            self.clear()
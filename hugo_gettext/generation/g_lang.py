@@ -4,16 +4,16 @@
 
 import copy
 import logging
-import os
+import time
 from typing import List, Dict
 
-from markdown_gettext.domain_generation import gettext_func
-from mdit_py_i18n.utils import L10NResult
+from mdit_py_i18n.utils import L10NResult, L10NFunc
 
+from .g_catalog import catalog_digest
 from .g_domain import HugoDomainG
-from .. import utils
-from ..utils import HugoGProtocol, TextFormat
+from ..utils import HugoGProtocol, TextFormat, SizedLRUCache
 
+# counts of results, localized texts are dropped, except for strings
 L10NResults = Dict[str, List[L10NResult]]
 
 
@@ -25,9 +25,37 @@ class HugoLangG:
         self.g = g
         self.lang_code = lang_code
         self.hugo_lang_code = self.g.hg_config.convert_lang_code(self.lang_code)
+        # identifies the catalogs in build cache keys
+        self.catalog_digest = catalog_digest(lang_code) if self.g.build_cache else ''
         self.l10n_results: L10NResults = {}
+        # texts of results, of files rendered before their turn to be written, e.g. to check conditions
+        self.l10n_texts = SizedLRUCache(self.g.text_cache_size)
+        # localized segments keyed by their sources, see `HugoDomainG.localize_segment`
+        self.l10n_segments = SizedLRUCache(self.g.segment_cache_size)
         self.file_l10n_count = 0
         self.default_domain_g = None
+        # whether the language meets the requirements to have its data files generated
+        self.data_qualified = False
+
+    def get_l10n_func(self, domain_name: str) -> L10NFunc:
+        """Get the function translating messages of a domain to this language.
+        The function is bound to this language instead of relying on the `LANGUAGE` env. var.,
+        so that several languages can be used alternately.
+        :param domain_name: name of the domain
+        :return: a lookup in the domain's catalog, or an identity function if there's no catalog
+        """
+        if (catalog := self.g.catalogs.get(self.lang_code, {}).get(domain_name)) is not None:
+            return catalog.l10n_func
+
+        def l10n_func(x): return x
+        return l10n_func
+
+    def make_domain_g(self, domain_name: str) -> HugoDomainG:
+        """
+        :param domain_name: name of the domain
+        :return: a `HugoDomainG` localizing the domain's messages to this language
+        """
+        return HugoDomainG(self, self.get_l10n_func(domain_name), domain_name)
 
     def localize_strings(self) -> L10NResult:
         l10n_results = self.l10n_results
@@ -50,8 +78,8 @@ class HugoLangG:
         if len(target_strings) > 0:
             text_format = TextFormat.decide_by_path(self.g.hg_config.string_file_path)
             file_path = f'i18n/{self.hugo_lang_code}{text_format.value}'
-            utils.write_file(file_path, target_strings)
-            logging.info(file_path)
+            self.g.files.write_obj(file_path, target_strings)
+            self.g.progress.file_processed(self.g.phase, file_path, self.lang_code)
 
     def localize_languages(self):
         hg_config = self.g.hg_config
@@ -92,22 +120,23 @@ class HugoLangG:
         hugo_config['languages'][self.hugo_lang_code]['title'] = (
             self.default_domain_g.l10n_func(hugo_config['languages'][self.g.hg_config.default_lang]['title']))
 
-    def generate_data_files(self):
-        for path, data in self.g.src_data.items():
-            # make a copy because other languages need to use this too
-            data = copy.deepcopy(data)
-            src_sub_path = path.split('/', 1)[1]
-            target_path = f'data/{self.hugo_lang_code}/{src_sub_path}'
-            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    def generate_data_file(self, path: str, data):
+        """Localize a data file in-place and write it if anything is translated
+        :param path: path of the source data file
+        :param data: the loaded data, owned by this call
+        """
+        src_sub_path = path.split('/', 1)[1]
+        target_path = f'data/{self.hugo_lang_code}/{src_sub_path}'
 
-            o_result = self.default_domain_g.localize_object(data, self.g.hg_config.excluded_data_keys, self.g.mdi)
-            if o_result.l10n_count > 0:
-                utils.write_file(target_path, data)
+        o_result = self.default_domain_g.localize_object(data, self.g.hg_config.excluded_data_keys, self.g.mdi)
+        if o_result.l10n_count > 0:
+            self.g.files.write_obj(target_path, data)
 
     def generate_data_others(self):
         """Generate string file and data files, and localize config fields.
         String file will be generated even if the language doesn't meet requirements.
         Config fields and data files won't.
+        Data files are generated later for all qualified languages at once, see `Generation.generate_data_files`.
         """
         hg_config = self.g.hg_config
         file_total_count = self.g.file_total_count
@@ -144,36 +173,76 @@ class HugoLangG:
             self.localize_description()
         if hg_config.do_title:
             self.localize_title()
-        if self.g.src_data:
-            self.generate_data_files()
+        self.data_qualified = True
 
     def generate_lang(self):
-        os.environ["LANGUAGE"] = self.lang_code
         hg_config = self.g.hg_config
-        for domain, domain_paths in hg_config.content.items():
+        start = time.perf_counter()
+        for domain, domain_paths in self.g.content.items():
             domain_name = domain if domain != 'default' else hg_config.default_domain_name
-            mo_path = f'locale/{self.lang_code}/LC_MESSAGES/{domain_name}.mo'
-            if os.path.isfile(mo_path):
-                l10n_func = gettext_func(domain_name)
             # ensure generate_content_domain is still called even when a language has no file for the domain,
             #   so that, for example, a language that only has string translations and no file translation
             #   can still be qualified if there are files with no content to be translated
-            else:
-                def l10n_func(x): return x
-            domain_g = HugoDomainG(self, l10n_func)
+            domain_g = self.make_domain_g(domain_name)
             if domain_name == hg_config.default_domain_name:
                 self.default_domain_g = domain_g
             self.file_l10n_count += domain_g.generate_content_domain(domain_paths)
+        if self.g.selection.is_partial:
+            self.file_l10n_count += self.count_unselected()
+        self.finish_lang(start)
+
+    def count_unselected(self) -> int:
+        """Count the content files left out of a partial run, without rendering them,
+        so that the language is qualified the same way as in a full run
+        :return: the number of those files translated enough to be written
+        """
+        hg_config = self.g.hg_config
+        file_l10n_count = 0
+        for domain, domain_paths in hg_config.content.items():
+            selected = set(self.g.content.get(domain, []))
+            domain_name = domain if domain != 'default' else hg_config.default_domain_name
+            domain_g = self.make_domain_g(domain_name)
+            for path in domain_paths:
+                if path not in selected and self.g.files.is_file(path):
+                    file_l10n_count += domain_g.is_translated(*domain_g.count_content_file(path))
+        return file_l10n_count
+
+    def resume(self, done: Dict):
+        """Take the results of the language from the journal of a run that didn't finish instead of generating it,
+        see `GenerationJournal`. Its target files are staged already
+        :param done: the language's record in the journal
+        """
+        hg_config = self.g.hg_config
+        self.file_l10n_count = done['file_l10n_count']
+        self.data_qualified = done['data_qualified']
+        if done['section'] is not None:
+            hg_config.hugo_config['languages'][self.hugo_lang_code] = done['section']
+        self.default_domain_g = self.make_domain_g(hg_config.default_domain_name)
+        if hg_config.gen_to_other_dir:
+            for path, (written, _) in self.g.journal.files.get(self.lang_code, {}).items():
+                if written:
+                    self.default_domain_g.mirror_resources(path)
+        self.g.progress.language_done(self.g.phase, self.lang_code, 0.0, self.file_l10n_count,
+                                      self.g.file_total_count)
+
+    def finish_lang(self, start: float):
+        """Generate strings and config fields once content files are generated, then release what was kept
+        for the language's content files
+        :param start: when the language's generation started, as given by `time.perf_counter`
+        """
+        hg_config = self.g.hg_config
         if self.default_domain_g is None:
-            mo_path = f'locale/{self.lang_code}/LC_MESSAGES/{hg_config.default_domain_name}.mo'
-            if os.path.isfile(mo_path):
-                default_func = gettext_func(hg_config.default_domain_name)
-            # ensure default_func is not None and thus generate_others is still called even when a language
+            # ensure default_domain_g is not None and thus generate_others is still called even when a language
             #   has no file for the default domain, so that the language can still be qualified
-            else:
-                def default_func(x): return x
-            self.default_domain_g = HugoDomainG(self, default_func)
-        logging.info(f'{self.hugo_lang_code} [{self.file_l10n_count}/{self.g.file_total_count}]')
-
+            self.default_domain_g = self.make_domain_g(hg_config.default_domain_name)
         if self.default_domain_g is not None:
             self.generate_data_others()
+        self.g.progress.language_done(self.g.phase, self.lang_code, time.perf_counter() - start,
+                                      self.file_l10n_count, self.g.file_total_count)
+        segments = self.l10n_segments
+        logging.debug(f'{self.hugo_lang_code} segments: {segments.hits} hits, {segments.misses} misses')
+        # results and segments are only needed while processing this language, don't hold them until data files
+        #   are generated
+        self.l10n_results = {}
+        self.l10n_texts.clear()
+        segments.clear()
@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import fnmatch
+from typing import Dict, List, Optional
+
+
+class Selection:
+    """Restricts generation to some languages, content domains, and source files. `None` means no restriction.
+    Pages and strings that selected pages depend on through `i18n_configs.conditions` are still rendered
+    for the checks, they just aren't written. Content files that aren't selected are still counted, so that
+    languages get their config sections and data files in the same cases as in a full run.
+    """
+    def __init__(self,
+                 lang_codes: Optional[List[str]] = None,
+                 domains: Optional[List[str]] = None,
+                 path_patterns: Optional[List[str]] = None):
+        """
+        :param lang_codes: gettext codes of the languages to generate
+        :param domains: content domains to generate, either as in the config or by their gettext domain names
+        :param path_patterns: glob patterns of content and data files to generate, `*` also matches `/`
+        """
+        self.lang_codes = lang_codes
+        self.domains = domains
+        self.path_patterns = path_patterns
+
+    @property
+    def is_partial(self) -> bool:
+        return self.lang_codes is not None or self.domains is not None or self.path_patterns is not None
+
+    def has_lang(self, lang_code: str) -> bool:
+        return self.lang_codes is None or lang_code in self.lang_codes
+
+    def has_domain(self, domain: str, domain_name: str) -> bool:
+        return self.domains is None or domain in self.domains or domain_name in self.domains
+
+    def has_path(self, path: str) -> bool:
+        return self.path_patterns is None or any(fnmatch.fnmatchcase(path, p) for p in self.path_patterns)
+
+    def select_content(self, content: Dict[str, List[str]], default_domain_name: str) -> Dict[str, List[str]]:
+        """
+        :param content: content files grouped by domains, as in `Config.content`
+        :param default_domain_name: name of the default domain
+        :return: the selected content files grouped by domains
+        """
+        return {domain: [p for p in domain_paths if self.has_path(p)]
+                for domain, domain_paths in content.items()
+                if self.has_domain(domain, domain if domain != 'default' else default_domain_name)}
+
+    def select_data(self, data: List[str], default_domain_name: str) -> List[str]:
+        """Data files belong to the default domain
+        :param data: data files, as in `Config.data`
+        :param default_domain_name: name of the default domain
+        :return: the selected data files
+        """
+        if not self.has_domain('default', default_domain_name):
+            return []
+        return [p for p in data if self.has_path(p)]
@@ -2,16 +2,27 @@
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
 import copy
+import glob
+import logging
 import os
 import shutil
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional
 
 from markdown_it import MarkdownIt
 
+from .g_catalog import load_catalogs, LangCatalogs, CatalogCache
+from .g_journal import GenerationJournal, run_key
 from .g_lang import HugoLangG
+from .g_selection import Selection
 from .renderer_hugo_l10n import RendererHugoL10N
 from .. import utils
+from ..build_cache import BuildCache, open_build_cache
+from ..changes import ChangeSet, changed_files, detect_changes
 from ..config import Config, initialize
+from ..progress import Progress
+
+DEFAULT_TEXT_CACHE_SIZE = 16 * 1024 * 1024
+DEFAULT_SEGMENT_CACHE_SIZE = 4 * 1024 * 1024
 
 
 class Generation:
@@ -20,41 +31,224 @@ class Generation:
     """
     def __init__(self,
                  src_strings: Dict,
-                 src_data: Dict,
                  hg_config: Config,
-                 mdi: MarkdownIt):
+                 mdi: MarkdownIt,
+                 files: Optional[utils.SiteFiles] = None,
+                 text_cache_size: int = DEFAULT_TEXT_CACHE_SIZE,
+                 selection: Optional[Selection] = None,
+                 segment_cache_size: int = DEFAULT_SEGMENT_CACHE_SIZE,
+                 progress: Optional[Progress] = None,
+                 build_cache: Optional[BuildCache] = None,
+                 sources: Optional[utils.SourceCache] = None,
+                 file_jobs: int = 1,
+                 journal: Optional[GenerationJournal] = None):
         self.src_strings = src_strings
-        self.src_data = src_data
         self.hg_config = hg_config
         self.lang_names = self.hg_config.load_lang_names()
-        self.file_total_count: int = sum([len(x) for _, x in self.hg_config.content.items()])
+        self.selection = selection or Selection()
+        # files to generate, `hg_config` still has all files, e.g. for conditions
+        self.content = self.selection.select_content(hg_config.content, hg_config.default_domain_name)
+        self.data = self.selection.select_data(hg_config.data, hg_config.default_domain_name)
+        # all files, a partial run qualifies languages like a full run, see `HugoLangG.count_unselected`
+        self.file_total_count: int = sum([len(x) for _, x in hg_config.content.items()])
         self.mdi = mdi
+        self.files = files or utils.SiteFiles()
+        # maximum size of localized texts kept for reuse in each language
+        self.text_cache_size = text_cache_size
+        # maximum size of localized segments, e.g. paragraphs and data strings, kept for reuse in each language
+        self.segment_cache_size = segment_cache_size
+        self.catalogs: LangCatalogs = {}
+        self.progress = progress or Progress()
+        # name of the phase in progress events
+        self.phase = 'generate'
+        self.build_cache = build_cache
+        # content files parsed once for extraction and generation, see `extract_generate`
+        self.sources = sources
+        # number of processes to render a very large content file with, see `chunks`
+        self.file_jobs = file_jobs
+        # checkpoints of the run, to resume it if it doesn't finish
+        self.journal = journal
+
+    def generate_data_files(self, lang_gs: List[HugoLangG], before: Optional[Callable[[str, Any], None]] = None):
+        """Generate data files for the given languages.
+        Each data file is loaded once and then localized for every language, so that at any time
+        only one source data file (and one localized copy of it) is held in memory.
+        :param lang_gs: languages qualified to have their data files generated
+        :param before: called with the path and the object of each data file before it's localized,
+        e.g. to extract its messages
+        """
+        if not lang_gs and before is None:
+            return
+        # segment caches of all languages are filled at once, they share one cache size
+        for lang_g in lang_gs:
+            lang_g.l10n_segments.max_size = self.segment_cache_size // len(lang_gs)
+        for path, data in self.files.read_data_files(self.data):
+            if before is not None:
+                before(path, data)
+            for i, lang_g in enumerate(lang_gs):
+                # make a copy for all but the last language, which can take the loaded data itself
+                lang_data = copy.deepcopy(data) if i < len(lang_gs) - 1 else data
+                lang_g.generate_data_file(path, lang_data)
+            self.progress.file_processed(self.phase, path)
+
+    def generate_langs(self, lang_codes: List[str]):
+        """Generate target files of the given languages, using `self.catalogs`
+        :param lang_codes: gettext codes of the languages
+        """
+        data_lang_gs = []
+        languages = self.hg_config.hugo_config.get('languages', {})
+        for lang_code in lang_codes:
+            lang_g = HugoLangG(self, lang_code)
+            if self.journal and (done := self.journal.langs.get(lang_code)) is not None:
+                lang_g.resume(done)
+            elif self.journal:
+                original_section = copy.deepcopy(languages.get(lang_g.hugo_lang_code))
+                self.journal.lang_started(lang_code)
+                lang_g.generate_lang()
+                section = languages.get(lang_g.hugo_lang_code)
+                self.journal.lang_done(lang_code, lang_g.file_l10n_count, lang_g.data_qualified,
+                                       section if section != original_section else None)
+            else:
+                lang_g.generate_lang()
+            if lang_g.data_qualified:
+                data_lang_gs.append(lang_g)
+        self.generate_data_files(data_lang_gs)
 
-    def generate(self, keep_locale):
+    def generate(self, keep_locale, catalog_cache: Optional[CatalogCache] = None):
+        """
+        :param keep_locale: do not delete locale folder
+        :param catalog_cache: a `CatalogCache` to reuse catalogs loaded before, e.g. for other sites
+        """
         os.makedirs('locale', exist_ok=True)
-        for lang_code in os.listdir('locale'):
-            HugoLangG(self, lang_code).generate_lang()
+        lang_codes = [lang_code for lang_code in os.listdir('locale') if self.selection.has_lang(lang_code)]
+        # load all catalogs once, resolved against site-wide msgid tables
+        self.catalogs = catalog_cache.load(lang_codes) if catalog_cache else load_catalogs(lang_codes)
+        with self.progress.phase(self.phase, len(lang_codes)):
+            self.generate_langs(lang_codes)
         if not keep_locale:
             shutil.rmtree('locale')
 
 
+def read_src_strings(hg_config: Config) -> Dict:
+    """Read the string file in the default language if strings are an i18n target
+    """
+    if hg_config.do_strings and hg_config.string_file_path:
+        return utils.read_file(hg_config.string_file_path)
+    return {}
+
+
+def generate_site(hg_config: Config,
+                  mdi: MarkdownIt,
+                  keep_locale: bool,
+                  text_cache_size: int = DEFAULT_TEXT_CACHE_SIZE,
+                  selection: Optional[Selection] = None,
+                  progress: Optional[Progress] = None,
+                  catalog_cache: Optional[CatalogCache] = None,
+                  build_cache: Optional[BuildCache] = None,
+                  file_jobs: int = 1,
+                  resume: bool = False):
+    """Generate target files of the site in the working directory, then update its config file.
+    Progress is recorded in a `GenerationJournal` until target files are in place
+    :param hg_config: config of the site
+    :param mdi: `MarkdownIt` object made with `RendererHugoL10N`, can be shared by sites with the same Markdown settings
+    :param keep_locale: do not delete locale folder
+    :param text_cache_size: maximum size of localized texts kept for reuse in each language
+    :param selection: a `Selection` restricting generation
+    :param progress: a `Progress` to emit progress events to
+    :param catalog_cache: a `CatalogCache` to reuse catalogs loaded before, e.g. for other sites
+    :param build_cache: a `BuildCache` to reuse rendered content files from
+    :param file_jobs: number of processes to render a very large content file with
+    :param resume: resume the run recorded in the journal if it didn't finish, with the same config and selection,
+    and the same catalogs. Languages and files done are skipped, their target files are staged already
+    :return: None
+    """
+    src_strings = read_src_strings(hg_config)
+    original_hugo_config = hg_config.copy_hugo_config()
+    selection = selection or Selection()
+    journal = GenerationJournal(run_key(hg_config, selection))
+    if resume and journal.load():
+        files = utils.StagedSiteFiles(reset=False)
+        files.restore()
+        journal.check_sources(files)
+        logging.info(f'Resuming generation, {len(journal.langs)} languages done')
+    else:
+        journal.clear()
+        files = utils.StagedSiteFiles()
+    # content files left out of a partial run are counted in every language, see `HugoLangG.count_unselected`,
+    # they're read and parsed once
+    sources = utils.SourceCache(files, mdi, text_cache_size) if selection.is_partial else None
+    # locale is kept until the run finishes, a resumed run needs it
+    Generation(src_strings, hg_config, mdi, files, text_cache_size, selection, progress=progress,
+               build_cache=build_cache, sources=sources, file_jobs=file_jobs,
+               journal=journal).generate(True, catalog_cache)
+
+    # the config file is written, or its fragments staged, first, as the run can't be resumed once target files start
+    # being moved into place
+    hg_config.write_hugo_config(original_hugo_config, files)
+    journal.committing()
+    # target files outside the selection aren't generated but aren't stale either
+    files.commit(remove_stale=not selection.is_partial)
+    journal.close(finished=True)
+    if not keep_locale:
+        shutil.rmtree('locale')
+
+
+def changed_selections(changes: ChangeSet, lang_codes: List[str]) -> List[Selection]:
+    """Selections to generate one after another, together covering what changed
+    :param changes: a `ChangeSet`
+    :param lang_codes: all languages
+    :return: a list of `Selection`s, the only one being not partial if everything has to be generated
+    """
+    if changes.everything:
+        return [Selection()]
+    selections = []
+    if changed_langs := sorted(set(lang_codes) & changes.lang_codes):
+        selections.append(Selection(lang_codes=changed_langs))
+    other_langs = [lang_code for lang_code in lang_codes if lang_code not in changes.lang_codes]
+    if other_langs and (changes.paths or changes.others):
+        # with no path, only strings and config fields are generated
+        selections.append(Selection(lang_codes=other_langs,
+                                    path_patterns=[glob.escape(p) for p in sorted(changes.paths)]))
+    return selections
+
+
 def generate(args):
     """Generate target messages and files
     :param args: arguments passed in command line, containing
         - customs (optional): path to Python file containing custom functions
         - config (optional): path to config file
         - keep_locale (optional): do not delete locale folder, default False
+        - text_cache_size (optional): maximum size of localized texts kept for reuse in each language, in MiB
+        - lang (optional): gettext codes of the languages to generate, all languages by default
+        - domain (optional): content domains to generate, all domains by default
+        - path (optional): glob patterns of content and data files to generate, all files by default
+        - progress (optional): a `Progress` to emit progress events to
+        - cache (optional): location of a build cache, a local directory or an HTTP URL
+        - since (optional): a git ref, only what changed since the ref is generated, previous outputs are kept
+        for everything else. Not used with `lang`, `domain`, and `path`
+        - file_jobs (optional): number of processes to render a very large content file with, default 1
+        - resume (optional): resume the last run if it didn't finish, see `generate_site`. Not used with `since`
     :return: None
     """
     hg_config, mdi = initialize(RendererHugoL10N, args.customs, args.config)
-    if hg_config.do_strings and hg_config.string_file_path:
-        src_strings = utils.read_file(hg_config.string_file_path)
-    else:
-        src_strings = {}
-    original_hugo_config = copy.deepcopy(hg_config.hugo_config)
-    src_data = utils.read_data_files(hg_config.data)
-
-    Generation(src_strings, src_data, hg_config, mdi).generate(args.keep_locale)
+    text_cache_size = args.text_cache_size * 1024 * 1024 if args.text_cache_size is not None \
+        else DEFAULT_TEXT_CACHE_SIZE
+    build_cache = open_build_cache(getattr(args, 'cache', None), hg_config)
+    progress = getattr(args, 'progress', None)
+    file_jobs = getattr(args, 'file_jobs', None) or 1
+    if not (since := getattr(args, 'since', None)):
+        selection = Selection(getattr(args, 'lang', None), getattr(args, 'domain', None), getattr(args, 'path', None))
+        generate_site(hg_config, mdi, args.keep_locale, text_cache_size, selection, progress,
+                      build_cache=build_cache, file_jobs=file_jobs, resume=getattr(args, 'resume', False))
+        return
 
-    if hg_config.hugo_config != original_hugo_config:
-        utils.write_file(hg_config.config_path, hg_config.hugo_config)
+    changes = detect_changes(hg_config, changed_files(since), since)
+    lang_codes = sorted(os.listdir('locale')) if os.path.isdir('locale') else []
+    selections = changed_selections(changes, lang_codes)
+    if not selections:
+        logging.info(f'Nothing changed since {since}')
+    for selection in selections:
+        generate_site(hg_config, mdi, True, text_cache_size, selection, progress,
+                      build_cache=build_cache, file_jobs=file_jobs)
+    if not args.keep_locale and os.path.isdir('locale'):
+        shutil.rmtree('locale')
@@ -3,20 +3,29 @@
 
 from typing import List, Dict, Sequence, Tuple
 
+import pygments.token
 from markdown_it.token import Token
 from markdown_it.utils import EnvType, OptionsDict
 from mdit_py_i18n import utils
 from mdit_py_i18n.renderer_l10n import MdCtx, RendererMarkdownL10N, SETEXT_HEADING_MARKUPS
 from mdit_py_i18n.utils import L10NResult
+from pygments import lexers, util
 
+from .. import chunks
 from ..utils import HugoDomainGProtocol, HG_STOP, SHORTCODE_QUOTES
 
 
 class HugoMdCtx(MdCtx):
-    def __init__(self, env: EnvType):
+    def __init__(self, env: EnvType, count_only: bool = False):
         super().__init__(env)
         self.domain_g: HugoDomainGProtocol = env['domain_generation']
         self.heading_attrs: List[Dict] = []
+        # only count messages and translations, see `RendererHugoL10N.count`
+        self.count_only = count_only
+
+
+# types of the tokens containing messages, the only ones visited when counting
+COUNTED_TOKEN_TYPES = {'inline', 'html_block', 'fence'}
 
 
 class RendererHugoL10N(RendererMarkdownL10N):
@@ -24,29 +33,132 @@ class RendererHugoL10N(RendererMarkdownL10N):
         """
         :param tokens: list of block tokens to render
         :param _options: properties of parser instance
-        :param env: containing 'domain_generation' an object compatible with `HugoDomainGProtocol`
+        :param env: containing 'domain_generation' an object compatible with `HugoDomainGProtocol`,
+        and optionally 'file_jobs' the number of processes to render a very large file with, see `chunks`
         :return: an `L10NResult`
         """
         md_ctx = HugoMdCtx(env)
 
         if (token := tokens[0]).type == 'front_matter':
-            fm_result = md_ctx.domain_g.render_front_matter(token.content, token.markup)
+            fm_result = md_ctx.domain_g.render_front_matter(token.content, token.markup, token.meta.get('front_matter'))
             tokens = tokens[1:]
         else:
             fm_result = L10NResult('', 0, 0)
 
         content_result = L10NResult('', 0, 0)
-        for i, token in enumerate(tokens):
-            if token.type in self.rules:
-                r = self.rules[token.type](tokens, i, md_ctx, content_result)
+        jobs = env.get('file_jobs', 1)
+        if bounds := chunks.chunk_bounds(tokens, jobs):
+            # a fresh context per chunk, as chunks start at top-level blocks
+            def render_chunk(start: int, end: int) -> L10NResult:
+                return self._render_tokens(tokens, start, end, HugoMdCtx(env), L10NResult('', 0, 0))
+
+            for chunk_result in chunks.map_chunks(render_chunk, bounds, jobs):
+                content_result += chunk_result
+        else:
+            self._render_tokens(tokens, 0, len(tokens), md_ctx, content_result)
+        self._link_ref(env, md_ctx, content_result)
+
+        return fm_result, content_result
+
+    def _render_tokens(self, tokens: Sequence[Token], start: int, end: int, md_ctx: HugoMdCtx,
+                       content_result: L10NResult) -> L10NResult:
+        """Render the tokens in [start, end) into `content_result`, stopping at an `hg_stop` shortcode
+        :return: `content_result`
+        """
+        for i in range(start, end):
+            if md_ctx.count_only and tokens[i].type not in COUNTED_TOKEN_TYPES:
+                continue
+            if (token_type := tokens[i].type) in self.rules:
+                r = self.rules[token_type](tokens, i, md_ctx, content_result)
                 if r == -1:
                     break
-        self._link_ref(env, md_ctx, content_result)
+        return content_result
+
+    def count(self, tokens: Sequence[Token], env: EnvType) -> Tuple[L10NResult, L10NResult]:
+        """Count messages and translations the way `render` does, without building the localized text,
+        to decide whether a file needs rendering at all. Only the tokens containing messages are visited
+        :param tokens: list of block tokens to count
+        :param env: containing 'domain_generation' an object compatible with `HugoDomainGProtocol`
+        :return: `L10NResult`s of the front matter and the content, with empty localized texts
+        """
+        md_ctx = HugoMdCtx(env, count_only=True)
 
+        if (token := tokens[0]).type == 'front_matter':
+            fm_result = md_ctx.domain_g.count_front_matter(token.content, token.meta.get('front_matter'))
+            tokens = tokens[1:]
+        else:
+            fm_result = L10NResult('', 0, 0)
+
+        content_result = self._render_tokens(tokens, 0, len(tokens), md_ctx, L10NResult('', 0, 0))
+        self._link_ref(env, md_ctx, content_result)
         return fm_result, content_result
 
+    @staticmethod
+    def _count_message(message: str, md_ctx: HugoMdCtx, content_result: L10NResult):
+        if md_ctx.domain_g.l10n_func(message) is not message:
+            content_result.l10n_count += 1
+        content_result.total_count += 1
+
+    @classmethod
+    def _link_ref(cls, env: EnvType, md_ctx: HugoMdCtx, content_result: L10NResult):
+        if not md_ctx.count_only:
+            super()._link_ref(env, md_ctx, content_result)
+            return
+        for details in env.get('references', {}).values():
+            if title := details.get('title', ''):
+                cls._count_message(title, md_ctx, content_result)
+
+    @classmethod
+    def _count_fence(cls, token: Token, md_ctx: HugoMdCtx, content_result: L10NResult):
+        """Count the comments of a fence as `_fence` groups them, without localizing them or copying the code
+        """
+        if not md_ctx.parse_fence:
+            return
+        try:
+            lexer = lexers.get_lexer_by_name(token.info)
+        except util.ClassNotFound:
+            lexer = lexers.guess_lexer(token.content)
+        comment = ''
+        last_comment_line_num = 0
+        line_num = token.map[0] + 1 + 1
+        for tok_type, tok_val in lexer.get_tokens(token.content):
+            if tok_type == pygments.token.Token.Comment.Single:
+                # a blank line ends a comment
+                if comment and line_num - last_comment_line_num > 1:
+                    cls._count_message(comment, md_ctx, content_result)
+                    comment = ''
+                if comment != '':
+                    comment += ' '
+                if comment_match := utils.SINGLE_COMMENT_PATTERN.match(tok_val):
+                    comment += comment_match.group(2).strip()
+                last_comment_line_num = line_num
+            elif comment and tok_val.strip():
+                cls._count_message(comment, md_ctx, content_result)
+                comment = ''
+            line_num += tok_val.count('\n')
+        if comment:
+            cls._count_message(comment, md_ctx, content_result)
+
+    @classmethod
+    def fence(cls, tokens: Sequence[Token], idx: int, md_ctx: HugoMdCtx, content_result: L10NResult):
+        if md_ctx.count_only:
+            cls._count_fence(tokens[idx], md_ctx, content_result)
+        else:
+            super().fence(tokens, idx, md_ctx, content_result)
+
     @classmethod
-    def _shortcode(cls, token: Token, sc_params_to_localize: List, md_ctx: HugoMdCtx, content_result: L10NResult):
+    def html_block(cls, tokens: Sequence[Token], idx: int, md_ctx: HugoMdCtx, content_result: L10NResult):
+        if md_ctx.count_only:
+            cls._count_message(tokens[idx].content, md_ctx, content_result)
+        else:
+            super().html_block(tokens, idx, md_ctx, content_result)
+
+    @classmethod
+    def _shortcode(cls, token: Token, sc_params_to_localize: List, md_ctx: HugoMdCtx) -> L10NResult:
+        """
+        :return: an `L10NResult` of the shortcode, with no line indent
+        """
+        result = L10NResult('', 0, 0)
         opening = token.meta['markup']
         closing = opening if opening == '%' else '>'
         opening = '{{' + opening
@@ -54,20 +166,12 @@ class RendererHugoL10N(RendererMarkdownL10N):
         args = ''
         sc_params = token.meta['params']
         for param in sc_params:
-            content: str = sc_params[param]
-            quote = content[0]
-            if quote in SHORTCODE_QUOTES:
-                # keep newlines in raw string parameters (passed with ``)
-                if quote == '"':
-                    content = utils.SPACES_PATTERN.sub(' ', content)
-                content = content[1:-1]
-            else:
-                quote = ''
+            quote, content = cls._shortcode_param(sc_params[param])
             if param in sc_params_to_localize:
                 localized_content = md_ctx.domain_g.l10n_func(content)
                 if localized_content is not content:
-                    content_result.l10n_count += 1
-                content_result.total_count += 1
+                    result.l10n_count += 1
+                result.total_count += 1
                 if quote:
                     localized_content = localized_content.replace(quote, f'\\{quote}')
             else:
@@ -75,7 +179,32 @@ class RendererHugoL10N(RendererMarkdownL10N):
             param_name_part = '' if token.meta['is_positional'] else f'{param}='
             args += f' {param_name_part}{quote}{localized_content}{quote}'
         # keep no space after the opening to take advantage of HTML highlighting
-        content_result.localized += f"{md_ctx.get_line_indent()}{opening}{token.meta['name']}{args} {closing}"
+        result.localized = f"{opening}{token.meta['name']}{args} {closing}"
+        return result
+
+    @staticmethod
+    def _shortcode_param(content: str) -> Tuple[str, str]:
+        """
+        :return: the quote of a shortcode parameter's value, empty if it's not quoted, and the value without quotes
+        """
+        quote = content[0]
+        if quote not in SHORTCODE_QUOTES:
+            return '', content
+        # keep newlines in raw string parameters (passed with ``)
+        if quote == '"':
+            content = utils.SPACES_PATTERN.sub(' ', content)
+        return quote, content[1:-1]
+
+    @staticmethod
+    def _sc_params_to_localize(sc: Token, md_ctx: HugoMdCtx) -> List:
+        sc_params_config = md_ctx.domain_g.lang_g.g.hg_config.shortcodes.get('params', {})
+        # a new list, the config's lists must not grow with every shortcode
+        return [*sc_params_config.get(sc.meta['name'], []), *sc_params_config.get('*', [])]
+
+    @staticmethod
+    def _inline_content(token: Token) -> str:
+        content = utils.HARD_LINE_BREAK_PATTERN.sub('<br />', token.content.strip())
+        return utils.SPACES_PATTERN.sub(' ', content.replace('\n', ' '))
 
     @staticmethod
     def _attribute_block(attrs: Dict):
@@ -96,18 +225,54 @@ class RendererHugoL10N(RendererMarkdownL10N):
             attrs_s = cls._attribute_block(token.attrs)
             content_result.localized += f'{md_ctx.line_indent}{attrs_s}\n'
 
+    @classmethod
+    def _localize_inline(cls, token: Token, md_ctx: HugoMdCtx) -> L10NResult:
+        """
+        :return: an `L10NResult` of the inline token, with no line indent
+        """
+        if len(token.children) == 1 and (sc := token.children[0]).type == 'shortcode':
+            return cls._shortcode(sc, cls._sc_params_to_localize(sc, md_ctx), md_ctx)
+        content = cls._inline_content(token)
+        if content and not utils.SPACES_PATTERN.fullmatch(content):
+            localized_content = md_ctx.domain_g.l10n_func(content)
+        else:
+            localized_content = content
+        return L10NResult(localized_content, 1, 1 if localized_content is not content else 0)
+
+    @classmethod
+    def _count_inline(cls, token: Token, md_ctx: HugoMdCtx, content_result: L10NResult):
+        """Count the messages of an inline token as `_localize_inline` localizes them, with no segment cached
+        """
+        if len(token.children) == 1 and (sc := token.children[0]).type == 'shortcode':
+            sc_params_to_localize = cls._sc_params_to_localize(sc, md_ctx)
+            for param, value in sc.meta['params'].items():
+                if param in sc_params_to_localize:
+                    cls._count_message(cls._shortcode_param(value)[1], md_ctx, content_result)
+            return
+        content = cls._inline_content(token)
+        if content and not utils.SPACES_PATTERN.fullmatch(content):
+            cls._count_message(content, md_ctx, content_result)
+        else:
+            content_result.total_count += 1
+
     @classmethod
     def inline(cls, tokens: Sequence[Token], idx: int, md_ctx: HugoMdCtx, content_result: L10NResult):
         token = tokens[idx]
-        if len(token.children) == 1 and (sc := token.children[0]).type == 'shortcode':
-            if sc.meta['name'] == HG_STOP:
-                return -1
-            sc_params_config = md_ctx.domain_g.lang_g.g.hg_config.shortcodes.get('params', {})
-            sc_params_to_localize: List = sc_params_config.get(sc.meta['name'], [])
-            sc_params_to_localize.extend(sc_params_config.get('*', []))
-            cls._shortcode(sc, sc_params_to_localize, md_ctx, content_result)
+        is_shortcode = len(token.children) == 1 and (sc := token.children[0]).type == 'shortcode'
+        if is_shortcode and sc.meta['name'] == HG_STOP:
+            return -1
+        if md_ctx.count_only:
+            cls._count_inline(token, md_ctx, content_result)
+            return
+        # the same inline content is localized once per language, see `HugoDomainG.localize_segment`
+        result = md_ctx.domain_g.localize_segment('inline', token.content, lambda: cls._localize_inline(token, md_ctx))
+        content_result.total_count += result.total_count
+        content_result.l10n_count += result.l10n_count
+        # shortcodes are always indented, other inline content isn't in tables
+        if is_shortcode or not md_ctx.in_table:
+            content_result.localized += f'{md_ctx.get_line_indent()}{result.localized}'
         else:
-            super().inline(tokens, idx, md_ctx, content_result)
+            content_result.localized += result.localized
 
     @classmethod
     def blockquote_close(cls, tokens: Sequence[Token], idx: int, md_ctx: MdCtx, content_result: L10NResult):
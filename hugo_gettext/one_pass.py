@@ -0,0 +1,142 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Extraction and generation in one traversal of the source files: each content file is read and parsed once,
+then its messages are extracted and it's rendered for every language from the same tokens and front matter"""
+
+import os
+import shutil
+import time
+from typing import Dict, List
+
+from . import utils
+from .build_cache import open_build_cache
+from .config import Config, make_mdi
+from .extraction.e_domain import HugoDomainE
+from .extraction.index import Extraction
+from .extraction.renderer_hugo_i18n import RendererHugoI18N
+from .generation.g_catalog import load_catalogs
+from .generation.g_lang import HugoLangG
+from .generation.index import Generation, DEFAULT_TEXT_CACHE_SIZE, read_src_strings
+from .generation.renderer_hugo_l10n import RendererHugoL10N
+from .progress import Progress
+
+PHASE = 'extract-generate'
+
+
+class OnePass:
+    """Drives an `Extraction` and a `Generation` sharing a `SourceCache`, file by file
+    """
+    def __init__(self, e: Extraction, g: Generation):
+        self.e = e
+        self.g = g
+        # extractions of the content files of domains, by domain names
+        self.domain_es: Dict[str, HugoDomainE] = {}
+        # extractions of the units of domains split by number of messages, {domain: {unit: extraction}}
+        self.unit_es: Dict[str, Dict[str, HugoDomainE]] = {}
+        # time spent on each language
+        self.durations: Dict[str, float] = {}
+
+    def _content_domain_e(self, domain: str, path: str) -> HugoDomainE:
+        """
+        :return: the extraction object to extract a content file of a domain, as in `Config.content`, into
+        """
+        hg_config = self.e.hg_config
+        parent = hg_config.domain_parents.get(domain, domain)
+        if (split := hg_config.splits.get(parent)) is not None and split.max_messages:
+            # shards are assigned once all units are extracted
+            units = self.unit_es.setdefault(parent, {})
+            return units.setdefault(split.unit(path), HugoDomainE(self.e))
+        return self.domain_es.setdefault(hg_config.get_domain_name(domain), HugoDomainE(self.e))
+
+    def process_content(self, lang_gs: List[HugoLangG]):
+        """Extract and generate content files, each rendered for all languages right after it's extracted
+        """
+        g = self.g
+        for domain, domain_paths in g.content.items():
+            domain_name = g.hg_config.get_domain_name(domain)
+            domain_gs = []
+            for lang_g in lang_gs:
+                domain_g = lang_g.make_domain_g(domain_name)
+                if domain_name == g.hg_config.default_domain_name:
+                    lang_g.default_domain_g = domain_g
+                domain_gs.append(domain_g)
+            for path in domain_paths:
+                if not g.files.is_file(path):
+                    continue
+                self._content_domain_e(domain, path).i12ize_content_file(path)
+                for domain_g in domain_gs:
+                    start = time.perf_counter()
+                    domain_g.lang_g.file_l10n_count += domain_g.generate_content_file(path)
+                    self.durations[domain_g.lang_g.lang_code] += time.perf_counter() - start
+                g.sources.pop(path)
+                g.progress.file_processed(PHASE, path)
+
+    def run(self, lang_codes: List[str]) -> Dict[str, HugoDomainE]:
+        """
+        :param lang_codes: gettext codes of the languages to generate, with their catalogs in `Generation.catalogs`
+        :return: a dict with domain names as keys and the domains' extraction objects as values
+        """
+        e, g = self.e, self.g
+        hg_config = e.hg_config
+        lang_gs = [HugoLangG(g, lang_code) for lang_code in lang_codes]
+        self.durations = {lang_code: 0.0 for lang_code in lang_codes}
+        self.process_content(lang_gs)
+        for domain, unit_es in self.unit_es.items():
+            domain_e = unit_es.pop('', None) or HugoDomainE(e)
+            self.domain_es.update(e.assign_shards(domain, domain_e, unit_es))
+        for lang_g in lang_gs:
+            lang_g.finish_lang(time.perf_counter() - self.durations[lang_g.lang_code])
+
+        # the default domain has config fields, data files, and strings before content files
+        e.i12ize_config_fields()
+        g.generate_data_files([lang_g for lang_g in lang_gs if lang_g.data_qualified], e.i12ize_data_file)
+        e.i12ize_strings(g.src_strings)
+        if (content_e := self.domain_es.get(hg_config.default_domain_name)) is not None:
+            e.default_domain_e.merge(content_e)
+        self.domain_es[hg_config.default_domain_name] = e.default_domain_e
+        return self.domain_es
+
+
+def extract_generate(args):
+    """Extract messages to POT files and generate target files in one traversal of the source files,
+    like `extract` then `generate` would, with the catalogs compiled before extraction
+    :param args: arguments passed in command line, containing
+        - pot: path of the directory containing the target POT file(s)
+        - customs (optional): path to Python file containing custom functions
+        - config (optional): path to config file
+        - keep_locale (optional): do not delete locale folder, default False
+        - text_cache_size (optional): maximum size of parsed and localized texts kept for reuse in MiB
+        - cache (optional): location of a build cache, a local directory or an HTTP URL
+        - file_jobs (optional): number of processes to process a very large content file with, default 1
+        - progress (optional): a `Progress` to emit progress events to
+    :return: None
+    """
+    hg_config = Config.from_config_file(args.config, args.customs)
+    original_hugo_config = hg_config.copy_hugo_config()
+    text_cache_size = args.text_cache_size * 1024 * 1024 if args.text_cache_size is not None \
+        else DEFAULT_TEXT_CACHE_SIZE
+    progress = getattr(args, 'progress', None) or Progress()
+    build_cache = open_build_cache(getattr(args, 'cache', None), hg_config)
+    files = utils.StagedSiteFiles()
+    mdi = make_mdi(RendererHugoL10N, hg_config)
+    # the same Markdown settings, so files parsed for generation can be rendered for extraction too
+    sources = utils.SourceCache(files, mdi, text_cache_size)
+    file_jobs = getattr(args, 'file_jobs', None) or 1
+    e = Extraction(hg_config, make_mdi(RendererHugoI18N, hg_config), files, progress, build_cache, sources, file_jobs)
+    g = Generation(read_src_strings(hg_config), hg_config, mdi, files, text_cache_size,
+                   progress=progress, build_cache=build_cache, sources=sources, file_jobs=file_jobs)
+    g.phase = PHASE
+
+    os.makedirs('locale', exist_ok=True)
+    lang_codes = os.listdir('locale')
+    g.catalogs = load_catalogs(lang_codes)
+    with progress.phase(PHASE, len(lang_codes)):
+        domain_es = OnePass(e, g).run(lang_codes)
+    os.makedirs(args.pot, exist_ok=True)
+    e.write_pots(args.pot, domain_es)
+    hg_config.write_hugo_config(original_hugo_config, files)
+    files.commit()
+
+    if not args.keep_locale:
+        shutil.rmtree('locale')
@@ -0,0 +1,315 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Compilation and generation as one pipeline per language, run on a pool of worker processes"""
+
+import copy
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, Future
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set, List
+
+from . import utils
+from .build_cache import open_build_cache
+from .compilation import compile_lang, has_msgfmt
+from .config import initialize
+from .generation.g_catalog import load_catalogs
+from .generation.g_lang import HugoLangG
+from .generation.index import Generation, DEFAULT_TEXT_CACHE_SIZE, DEFAULT_SEGMENT_CACHE_SIZE, read_src_strings
+from .generation.renderer_hugo_l10n import RendererHugoL10N
+from .progress import Progress
+
+if sys.platform != 'win32':
+    import resource
+
+# memory of a worker process before any language, e.g. the interpreter, the config, and the `MarkdownIt` object
+WORKER_BASE_MEMORY = 64 * 1024 * 1024
+# memory of catalogs per byte of PO files, while they're parsed, compiled, and loaded
+CATALOG_MEMORY_FACTOR = 6
+# memory of a loaded data file per byte of the file
+DATA_MEMORY_FACTOR = 10
+# weight of the previous scale when a language's memory is observed, see `MemoryScheduler.observe`
+SCALE_DECAY = 0.5
+
+# state of a worker process, set once by `_init_worker` and reused by all tasks of the process
+_worker: Dict = {}
+
+
+@dataclass
+class LangBuildResult:
+    lang_code: str
+    hugo_lang_code: str
+    # the language's config section if it's added or changed
+    language_section: Optional[Dict] = None
+    data_qualified: bool = False
+    # paths of staged target files
+    staged: Set[str] = field(default_factory=set)
+    # source files of mirrored target files, by paths of the target files
+    mirrored: Dict[str, str] = field(default_factory=dict)
+    file_l10n_count: int = 0
+    file_total_count: int = 0
+    duration: float = 0.0
+    # peak resident memory of the worker process while building the language, over the worker's memory before
+    # any language, 0 if unknown
+    memory: int = 0
+
+
+def _init_worker(customs_path: str, config_path: str, text_cache_size: int,
+                 po_dir: str, with_gettext: bool, compact: bool, cache_location: Optional[str]):
+    hg_config, mdi = initialize(RendererHugoL10N, customs_path, config_path)
+    _worker['g'] = Generation(read_src_strings(hg_config), hg_config, mdi,
+                              utils.StagedSiteFiles(reset=False), text_cache_size,
+                              build_cache=open_build_cache(cache_location, hg_config))
+    _worker['g'].phase = 'build'
+    _worker['compile_args'] = (po_dir, with_gettext, compact)
+    # what languages add is measured against this, memory that tasks grew and freed is still held by the worker
+    _worker['base_memory'] = _resident_memory()
+
+
+def _build_lang(lang_code: str) -> LangBuildResult:
+    """Compile a language, then generate its content files and strings right away.
+    Data files are generated afterwards for all languages at once, see `Generation.generate_data_files`.
+    """
+    g: Generation = _worker['g']
+    po_dir, with_gettext, compact = _worker['compile_args']
+    start = time.perf_counter()
+    compile_lang(po_dir, lang_code, with_gettext, compact)
+    g.catalogs = load_catalogs([lang_code])
+    peak_memory = _resident_memory()
+    g.files.staged = set()
+    g.files.mirrored = {}
+
+    lang_g = HugoLangG(g, lang_code)
+    languages = g.hg_config.hugo_config.get('languages', {})
+    original_section = copy.deepcopy(languages.get(lang_g.hugo_lang_code))
+    lang_g.generate_lang()
+    result = LangBuildResult(lang_code, lang_g.hugo_lang_code, None, lang_g.data_qualified, g.files.staged,
+                             g.files.mirrored, lang_g.file_l10n_count, g.file_total_count,
+                             time.perf_counter() - start)
+    if (section := languages.get(lang_g.hugo_lang_code)) != original_section:
+        result.language_section = section
+    # sampled once catalogs are loaded, and while the language's texts are still held
+    peak_memory = max(peak_memory, _resident_memory())
+    if (base_memory := _worker['base_memory']) and peak_memory:
+        result.memory = max(peak_memory - base_memory, 0)
+    return result
+
+
+def _resident_memory() -> int:
+    """
+    :return: current resident memory of this process in bytes, or its peak resident memory so far where the current
+    one is unknown, 0 if neither is known on this platform
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if sys.platform == 'win32':
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in bytes on macOS, in KiB elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryScheduler:
+    """Decides which languages run next on the worker processes, so that the estimated memory of the languages
+    running at once stays within a budget, along with the base memory of all workers, busy or idle.
+    Estimates are scaled up by how much memory workers actually used while building languages, never down
+    """
+    def __init__(self, estimates: Dict[str, int], max_memory: Optional[int] = None, jobs: int = 1):
+        """
+        :param estimates: estimated memory of each language, on top of a worker's base memory
+        :param max_memory: the budget in bytes, no limit if `None`
+        :param jobs: number of worker processes
+        """
+        self.estimates = estimates
+        self.max_memory = max_memory
+        self.base_memory = jobs * WORKER_BASE_MEMORY
+        # observed / estimated memory, weighted towards the languages observed last, at least 1
+        self.scale = 1.0
+        self._observed = False
+
+    def estimate(self, lang_code: str) -> int:
+        return int(self.estimates[lang_code] * self.scale)
+
+    def pick(self, pending: List[str], running: List[str]) -> Optional[str]:
+        """
+        :param pending: languages not started yet, in the preferred order
+        :param running: languages running
+        :return: the first pending language fitting in the memory left, or the first one if nothing is running,
+        as it has to run anyway. `None` if no language fits
+        """
+        if not pending:
+            return None
+        if self.max_memory is None or not running:
+            return pending[0]
+        left = self.max_memory - self.base_memory - sum(self.estimate(lang_code) for lang_code in running)
+        return next((lang_code for lang_code in pending if self.estimate(lang_code) <= left), None)
+
+    def observe(self, lang_code: str, memory: int):
+        """Scale estimates with the memory a worker process used while building a language, see
+        `LangBuildResult.memory`. The scale follows the languages observed last, so that it can go down after a
+        language used more than estimated, but estimates never go below the static ones, as a worker reusing memory
+        freed by its previous languages may observe little
+        """
+        if memory <= 0:
+            return
+        ratio = memory / self.estimates[lang_code]
+        scale = SCALE_DECAY * self.scale + (1 - SCALE_DECAY) * ratio if self._observed else ratio
+        self.scale = max(scale, 1.0)
+        self._observed = True
+
+
+def data_batches(lang_codes: List[str], catalog_memory: Dict[str, int], data_memory: int,
+                 max_memory: Optional[int] = None) -> List[List[str]]:
+    """Group the languages whose data files are generated together, in the main process once workers are done,
+    so that their catalogs and the data files being localized stay within the budget.
+    Each group reads the data files again
+    :param lang_codes: languages qualified to have their data files generated
+    :param catalog_memory: estimated memory of each language's catalogs
+    :param data_memory: estimated memory of a data file and its localized copy, see `estimate_data_memory`
+    :param max_memory: the budget in bytes, one group if `None`
+    :return: groups of languages, none empty
+    """
+    if max_memory is None:
+        return [lang_codes] if lang_codes else []
+    left = max_memory - WORKER_BASE_MEMORY - data_memory
+    batches: List[List[str]] = []
+    batch_memory = 0
+    for lang_code in lang_codes:
+        if not batches or batch_memory + catalog_memory[lang_code] > left:
+            batches.append([])
+            batch_memory = 0
+        batches[-1].append(lang_code)
+        batch_memory += catalog_memory[lang_code]
+    return batches
+
+
+def _po_size(po_dir: str, lang_code: str) -> int:
+    src_path = f'{po_dir}/{lang_code}'
+    return sum(os.path.getsize(f'{src_path}/{po}') for po in os.listdir(src_path))
+
+
+def _source_size(hg_config) -> int:
+    paths = [path for domain_paths in hg_config.content.values() for path in domain_paths]
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def _data_size(hg_config) -> int:
+    """
+    :return: size of the largest data file
+    """
+    return max((os.path.getsize(path) for path in hg_config.data if os.path.isfile(path)), default=0)
+
+
+def estimate_memory(po_size: int, source_size: int, text_cache_size: int) -> int:
+    """Estimate the memory a worker process needs on top of its base memory to build a language
+    :param po_size: total size of the language's PO files
+    :param source_size: total size of the content files
+    :param text_cache_size: maximum size of localized texts kept for reuse
+    :return: the estimate in bytes: the catalogs, and the texts and segments kept while generating
+    """
+    return CATALOG_MEMORY_FACTOR * po_size + min(source_size, text_cache_size) + DEFAULT_SEGMENT_CACHE_SIZE
+
+
+def estimate_data_memory(data_size: int) -> int:
+    """Estimate the memory of generating data files, besides catalogs
+    :param data_size: size of the largest data file
+    :return: the estimate in bytes: a data file loaded and a deep copy of it being localized, and the segments kept
+    """
+    return 2 * DATA_MEMORY_FACTOR * data_size + DEFAULT_SEGMENT_CACHE_SIZE
+
+
+def build(args):
+    """Compile translated messages and generate target files, as one pipeline per language:
+    a language's generation starts as soon as its compilation is done.
+    Languages run on a pool of worker processes, the ones with the largest PO files first.
+    :param args: arguments passed in command line, containing
+        - dir: path of the directory containing subdirectories with PO files inside, in the form of {dir}/{lang}/*.po
+        - customs (optional): path to Python file containing custom functions
+        - config (optional): path to config file
+        - keep_locale (optional): do not delete locale folder, default False
+        - jobs (optional): number of worker processes, the number of CPUs by default
+        - compact (optional): also compile each language to a compact catalog file, default False
+        - text_cache_size (optional): maximum size of localized texts kept for reuse in each language, in MiB
+        - cache (optional): location of a build cache, a local directory or an HTTP URL
+        - max_memory (optional): memory budget in MiB, of the worker processes, see `MemoryScheduler`,
+        then of the generation of data files, see `data_batches`
+        - progress (optional): a `Progress` to emit progress events to.
+        Events of a language are emitted when the language is done, from the main process
+    :return: None
+    """
+    hg_config, mdi = initialize(RendererHugoL10N, args.customs, args.config)
+    src_strings = read_src_strings(hg_config)
+    original_hugo_config = hg_config.copy_hugo_config()
+    text_cache_size = args.text_cache_size * 1024 * 1024 if args.text_cache_size is not None \
+        else DEFAULT_TEXT_CACHE_SIZE
+    files = utils.StagedSiteFiles()
+    progress = getattr(args, 'progress', None) or Progress()
+
+    po_sizes = {lang_code: _po_size(args.dir, lang_code) for lang_code in os.listdir(args.dir)}
+    lang_codes = sorted(po_sizes, key=lambda lang_code: po_sizes[lang_code], reverse=True)
+    source_size = _source_size(hg_config)
+    max_memory = args.max_memory * 1024 * 1024 if getattr(args, 'max_memory', None) else None
+    jobs = args.jobs or os.cpu_count() or 1
+    scheduler = MemoryScheduler({lang_code: estimate_memory(po_size, source_size, text_cache_size)
+                                 for lang_code, po_size in po_sizes.items()}, max_memory, jobs)
+    results: List[LangBuildResult] = []
+    initargs = (args.customs, hg_config.config_path, text_cache_size, args.dir, has_msgfmt(), args.compact,
+                getattr(args, 'cache', None))
+    try:
+        with progress.phase('build', len(lang_codes)):
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs) as executor:
+                pending = list(lang_codes)
+                running: Dict[Future, str] = {}
+                while pending or running:
+                    # start languages while workers are free and the memory budget allows
+                    while len(running) < jobs and (lang_code := scheduler.pick(pending, list(running.values()))):
+                        pending.remove(lang_code)
+                        running[executor.submit(_build_lang, lang_code)] = lang_code
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del running[future]
+                        results.append(result := future.result())
+                        scheduler.observe(result.lang_code, result.memory)
+                        for path in sorted(result.staged):
+                            progress.file_processed('build', path, result.lang_code)
+                        progress.language_done('build', result.lang_code, result.duration,
+                                               result.file_l10n_count, result.file_total_count)
+                if max_memory is not None:
+                    logging.debug(f'Memory estimates scaled by {scheduler.scale:.2f}')
+
+            # apply in a stable order, not in the order of completion
+            results.sort(key=lambda r: r.lang_code)
+            g = Generation(src_strings, hg_config, mdi, files, text_cache_size, progress=progress)
+            g.phase = 'build'
+            for result in results:
+                files.staged |= result.staged
+                files.mirrored.update(result.mirrored)
+                if result.language_section is not None:
+                    hg_config.hugo_config['languages'][result.hugo_lang_code] = result.language_section
+            data_lang_codes = [result.lang_code for result in results if result.data_qualified]
+            catalog_memory = {lang_code: int(CATALOG_MEMORY_FACTOR * po_sizes[lang_code] * scheduler.scale)
+                              for lang_code in data_lang_codes}
+            for batch in data_batches(data_lang_codes, catalog_memory,
+                                      estimate_data_memory(_data_size(hg_config)), max_memory):
+                g.catalogs = load_catalogs(batch)
+                data_lang_gs = []
+                for lang_code in batch:
+                    lang_g = HugoLangG(g, lang_code)
+                    lang_g.default_domain_g = lang_g.make_domain_g(hg_config.default_domain_name)
+                    data_lang_gs.append(lang_g)
+                g.generate_data_files(data_lang_gs)
+        hg_config.write_hugo_config(original_hugo_config, files)
+        files.commit()
+    finally:
+        # staged files of a failed run aren't kept, a build can't be resumed
+        files.discard()
+
+    if not args.keep_locale:
+        shutil.rmtree('locale')
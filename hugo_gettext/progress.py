@@ -0,0 +1,149 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+"""Progress events of extraction, compilation and generation, and listeners showing or recording them"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Callable, ClassVar, Dict, List, Optional
+
+
+@dataclass
+class Event:
+    kind: ClassVar[str] = ''
+    phase: str
+    time: float = field(default_factory=time.time, init=False)
+
+    def to_dict(self) -> Dict:
+        return {'event': self.kind, **asdict(self)}
+
+
+@dataclass
+class PhaseStarted(Event):
+    kind: ClassVar[str] = 'phase_started'
+    # number of languages, or of files if the phase isn't run per language, 0 if unknown
+    total: int = 0
+
+
+@dataclass
+class PhaseFinished(Event):
+    kind: ClassVar[str] = 'phase_finished'
+    # number of files processed
+    count: int = 0
+    duration: float = 0.0
+    # whether the phase ended with an exception
+    failed: bool = False
+
+
+@dataclass
+class FileProcessed(Event):
+    kind: ClassVar[str] = 'file_processed'
+    path: str = ''
+    lang_code: str = ''
+
+
+@dataclass
+class LanguageDone(Event):
+    kind: ClassVar[str] = 'language_done'
+    lang_code: str = ''
+    duration: float = 0.0
+    # number of localized files and of all files, in generation
+    file_l10n_count: Optional[int] = None
+    file_total_count: Optional[int] = None
+
+
+Listener = Callable[[Event], None]
+
+
+class Progress:
+    """Emits progress events to listeners. With no listener, nothing is made but the counts of processed files
+    """
+    def __init__(self, listeners: Optional[List[Listener]] = None):
+        self.listeners: List[Listener] = listeners or []
+        # {phase: number of files processed}
+        self.counts: Dict[str, int] = {}
+
+    def emit(self, event: Event):
+        for listener in self.listeners:
+            listener(event)
+
+    @contextmanager
+    def phase(self, phase: str, total: int = 0):
+        """Emit `PhaseStarted` and `PhaseFinished` events around a block, `PhaseFinished` even if the block raises
+        :param phase: name of the phase, e.g. 'extract'
+        :param total: number of languages or files expected, 0 if unknown
+        """
+        start = time.perf_counter()
+        self.counts[phase] = 0
+        self.emit(PhaseStarted(phase, total))
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.emit(PhaseFinished(phase, self.counts[phase], time.perf_counter() - start, failed))
+
+    def file_processed(self, phase: str, path: str, lang_code: str = ''):
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        if self.listeners:
+            self.emit(FileProcessed(phase, path, lang_code))
+
+    def language_done(self, phase: str, lang_code: str, duration: float,
+                      file_l10n_count: Optional[int] = None, file_total_count: Optional[int] = None):
+        if self.listeners:
+            self.emit(LanguageDone(phase, lang_code, duration, file_l10n_count, file_total_count))
+
+
+class ProgressDisplay:
+    """Logs a line per phase and per language, and the number of processed files at most once per `interval`
+    """
+    def __init__(self, interval: float = 2.0):
+        """
+        :param interval: minimum number of seconds between two lines about processed files
+        """
+        self.interval = interval
+        self.last_shown = 0.0
+        self.totals: Dict[str, int] = {}
+        self.files: Dict[str, int] = {}
+        self.langs: Dict[str, int] = {}
+
+    def __call__(self, event: Event):
+        phase = event.phase
+        if isinstance(event, PhaseStarted):
+            self.totals[phase] = event.total
+            self.files[phase] = 0
+            self.langs[phase] = 0
+            self.last_shown = time.monotonic()
+            logging.info(f'{phase}: started')
+        elif isinstance(event, FileProcessed):
+            self.files[phase] = self.files.get(phase, 0) + 1
+            if (now := time.monotonic()) - self.last_shown >= self.interval:
+                self.last_shown = now
+                logging.info(f'{phase}: {self.files[phase]} files')
+        elif isinstance(event, LanguageDone):
+            self.langs[phase] = self.langs.get(phase, 0) + 1
+            counts = f' [{event.file_l10n_count}/{event.file_total_count}]' if event.file_total_count is not None \
+                else ''
+            logging.info(f'{phase}: {event.lang_code}{counts} in {event.duration:.2f}s '
+                         f'({self.langs[phase]}/{self.totals.get(phase, 0) or "?"})')
+        elif isinstance(event, PhaseFinished):
+            failed = ', failed' if event.failed else ''
+            logging.info(f'{phase}: {event.count} files in {event.duration:.2f}s{failed}')
+
+
+class JSONLinesSink:
+    """Writes events to a file as newline-delimited JSON
+    """
+    def __init__(self, path: str):
+        self.f = open(path, 'w')
+
+    def __call__(self, event: Event):
+        self.f.write(json.dumps(event.to_dict()) + '\n')
+        if isinstance(event, PhaseFinished):
+            self.f.flush()
+
+    def close(self):
+        self.f.close()
@@ -0,0 +1,194 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import logging
+import os
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from . import utils
+from .compact_catalog import COMPACT_CATALOG_NAME
+from .config import Config, initialize
+from .generation.g_catalog import load_catalogs
+from .generation.g_lang import HugoLangG
+from .generation.index import Generation
+from .generation.renderer_hugo_l10n import RendererHugoL10N
+
+# (path, lang_code)
+CacheKey = Tuple[str, str]
+# (paths of the source file and the files its conditions depend on, their stamps, catalog stamp)
+CacheStamp = Tuple[Tuple[str, ...], Tuple, Tuple]
+
+
+class RenderCache:
+    """LRU cache of rendered pages, bounded by the total size of their texts in bytes
+    """
+    def __init__(self, max_size: int):
+        self.lru = utils.SizedLRUCache(max_size)
+
+    def dependencies(self, key: CacheKey) -> Tuple[str, ...]:
+        """
+        :return: paths of the files the text cached for `key` was rendered from, empty if nothing is cached
+        """
+        # entries are ((stamp, text), size)
+        return entry[0][0][0] if (entry := self.lru.entries.get(key)) is not None else ()
+
+    def get(self, key: CacheKey, stamp: CacheStamp) -> Optional[str]:
+        """Get the text cached for `key` if it was rendered from the same files and catalogs as `stamp`
+        """
+        if (entry := self.lru.entries.get(key)) is not None and entry[0][0] != stamp:
+            self.lru.pop(key)
+        if (entry := self.lru.get(key)) is None:
+            return None
+        return entry[1]
+
+    def put(self, key: CacheKey, stamp: CacheStamp, text: str):
+        self.lru.put(key, (stamp, text), len(text.encode()))
+
+
+class Renderer:
+    """Keeps the config, the `MarkdownIt` object, and the catalogs in memory to render one page in one language
+    """
+    def __init__(self, hg_config: Config, g: Generation, cache_size: int):
+        """
+        :param g: source files are read through its `files`, and its catalogs and source strings are reloaded
+        when their files change
+        """
+        self.hg_config = hg_config
+        self.g = g
+        self.cache = RenderCache(cache_size)
+        # catalog stamps of loaded languages
+        self.catalog_stamps = {}
+        # stamp of the string file `g.src_strings` is read from
+        self.strings_stamp = None
+
+    @staticmethod
+    def _catalog_stamp(lang_code: str) -> Tuple:
+        catalog_paths = [f'locale/{lang_code}/{COMPACT_CATALOG_NAME}']
+        if os.path.isdir(mo_dir := f'locale/{lang_code}/LC_MESSAGES'):
+            catalog_paths.extend(f'{mo_dir}/{mo}' for mo in sorted(os.listdir(mo_dir)))
+        return tuple((path, os.stat(path).st_mtime_ns) for path in catalog_paths if os.path.isfile(path))
+
+    def _ensure_catalogs(self, lang_code: str) -> Tuple:
+        """(Re)load the catalogs of a language if they aren't loaded or have changed
+        :return: the catalog stamp of the language
+        """
+        stamp = self._catalog_stamp(lang_code)
+        if self.catalog_stamps.get(lang_code) != stamp:
+            # each language gets its own msgid tables, so it can be reloaded alone
+            self.g.catalogs.update(load_catalogs([lang_code]))
+            self.catalog_stamps[lang_code] = stamp
+            logging.info(f'Loaded catalogs of {lang_code}')
+        return stamp
+
+    def _ensure_strings(self):
+        """(Re)load the source strings if they aren't loaded or the string file has changed
+        """
+        hg_config = self.hg_config
+        if not hg_config.do_strings or not hg_config.string_file_path:
+            return
+        stamp = self.g.files.stamp(hg_config.string_file_path)
+        if stamp != self.strings_stamp:
+            self.g.src_strings = self.g.files.read_obj(hg_config.string_file_path) if stamp is not None else {}
+            self.strings_stamp = stamp
+
+    def _dependencies(self, path: str, source: utils.Source) -> Tuple[str, ...]:
+        """
+        :return: paths of the content file and of the files its conditions depend on: other content files,
+        and the string file for `strings`
+        """
+        hg_config = self.hg_config
+        dependencies = [path]
+        for cond in source.front_matter.get('i18n_configs', {}).get('conditions', []):
+            item = cond if isinstance(cond, str) else next(iter(cond))
+            if item == 'strings':
+                if hg_config.do_strings and hg_config.string_file_path:
+                    dependencies.append(hg_config.string_file_path)
+            elif any(item in paths for paths in hg_config.content.values()):
+                dependencies.append(item)
+        return tuple(dependencies)
+
+    def _stamp(self, paths: Tuple[str, ...], catalog_stamp: Tuple) -> CacheStamp:
+        return paths, tuple(self.g.files.stamp(path) for path in paths), catalog_stamp
+
+    def render(self, path: str, lang_code: str) -> Optional[str]:
+        """Render a content file in a language.
+        The cached text is invalidated by changes to the file, to the files its conditions depend on,
+        and to the language's catalogs.
+        :param path: path of the source content file
+        :param lang_code: gettext code of the language
+        :return: the localized file, or `None` if the file isn't a content file or the language has no catalogs
+        """
+        hg_config = self.hg_config
+        domain = next((domain for domain in hg_config.content if path in hg_config.content[domain]), '')
+        if not domain or not self.g.files.is_file(path) or not os.path.isdir(f'locale/{lang_code}'):
+            return None
+        catalog_stamp = self._ensure_catalogs(lang_code)
+        self._ensure_strings()
+        key = (path, lang_code)
+        if (text := self.cache.get(key, self._stamp(self.cache.dependencies(key) or (path,), catalog_stamp))) \
+                is not None:
+            return text
+
+        # the file is stamped before rendering, so that changes made meanwhile invalidate the text
+        source_stamp = self.g.files.stamp(path)
+        lang_g = HugoLangG(self.g, lang_code)
+        lang_g.default_domain_g = lang_g.make_domain_g(hg_config.default_domain_name)
+        domain_name = domain if domain != 'default' else hg_config.default_domain_name
+        domain_g = lang_g.make_domain_g(domain_name)
+        source = domain_g.get_source(path)
+        fm_result, content_result = domain_g.render_content_file(path, source)
+        text = fm_result.localized + content_result.localized
+        dependencies = self._dependencies(path, source)
+        file_stamps = (source_stamp, *(self.g.files.stamp(dependency) for dependency in dependencies[1:]))
+        self.cache.put(key, (dependencies, file_stamps, catalog_stamp), text)
+        return text
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """Handles `GET /render?path={path}&lang={lang}` requests
+    """
+    renderer: Renderer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path != '/render' or 'path' not in query or 'lang' not in query:
+            self.send_error(HTTPStatus.BAD_REQUEST, 'Expected /render?path={path}&lang={lang}')
+            return
+        path = os.path.normpath(query['path'][0])
+        if (text := self.renderer.render(path, query['lang'][0])) is None:
+            self.send_error(HTTPStatus.NOT_FOUND, 'No such content file or language')
+            return
+        body = text.encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/markdown; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info(format % args)
+
+
+def serve(args):
+    """Serve localized pages rendered on demand
+    :param args: arguments passed in command line, containing
+        - customs (optional): path to Python file containing custom functions
+        - config (optional): path to config file
+        - host: address to listen on
+        - port: port to listen on
+        - cache_size: maximum size of the cache of rendered pages, in MiB
+    :return: None
+    """
+    hg_config, mdi = initialize(RendererHugoL10N, args.customs, args.config)
+    # source strings are read by the renderer
+    RenderRequestHandler.renderer = Renderer(hg_config, Generation({}, hg_config, mdi), args.cache_size * 1024 * 1024)
+    with HTTPServer((args.host, args.port), RenderRequestHandler) as server:
+        logging.info(f'Serving on http://{args.host}:{args.port}/render?path={{path}}&lang={{lang}}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -1,40 +1,88 @@
 # SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
+import errno
+import hashlib
 import json
+import logging
 import os
 import re
+import shutil
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
-from typing import Dict, Protocol, Any, List
+from typing import Dict, Protocol, Any, List, Iterator, Tuple, Hashable, Set, Callable, Optional, TYPE_CHECKING
 
 import tomlkit
 import yaml
 from markdown_it import MarkdownIt
+from markdown_it.token import Token
 from mdit_py_i18n.utils import DomainGenerationProtocol, DomainExtractionProtocol
 
+from .build_cache import BuildCache
+from .progress import Progress
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+if sys.platform == 'linux':
+    import fcntl
+if TYPE_CHECKING:
+    from .generation.g_journal import GenerationJournal
+    from .generation.g_selection import Selection
+
 SINGLE_COMMENT_PATTERN = re.compile('(// *)(.*)')
 SHORTCODE_QUOTES = {'"', '`'}
 HG_STOP = 'hg_stop'
+# extensions of files Hugo reads as pages, other files in page bundles are resources
+CONTENT_EXTENSIONS = {'.md', '.markdown', '.mdown', '.html', '.htm', '.adoc', '.pandoc', '.pdc', '.org', '.rst'}
+# `ioctl` request cloning a file on Linux filesystems supporting reflinks, e.g. Btrfs and XFS
+_FICLONE = 0x40049409
 
 
 class HugoEProtocol(Protocol):
     hg_config: Any
     mdi: MarkdownIt
+    files: 'SiteFiles'
+    progress: Progress
+    build_cache: Optional[BuildCache]
+    sources: Optional['SourceCache']
+    file_jobs: int
 
 
 class HugoGProtocol(Protocol):
     src_strings: Dict
-    src_data: Dict
+    catalogs: Dict
+    selection: 'Selection'
+    content: Dict[str, List[str]]
     lang_names: Dict
     file_total_count: int
+    text_cache_size: int
+    segment_cache_size: int
     hg_config: Any
     mdi: MarkdownIt
+    files: 'SiteFiles'
+    progress: Progress
+    phase: str
+    build_cache: Optional[BuildCache]
+    sources: Optional['SourceCache']
+    file_jobs: int
+    journal: Optional['GenerationJournal']
 
 
 class HugoLangGProtocol(Protocol):
     g: HugoGProtocol
+    lang_code: str
     hugo_lang_code: str
+    catalog_digest: str
     l10n_results: Dict
+    l10n_texts: 'SizedLRUCache'
+    l10n_segments: 'SizedLRUCache'
+
+    def get_l10n_func(self, domain_name: str):
+        ...
 
     def localize_strings(self):
         ...
@@ -42,11 +90,18 @@ class HugoLangGProtocol(Protocol):
 
 class HugoDomainEProtocol(DomainExtractionProtocol):
     e: HugoEProtocol
+    recorded: Optional[List[Tuple[str, int, str, str]]]
 
 
 class HugoDomainGProtocol(DomainGenerationProtocol):
     lang_g: HugoLangGProtocol
 
+    def localize_segment(self, kind: str, source: str, localize: Callable[[], Any]):
+        ...
+
+    def count_front_matter(self, content: str, fm=None):
+        ...
+
 
 class TextFormat(Enum):
     ELSE = ''
@@ -65,11 +120,17 @@ class TextFormat(Enum):
         else:
             return cls.ELSE
 
-    def load_content(self, content: str):
+    def load_content(self, content: str, round_trip: bool = False):
+        """Parse `content` in this format
+        :param content: the text to parse
+        :param round_trip: only matters to TOML. When `True`, a style-preserving `tomlkit` document is built,
+        which is much slower, so it's only needed for content that is modified and written back
+        :return: the parsed object
+        """
         if self == TextFormat.YAML:
             return yaml.safe_load(content)
         elif self == TextFormat.TOML:
-            return tomlkit.loads(content)
+            return tomlkit.loads(content) if round_trip else tomllib.loads(content)
         elif self == TextFormat.JSON:
             return json.loads(content)
         else:
@@ -86,10 +147,10 @@ class TextFormat(Enum):
             return ''
 
 
-def read_file(file_path: str):
+def read_file(file_path: str, round_trip: bool = False):
     text_format = TextFormat.decide_by_path(file_path)
     with open(file_path) as f:
-        return text_format.load_content(f.read())
+        return text_format.load_content(f.read(), round_trip)
 
 
 def write_file(file_path: str, obj):
@@ -98,10 +159,400 @@ def write_file(file_path: str, obj):
         f.write(text_format.dump_obj(obj))
 
 
-def read_data_files(file_paths: List[str]) -> Dict:
-    src_data = {}
+def read_data_files(file_paths: List[str]) -> Iterator[Tuple[str, Any]]:
+    """Lazily load data files one at a time, so that only one of them is held in memory at once
+    :param file_paths: paths of the data files
+    :return: an iterator of (path, loaded data) pairs, skipping paths that aren't files
+    """
     for path in file_paths:
         if not os.path.isfile(path):
             continue
-        src_data[path] = read_file(path)
-    return src_data
+        yield path, read_file(path)
+
+
+class SizedLRUCache:
+    """LRU cache bounded by the total size of its values, as given when they are put.
+    Lookups are counted as hits and misses
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        # {key: (value, size)}
+        self.entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        if (entry := self.entries.get(key)) is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value, size: int):
+        self.pop(key)
+        if size > self.max_size:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def pop(self, key: Hashable, default=None):
+        if (entry := self.entries.pop(key, None)) is None:
+            return default
+        self.size -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+class SiteFiles:
+    """Access to the files of a site: source files are read from and target files are written to the filesystem,
+    relative to the working directory
+    """
+    def is_file(self, path: str) -> bool:
+        return os.path.isfile(path)
+
+    def stamp(self, path: str) -> Optional[Hashable]:
+        """
+        :return: a value that changes when the source file changes, its modification time, or `None` if there's
+        no file
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def read_text(self, path: str) -> str:
+        with open(path) as f:
+            return f.read()
+
+    def read_obj(self, path: str):
+        return read_file(path)
+
+    def read_data_files(self, paths: List[str]) -> Iterator[Tuple[str, Any]]:
+        return read_data_files(paths)
+
+    def write_text(self, path: str, text: str):
+        _make_parent_dirs(path)
+        with open(path, 'w+') as f:
+            f.write(text)
+
+    def write_obj(self, path: str, obj):
+        _make_parent_dirs(path)
+        write_file(path, obj)
+
+    def bundle_resources(self, path: str) -> List[str]:
+        """
+        :param path: path of a content file
+        :return: paths of the resources of the page bundle whose index file is `path`, i.e. the files in its
+        directory and, for a leaf bundle (`index`), in subdirectories too, except content files.
+        An empty list if `path` isn't the index file of a bundle
+        """
+        name = os.path.basename(path).split('.')[0]
+        if name not in {'index', '_index'}:
+            return []
+        bundle_dir = os.path.dirname(path) or '.'
+        resources = []
+        for dir_path, dir_names, file_names in os.walk(bundle_dir):
+            resources.extend(os.path.normpath(os.path.join(dir_path, file_name)) for file_name in file_names
+                             if os.path.splitext(file_name)[1] not in CONTENT_EXTENSIONS)
+            if name == '_index':
+                break
+            dir_names.sort()
+        return sorted(resources)
+
+    def mirror_file(self, src_path: str, path: str):
+        """Make the file at `path` have the content of `src_path`, see `mirror_file`
+        """
+        if not (os.path.isfile(path) and is_mirror(src_path, path)):
+            mirror_file(src_path, path)
+
+
+def _make_parent_dirs(path: str):
+    if parent := os.path.dirname(path):
+        os.makedirs(parent, exist_ok=True)
+
+
+def _reflink(src_path: str, path: str) -> bool:
+    """
+    :return: whether `path` is made a copy-on-write clone of `src_path`, sharing its blocks on disk
+    """
+    if sys.platform != 'linux':
+        return False
+    with open(src_path, 'rb') as src, open(path, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(path)
+    return False
+
+
+def mirror_file(src_path: str, path: str) -> str:
+    """Make `path` a hardlink of `src_path`, or a reflink when hardlinks aren't permitted on their filesystem or
+    `src_path` has too many links, or a copy as the last resort, e.g. on different devices.
+    An existing file at `path` is replaced atomically
+    :return: how the file is mirrored, `'hardlink'`, `'reflink'`, or `'copy'`
+    """
+    _make_parent_dirs(path)
+    tmp_path = f'{path}.hg-tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(src_path, tmp_path)
+        method = 'hardlink'
+    except OSError as e:
+        # reflinks don't work across filesystems either
+        if e.errno in (errno.EPERM, errno.EMLINK) and _reflink(src_path, tmp_path):
+            # a clone has its own modification time, see `is_mirror`
+            shutil.copystat(src_path, tmp_path)
+            method = 'reflink'
+        else:
+            shutil.copy2(src_path, tmp_path)
+            method = 'copy'
+    os.replace(tmp_path, path)
+    return method
+
+
+def is_mirror(src_path: str, path: str) -> bool:
+    """
+    :return: whether the existing file at `path` is a hardlink of `src_path`, or a reflink or a copy with the same
+    size and modification time, as `mirror_file` makes them
+    """
+    if os.path.samefile(src_path, path):
+        return True
+    src_stat, stat = os.stat(src_path), os.stat(path)
+    return src_stat.st_size == stat.st_size and src_stat.st_mtime_ns == stat.st_mtime_ns
+
+
+@contextmanager
+def working_dir(path: str):
+    """Run a block with `path` as the working directory, as paths of a site's files are relative to the site's root
+    """
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def file_digest(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+class StagedSiteFiles(SiteFiles):
+    """Target files are written to a staging directory first. `commit` then moves only the changed ones into place
+    and removes the target files of the previous run that are not generated anymore.
+    Nothing is touched if the run doesn't reach `commit`.
+    """
+    staging_dir = '.hugo_gettext_staging'
+    # list of target files of the last run
+    manifest_path = '.hugo_gettext_outputs.json'
+
+    def __init__(self, reset: bool = True):
+        """
+        :param reset: whether to clear the staging directory, e.g. a leftover of a run that didn't finish.
+        `False` when several objects, in several processes, stage files for the same run
+        """
+        if reset:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staged: Set[str] = set()
+        # source files of mirrored target files, which are mirrored in place by `commit`, not staged
+        self.mirrored: Dict[str, str] = {}
+
+    def write_text(self, path: str, text: str):
+        super().write_text(os.path.join(self.staging_dir, path), text)
+        self.staged.add(path)
+
+    def write_obj(self, path: str, obj):
+        super().write_obj(os.path.join(self.staging_dir, path), obj)
+        self.staged.add(path)
+
+    def mirror_file(self, src_path: str, path: str):
+        self.mirrored[path] = src_path
+
+    def discard(self):
+        """Remove the staging directory, e.g. when a run fails
+        """
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staged = set()
+        self.mirrored = {}
+
+    def restore(self):
+        """Take the files in the staging directory as staged, e.g. when a run that didn't finish is resumed
+        """
+        for dir_path, _, file_names in os.walk(self.staging_dir):
+            for file_name in file_names:
+                self.staged.add(os.path.relpath(os.path.join(dir_path, file_name), self.staging_dir))
+
+    def _read_manifest(self) -> Set[str]:
+        if not os.path.isfile(self.manifest_path):
+            return set()
+        with open(self.manifest_path) as f:
+            return set(json.load(f))
+
+    def _write_manifest(self, paths: Set[str]):
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'w+') as f:
+            json.dump(sorted(paths), f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def commit(self, remove_stale: bool = True) -> Tuple[int, int, int]:
+        """Move changed staged files into place, each one atomically, mirror the source files of mirrored target files
+        that aren't mirrored yet, and remove stale target files
+        :param remove_stale: whether to remove target files of the previous run that aren't generated in this run.
+        When `False`, they are kept in the list of target files
+        :return: numbers of changed, unchanged, and removed files
+        """
+        changed, unchanged, removed = 0, 0, 0
+        for path in sorted(self.staged):
+            staged_path = os.path.join(self.staging_dir, path)
+            if os.path.isfile(path) and file_digest(path) == file_digest(staged_path):
+                unchanged += 1
+                continue
+            _make_parent_dirs(path)
+            os.replace(staged_path, path)
+            changed += 1
+        for path, src_path in sorted(self.mirrored.items()):
+            # mirrors are compared by metadata, not by reading contents
+            if os.path.isfile(path) and is_mirror(src_path, path):
+                unchanged += 1
+                continue
+            mirror_file(src_path, path)
+            changed += 1
+        previous = self._read_manifest()
+        generated = self.staged | set(self.mirrored)
+        if remove_stale:
+            for path in sorted(previous - generated):
+                if os.path.isfile(path):
+                    os.remove(path)
+                    removed += 1
+            self._write_manifest(generated)
+        else:
+            self._write_manifest(previous | generated)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        logging.info(f'Target files: {changed} changed, {unchanged} unchanged, {removed} removed')
+        return changed, unchanged, removed
+
+
+class MemorySiteFiles(SiteFiles):
+    """Source files are taken from and target files are kept in dicts keyed by paths, the filesystem isn't touched
+    """
+    def __init__(self, sources: Dict[str, str]):
+        """
+        :param sources: texts of source files (content, data, and string files) keyed by paths
+        """
+        self.sources = sources
+        # texts of written files, or objects in the case of data and string files
+        self.outputs: Dict[str, Any] = {}
+
+    def is_file(self, path: str) -> bool:
+        return path in self.sources
+
+    def stamp(self, path: str) -> Optional[Hashable]:
+        return hash(text) if (text := self.sources.get(path)) is not None else None
+
+    def read_text(self, path: str) -> str:
+        return self.sources[path]
+
+    def read_obj(self, path: str):
+        return TextFormat.decide_by_path(path).load_content(self.sources[path])
+
+    def read_data_files(self, paths: List[str]) -> Iterator[Tuple[str, Any]]:
+        for path in paths:
+            if path in self.sources:
+                yield path, self.read_obj(path)
+
+    def write_text(self, path: str, text: str):
+        self.outputs[path] = text
+
+    def write_obj(self, path: str, obj):
+        self.outputs[path] = obj
+
+    def bundle_resources(self, path: str) -> List[str]:
+        name = os.path.basename(path).split('.')[0]
+        if name not in {'index', '_index'}:
+            return []
+        bundle_dir = os.path.dirname(path) or '.'
+        resources = []
+        for src_path in self.sources:
+            rel_path = os.path.relpath(src_path, bundle_dir)
+            if rel_path.startswith(os.pardir) or (name == '_index' and os.sep in rel_path):
+                continue
+            if os.path.splitext(src_path)[1] not in CONTENT_EXTENSIONS:
+                resources.append(src_path)
+        return sorted(resources)
+
+    def mirror_file(self, src_path: str, path: str):
+        self.outputs[path] = self.sources[src_path]
+
+
+class Source:
+    """A content file, parsed on first use of its tokens
+    """
+    def __init__(self, text: str, mdi: MarkdownIt):
+        self.text = text
+        self.mdi = mdi
+        self._tokens: Optional[List[Token]] = None
+        # the environment after parsing, e.g. with link references
+        self.env: Dict = {}
+
+    @property
+    def tokens(self) -> List[Token]:
+        if self._tokens is None:
+            self._tokens = self.mdi.parse(self.text, self.env)
+            if self._tokens and (token := self._tokens[0]).type == 'front_matter':
+                token.meta['front_matter'] = yaml.safe_load(token.content)
+        return self._tokens
+
+    @property
+    def front_matter(self) -> Dict:
+        """The parsed front matter, an empty dict if there's none
+        """
+        if (tokens := self.tokens) and tokens[0].type == 'front_matter':
+            return tokens[0].meta['front_matter'] or {}
+        return {}
+
+    def render(self, mdi: MarkdownIt, env: Dict):
+        """Render the tokens with the renderer of `mdi`, like `mdi.render` would render the text
+        :param mdi: a `MarkdownIt` object with the same Markdown settings as the one parsing the text
+        :param env: the environment of rendering, the environment of parsing is added to it
+        :return: what the renderer returns
+        """
+        tokens = self.tokens
+        return mdi.renderer.render(tokens, mdi.options, {**self.env, **env})
+
+
+class SourceCache:
+    """Content files read and parsed once, shared by extraction and generation.
+    The YAML front matter of a file is parsed once too, and kept in the `front_matter` meta of its token.
+    Tokens and front matters mustn't be modified, renderers only read them
+    """
+    def __init__(self, files: SiteFiles, mdi: MarkdownIt, max_size: int):
+        """
+        :param files: where source files are read from
+        :param mdi: the `MarkdownIt` object parsing files. Extraction and generation objects with the same
+        Markdown settings parse files the same way, whatever their renderers
+        :param max_size: maximum total size of the texts of the files kept
+        """
+        self.files = files
+        self.mdi = mdi
+        self.sources = SizedLRUCache(max_size)
+
+    def get(self, path: str) -> Source:
+        if (source := self.sources.get(path)) is None:
+            source = Source(self.files.read_text(path), self.mdi)
+            self.sources.put(path, source, len(source.text))
+        return source
+
+    def pop(self, path: str):
+        self.sources.pop(path)
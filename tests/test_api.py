@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import unittest
+
+from hugo_gettext.api import extract_entries, generate_outputs
+from hugo_gettext.generation.g_selection import Selection
+
+HUGO_CONFIG = {
+    'languages': {
+        'en': {
+            'title': 'My Site',
+            'menu': {'main': [{'name': 'Home', 'url': '/'}]}
+        }
+    },
+    'i18n': {
+        'package': 'site',
+        'others': ['title', 'menu', 'strings'],
+        'content': {'default': {'globs': ['content/*.md']}},
+        'data': {'globs': ['data/*.yaml']}
+    }
+}
+SOURCES = {
+    'content/_index.md': '---\ntitle: Welcome\n---\nHello world\n',
+    'content/other.md': 'Untranslated\n',
+    'data/people.yaml': 'name: Hello world\n',
+    'i18n/en.toml': '[readMore]\nother = "Read more"\n',
+}
+CATALOGS = {
+    'de': {
+        'site': {
+            'My Site': 'Meine Seite',
+            'Home': 'Startseite',
+            'Welcome': 'Willkommen',
+            'Hello world': 'Hallo Welt',
+            'Read more': 'Mehr lesen'
+        }
+    }
+}
+
+
+class APITestCase(unittest.TestCase):
+    def test_extract_entries(self):
+        entries = extract_entries(HUGO_CONFIG, SOURCES)
+        self.assertEqual(list(entries), ['site'])
+        self.assertEqual([e.msgid for e in entries['site']],
+                         ['My Site', 'Home', 'Hello world', 'Read more', 'Welcome', 'Untranslated'])
+
+    def test_generate_outputs(self):
+        result = generate_outputs(HUGO_CONFIG, SOURCES, CATALOGS)
+        self.assertEqual(sorted(result.outputs), ['content/_index.de.md', 'data/de/people.yaml', 'i18n/de.toml'])
+        self.assertEqual(result.outputs['content/_index.de.md'], '---\ntitle: Willkommen\n\n---\nHallo Welt\n')
+        self.assertEqual(result.outputs['data/de/people.yaml'], {'name': 'Hallo Welt\n'})
+        self.assertEqual(result.outputs['i18n/de.toml'], {'readMore': {'other': 'Mehr lesen'}})
+        self.assertEqual(result.languages['de']['title'], 'Meine Seite')
+        self.assertEqual(result.languages['de']['menu'], {'main': [{'name': 'Startseite', 'url': '/'}]})
+        # the given config isn't modified
+        self.assertEqual(list(HUGO_CONFIG['languages']), ['en'])
+
+    def test_generate_outputs_selection(self):
+        full = generate_outputs(HUGO_CONFIG, SOURCES, CATALOGS)
+        for selection in (Selection(['de'], path_patterns=['content/other.md', 'data/people.yaml']),
+                          Selection(path_patterns=['content/_index.md']),
+                          Selection(path_patterns=[]),
+                          Selection(domains=['site'])):
+            partial = generate_outputs(HUGO_CONFIG, SOURCES, CATALOGS, selection=selection)
+            # selected files are generated as in a full run, and languages are qualified as in a full run,
+            #   counting the files that aren't selected
+            self.assertEqual(partial.outputs, {path: output for path, output in full.outputs.items()
+                                               if selection.has_path(path.replace('/de/', '/').replace('.de.', '.'))
+                                               or path == 'i18n/de.toml'})
+            self.assertEqual(partial.languages, full.languages)
+        self.assertIn('data/de/people.yaml', partial.outputs)
+
+        # a language with strings but no content translated isn't qualified in a partial run either
+        catalogs = {'de': {'site': {'Read more': 'Mehr lesen'}}}
+        full = generate_outputs(HUGO_CONFIG, SOURCES, catalogs)
+        partial = generate_outputs(HUGO_CONFIG, SOURCES, catalogs, selection=Selection(path_patterns=[]))
+        self.assertEqual(full.languages, {})
+        self.assertEqual(partial.languages, {})
+        self.assertEqual(partial.outputs, full.outputs)
+
+    def test_generate_outputs_conditions(self):
+        hugo_config = {'i18n': {'package': 'site', 'content': {'default': {'globs': ['content/*.md']}}}}
+        sources = {
+            'content/a.md': 'Hello world\n',
+            'content/b.md': '---\ntitle: Welcome\ni18n_configs:\n  conditions:\n  - content/a.md\n'
+                            '  - content/c.md: 0.9\n---\nHello world\n',
+            'content/c.md': 'Hello world\n\nUntranslated\n'
+        }
+        result = generate_outputs(hugo_config, sources, CATALOGS)
+        self.assertEqual(sorted(result.outputs), ['content/a.de.md', 'content/b.de.md'])
+        # content/a.md is checked with the counts kept from its rendering, content/c.md is rendered for the check
+        self.assertIn('warning: true', result.outputs['content/b.de.md'])
+
+    def test_extract_entries_shortcodes(self):
+        hugo_config = {
+            'i18n': {
+                'package': 'site',
+                'content': {'default': {'globs': ['content/*.md']}},
+                'shortcodes': {'params': {'alert': ['text'], '*': ['title']}}
+            }
+        }
+        sources = {'content/page.md': '{{< alert title="Note" text="Careful" >}}\n\n{{< alert text="Again" >}}\n'}
+        entries = extract_entries(hugo_config, sources)
+        self.assertEqual([e.msgid for e in entries['site']], ['Careful', 'Note', 'Again'])
+        # the config's lists aren't extended with the params of '*'
+        self.assertEqual(hugo_config['i18n']['shortcodes']['params']['alert'], ['text'])
@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import argparse
+import os
+import tempfile
+import unittest
+
+from hugo_gettext import batch, utils
+from hugo_gettext.api import generate_outputs
+from hugo_gettext.compilation import compile_lang
+from .test_api import HUGO_CONFIG, SOURCES, CATALOGS
+from .test_pipeline import write_site, assert_site_outputs
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for site in ('site-a', 'site-b'):
+            os.makedirs(root := f'{self.tmp_dir.name}/{site}')
+            write_site(root)
+            with utils.working_dir(root):
+                compile_lang('po', 'de', False)
+        with open(f'{self.tmp_dir.name}/sites.txt', 'w') as f:
+            f.write('# sites\nsite-a\n\nsite-b\n')
+        batch._state.clear()
+
+    def tearDown(self):
+        batch._state.clear()
+        self.tmp_dir.cleanup()
+
+    def test_read_sites(self):
+        self.assertEqual(batch.read_sites(f'{self.tmp_dir.name}/sites.txt'),
+                         [os.path.join(self.tmp_dir.name, 'site-a'), os.path.join(self.tmp_dir.name, 'site-b')])
+
+    def test_batch(self):
+        cwd = os.getcwd()
+        batch.batch(argparse.Namespace(sites=f'{self.tmp_dir.name}/sites.txt', keep_locale=False, jobs=None))
+        self.assertEqual(os.getcwd(), cwd)
+        expected = generate_outputs(HUGO_CONFIG, SOURCES, CATALOGS)
+        for site in ('site-a', 'site-b'):
+            assert_site_outputs(self, f'{self.tmp_dir.name}/{site}', expected.outputs)
+            self.assertFalse(os.path.exists(f'{self.tmp_dir.name}/{site}/locale'))
+        # the sites have the same catalog files, they are loaded once
+        catalog_cache = batch._state['catalogs']
+        self.assertEqual(len(catalog_cache.entries.entries), 1)
+        self.assertEqual(catalog_cache.entries.hits, 1)
+        self.assertEqual(len(batch._state['mdis']), 1)
+
+    def test_working_dir(self):
+        cwd = os.getcwd()
+        with self.assertRaises(ValueError):
+            with utils.working_dir(self.tmp_dir.name):
+                self.assertEqual(os.getcwd(), os.path.realpath(self.tmp_dir.name))
+                raise ValueError
+        self.assertEqual(os.getcwd(), cwd)
+
+
+if __name__ == '__main__':
+    unittest.main()
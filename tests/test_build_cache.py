@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import tempfile
+import threading
+import unittest
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from hugo_gettext.api import extract_entries, generate_outputs
+from hugo_gettext.build_cache import BuildCache, HTTPStore, LocalStore
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.extraction.index import Extraction
+from hugo_gettext.extraction.renderer_hugo_i18n import RendererHugoI18N
+from hugo_gettext.generation.g_catalog import resolve_catalogs
+from hugo_gettext.generation.index import Generation
+from hugo_gettext.generation.renderer_hugo_l10n import RendererHugoL10N
+from hugo_gettext.utils import MemorySiteFiles
+from .test_api import CATALOGS
+
+HUGO_CONFIG = {'i18n': {'package': 'site', 'content': {'default': {'globs': ['content/*.md']}}}}
+SOURCES = {'content/a.md': '---\ntitle: Welcome\n---\nHello world\n'}
+GENERATION_SOURCES = {
+    'content/a.md': '---\ntitle: Welcome\n---\nHello world\n',
+    'content/b.md': '---\ntitle: Welcome\ni18n_configs:\n  conditions:\n  - content/a.md\n---\nHello world\n',
+    # mentions i18n_configs, but has no conditions
+    'content/c.md': 'Hello world\n\n`i18n_configs`\n',
+}
+
+
+class _StoreHandler(BaseHTTPRequestHandler):
+    """A stand-in for a cache server, keeping entries in memory"""
+    entries = {}
+
+    def do_GET(self):
+        if (data := self.entries.get(self.path)) is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        self.entries[self.path] = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(HTTPStatus.CREATED)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BuildCacheTestCase(unittest.TestCase):
+    def _extract_twice(self, store):
+        hg_config = Config(HUGO_CONFIG, paths=SOURCES.keys())
+        mdi = make_mdi(RendererHugoI18N, hg_config)
+        results = []
+        for _ in range(2):
+            build_cache = BuildCache(store, 'fingerprint')
+            domain_e = Extraction(hg_config, mdi, MemorySiteFiles(SOURCES), build_cache=build_cache).i12ize()['site']
+            results.append(([(e.msgid, e.occurrences) for e in domain_e.entries], build_cache.hits))
+        return results
+
+    def _generate_twice(self, store):
+        hg_config = Config(HUGO_CONFIG, paths=GENERATION_SOURCES.keys())
+        mdi = make_mdi(RendererHugoL10N, hg_config)
+        results = []
+        for _ in range(2):
+            build_cache = BuildCache(store, 'fingerprint')
+            files = MemorySiteFiles(GENERATION_SOURCES)
+            g = Generation({}, hg_config, mdi, files, build_cache=build_cache)
+            g.catalogs = resolve_catalogs(CATALOGS)
+            g.generate_langs(list(CATALOGS))
+            results.append((files.outputs, build_cache.hits, build_cache.misses))
+        return results
+
+    def test_local_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            (entries, hits), (cached_entries, cached_hits) = self._extract_twice(LocalStore(directory))
+        self.assertEqual(entries, [(e.msgid, e.occurrences) for e in extract_entries(HUGO_CONFIG, SOURCES)['site']])
+        self.assertEqual(cached_entries, entries)
+        self.assertEqual((hits, cached_hits), (0, 1))
+
+    def test_generation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            (outputs, hits, misses), (cached_outputs, cached_hits, cached_misses) = \
+                self._generate_twice(LocalStore(directory))
+        self.assertEqual(outputs, generate_outputs(HUGO_CONFIG, GENERATION_SOURCES, CATALOGS).outputs)
+        self.assertEqual(cached_outputs, outputs)
+        # content/b.md has conditions, it's rendered every time and not looked up
+        self.assertEqual((hits, misses), (0, 2))
+        self.assertEqual((cached_hits, cached_misses), (2, 0))
+
+    def test_http_store(self):
+        with HTTPServer(('127.0.0.1', 0), _StoreHandler) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                store = HTTPStore(f'http://127.0.0.1:{server.server_port}/cache')
+                self.assertIsNone(store.get('missing'))
+                (entries, hits), (cached_entries, cached_hits) = self._extract_twice(store)
+            finally:
+                server.shutdown()
+                thread.join()
+        self.assertEqual(cached_entries, entries)
+        self.assertEqual((hits, cached_hits), (0, 1))
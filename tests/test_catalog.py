@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import os
+import tempfile
+import unittest
+
+import polib
+
+from hugo_gettext.compact_catalog import COMPACT_CATALOG_NAME, write_compact_catalog
+from hugo_gettext.generation.g_catalog import load_catalogs, CatalogCache
+
+
+def write_mo(locale_dir: str, lang_code: str, domain_name: str, translations: dict):
+    """Write the MO file of a domain of a language in `locale_dir`, with `translations` keyed by msgids
+    """
+    mo_dir = f'{locale_dir}/{lang_code}/LC_MESSAGES'
+    os.makedirs(mo_dir, exist_ok=True)
+    po = polib.POFile()
+    po.metadata = {'Content-Type': 'text/plain; charset=utf-8'}
+    for msgid, msgstr in translations.items():
+        po.append(polib.POEntry(msgid=msgid, msgstr=msgstr))
+    po.save_as_mofile(f'{mo_dir}/{domain_name}.mo')
+
+
+class CatalogTestCase(unittest.TestCase):
+    def test_load_catalogs(self):
+        with tempfile.TemporaryDirectory() as locale_dir:
+            write_mo(locale_dir, 'de', 'site', {'Home': 'Startseite', 'Blog': 'Blog DE'})
+            write_mo(locale_dir, 'fr', 'site', {'Home': 'Accueil'})
+            catalogs = load_catalogs(['de', 'fr'], locale_dir)
+
+        # languages share the msgid strings
+        de_home, = (msgid for msgid in catalogs['de']['site'].translations if msgid == 'Home')
+        fr_home, = catalogs['fr']['site'].translations
+        self.assertIs(de_home, fr_home)
+        self.assertEqual(catalogs['de']['site'].l10n_func('Home'), 'Startseite')
+        self.assertEqual(catalogs['fr']['site'].l10n_func('Home'), 'Accueil')
+        # untranslated messages are returned as they are, not as copies
+        blog = ''.join(['Bl', 'og'])
+        self.assertIs(catalogs['fr']['site'].l10n_func(blog), blog)
+        unknown = ''.join(['Unk', 'nown'])
+        self.assertIs(catalogs['de']['site'].l10n_func(unknown), unknown)
+
+    def test_compact_catalog(self):
+        with tempfile.TemporaryDirectory() as locale_dir:
+            os.makedirs(f'{locale_dir}/de')
+            write_compact_catalog(f'{locale_dir}/de/{COMPACT_CATALOG_NAME}',
+                                  {'site': {'Home': 'Startseite', 'Blog': 'Blög'}, 'docs': {'Home': 'Start'}})
+            catalogs = load_catalogs(['de'], locale_dir)
+            self.assertEqual(sorted(catalogs['de']), ['docs', 'site'])
+            self.assertEqual(catalogs['de']['site'].l10n_func('Home'), 'Startseite')
+            self.assertEqual(catalogs['de']['site'].l10n_func('Blog'), 'Blög')
+            self.assertEqual(catalogs['de']['docs'].l10n_func('Home'), 'Start')
+            unknown = ''.join(['Unk', 'nown'])
+            self.assertIs(catalogs['de']['docs'].l10n_func(unknown), unknown)
+            # probed messages are remembered
+            self.assertIs(catalogs['de']['docs'].l10n_func(unknown), unknown)
+
+    def test_catalog_cache(self):
+        cache = CatalogCache()
+        with tempfile.TemporaryDirectory() as site_a, tempfile.TemporaryDirectory() as site_b:
+            for locale_dir in (f'{site_a}/locale', f'{site_b}/locale'):
+                write_mo(locale_dir, 'de', 'site', {'Home': 'Startseite'})
+            write_mo(f'{site_b}/locale', 'fr', 'site', {'Home': 'Accueil'})
+            catalogs_a = cache.load(['de'], f'{site_a}/locale')
+            catalogs_b = cache.load(['de', 'fr'], f'{site_b}/locale')
+        # catalog files with the same content are loaded once
+        self.assertIs(catalogs_a['de'], catalogs_b['de'])
+        self.assertEqual(catalogs_b['fr']['site'].l10n_func('Home'), 'Accueil')
+        self.assertEqual(len(cache.entries.entries), 2)
+
+    def test_catalog_cache_size(self):
+        with tempfile.TemporaryDirectory() as locale_dir:
+            write_mo(locale_dir, 'de', 'site', {'Home': 'Startseite'})
+            write_mo(locale_dir, 'fr', 'site', {'Home': 'Accueil'})
+            # room for one language only
+            cache = CatalogCache(os.path.getsize(f'{locale_dir}/de/LC_MESSAGES/site.mo'))
+            catalogs = cache.load(['de', 'fr'], locale_dir)
+            # languages loaded are returned even when they don't stay in the cache
+            self.assertEqual(sorted(catalogs), ['de', 'fr'])
+            self.assertEqual(len(cache.entries.entries), 1)
+            self.assertIs(cache.load(['fr'], locale_dir)['fr'], catalogs['fr'])
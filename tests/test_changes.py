@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import argparse
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from hugo_gettext import utils
+from hugo_gettext.api import generate_outputs
+from hugo_gettext.changes import ChangeSet, detect_changes, changed_domains
+from hugo_gettext.compilation import compile_lang
+from hugo_gettext.config import Config
+from hugo_gettext.generation.index import changed_selections, generate
+from . import test_api
+from .test_pipeline import write_site, assert_site_outputs
+
+FILES = {
+    'content/_index.md': '---\ntitle: Home\n---\n',
+    'content/blog/post.md': '---\ntitle: Post\n---\n',
+    'content/blog/summary.md': '---\ntitle: Summary\ni18n_configs:\n  conditions:\n    - content/blog/post.md\n---\n',
+    'content/docs/page.md': '---\ntitle: Page\ni18n_configs:\n  conditions:\n    - strings\n---\n',
+}
+HUGO_CONFIG = {
+    'i18n': {
+        'package': 'test',
+        'content': {
+            'default': {'globs': ['content/*.md', 'content/blog/*.md']},
+            'docs': {'files': ['content/docs/page.md']},
+        },
+        'others': ['strings'],
+    }
+}
+
+
+class ChangesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        paths = [*FILES, 'i18n/en.toml']
+        for path, text in FILES.items():
+            os.makedirs(os.path.dirname(f'{self.tmp_dir.name}/{path}'), exist_ok=True)
+            with open(f'{self.tmp_dir.name}/{path}', 'w') as f:
+                f.write(text)
+        with utils.working_dir(self.tmp_dir.name):
+            self.hg_config = Config(HUGO_CONFIG, paths=paths)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _detect(self, changed):
+        with utils.working_dir(self.tmp_dir.name):
+            return detect_changes(self.hg_config, set(changed), 'HEAD')
+
+    def test_dependents(self):
+        changes = self._detect(['content/blog/post.md', 'po/de/test.po', 'README.md'])
+        self.assertEqual(changes.paths, {'content/blog/post.md', 'content/blog/summary.md'})
+        self.assertEqual(changes.lang_codes, {'de'})
+        self.assertFalse(changes.everything or changes.others)
+        self.assertEqual(changed_domains(self.hg_config, changes), {'default'})
+
+        changes = self._detect(['i18n/en.toml'])
+        self.assertTrue(changes.others)
+        self.assertEqual(changes.paths, {'content/docs/page.md'})
+        self.assertEqual(changed_domains(self.hg_config, changes), {'default', 'docs'})
+
+    def test_removed_source(self):
+        changes = self._detect(['content/blog/old.md'])
+        self.assertTrue(changes.everything)
+        self.assertIsNone(changed_domains(self.hg_config, changes))
+        self.assertFalse(changed_selections(changes, ['de', 'fr'])[0].is_partial)
+
+    def test_selections(self):
+        self.assertEqual(changed_selections(ChangeSet(), ['de', 'fr']), [])
+        changes = ChangeSet(paths={'content/blog/post.md'}, lang_codes={'de'})
+        full, partial = changed_selections(changes, ['de', 'fr'])
+        self.assertEqual(full.lang_codes, ['de'])
+        self.assertIsNone(full.path_patterns)
+        self.assertEqual(partial.lang_codes, ['fr'])
+        self.assertTrue(partial.has_path('content/blog/post.md'))
+        self.assertFalse(partial.has_path('content/_index.md'))
+
+
+class SinceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.catalogs = {**test_api.CATALOGS, 'fr': {'site': {'Welcome': 'Bienvenue', 'Hello world': 'Bonjour'}}}
+        write_site(self.tmp_dir.name, catalogs=self.catalogs)
+        with utils.working_dir(self.tmp_dir.name):
+            self._generate()
+            for args in (['init', '-q'], ['add', '.'], ['-c', 'user.name=test', '-c', 'user.email=test@localhost',
+                                                        'commit', '-q', '-m', 'init']):
+                subprocess.run(['git', *args], check=True)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _generate(self, since=None, path=None):
+        for lang_code in self.catalogs:
+            compile_lang('po', lang_code, False)
+        generate(argparse.Namespace(customs=None, config=None, keep_locale=False, text_cache_size=None, since=since,
+                                    path=path))
+
+    def test_since(self):
+        sources = {**test_api.SOURCES, 'content/other.md': 'Hello world\n'}
+        catalogs = {**self.catalogs, 'de': {'site': {**test_api.CATALOGS['de']['site'], 'Welcome': 'Hallo'}}}
+        write_site(self.tmp_dir.name, sources, catalogs)
+        with utils.working_dir(self.tmp_dir.name):
+            self._generate('HEAD')
+            languages = utils.read_file('hugo.yaml')['languages']
+        # what is generated since the ref is what a full run generates
+        expected = generate_outputs(test_api.HUGO_CONFIG, sources, catalogs)
+        self.assertEqual(sorted(expected.outputs), ['content/_index.de.md', 'content/_index.fr.md',
+                                                    'content/other.de.md', 'content/other.fr.md',
+                                                    'data/de/people.yaml', 'data/fr/people.yaml',
+                                                    'i18n/de.toml'])
+        assert_site_outputs(self, self.tmp_dir.name, expected.outputs)
+        self.assertEqual({lang_code: languages[lang_code] for lang_code in expected.languages}, expected.languages)
+
+    def test_path(self):
+        # the languages qualify by the content file that isn't selected
+        write_site(self.tmp_dir.name, catalogs=self.catalogs)
+        reads = []
+        read_text = utils.SiteFiles.read_text
+
+        def spy_read_text(files, path):
+            reads.append(path)
+            return read_text(files, path)
+
+        with utils.working_dir(self.tmp_dir.name), mock.patch.object(utils.SiteFiles, 'read_text', spy_read_text):
+            self._generate(path=['content/other.md'])
+            languages = utils.read_file('hugo.yaml')['languages']
+        expected = generate_outputs(test_api.HUGO_CONFIG, test_api.SOURCES, self.catalogs)
+        self.assertEqual(sorted(expected.languages), ['de', 'fr'])
+        self.assertEqual({lang_code: languages[lang_code] for lang_code in expected.languages}, expected.languages)
+        # and it's read once for all languages
+        self.assertEqual(reads.count('content/_index.md'), 1)
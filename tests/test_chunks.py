@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import importlib.resources as pkg_resources
+import unittest
+
+from hugo_gettext import chunks
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.extraction.index import Extraction
+from hugo_gettext.extraction.renderer_hugo_i18n import RendererHugoI18N
+from hugo_gettext.generation.g_catalog import resolve_catalogs
+from hugo_gettext.generation.g_domain import HugoDomainG
+from hugo_gettext.generation.g_lang import HugoLangG
+from hugo_gettext.generation.index import Generation
+from hugo_gettext.generation.renderer_hugo_l10n import RendererHugoL10N
+from hugo_gettext.utils import MemorySiteFiles
+
+HUGO_CONFIG = {
+    'i18n': {
+        'package': 'site',
+        'content': {'default': {'files': ['content/big.md']}},
+        'shortcodes': {'params': {'alert': ['title']}},
+    }
+}
+BLOCKS = '''Some text
+over two lines
+
+- a list
+  - nested
+
+  > a quote
+
+| Some text | Cell |
+|---|---|
+| a | b |
+
+```python
+# a comment
+x = 1
+```
+
+<div>
+Some text
+</div>
+
+Term
+: Definition
+
+{{< alert title="Note" >}}
+
+See [the docs][docs].
+
+'''
+
+
+def _big_text() -> str:
+    with pkg_resources.open_text('tests.resources', 'attributes.md') as f_obj:
+        attributes = f_obj.read().split('\n---\n', 2)[-1]
+    blocks = f'{BLOCKS}{attributes}\n\n'
+    repeat = chunks.LARGE_FILE_LINES // blocks.count('\n') + 1
+    return (f'---\ntitle: Big\n---\n{blocks * repeat}[docs]: /docs "Some text"\n\n'
+            '{{< hg_stop >}}\n\nNot processed\n')
+
+
+class ChunksTestCase(unittest.TestCase):
+    def setUp(self):
+        self.text = _big_text()
+        self.hg_config = Config(HUGO_CONFIG, paths=['content/big.md'])
+        self.files = MemorySiteFiles({'content/big.md': self.text})
+
+    def _entries(self, file_jobs: int):
+        e = Extraction(self.hg_config, make_mdi(RendererHugoI18N, self.hg_config), self.files, file_jobs=file_jobs)
+        e.default_domain_e.i12ize_content_file('content/big.md')
+        return [(entry.msgid, entry.occurrences, entry.comment) for entry in e.default_domain_e.entries]
+
+    def _render(self, file_jobs: int):
+        g = Generation({}, self.hg_config, make_mdi(RendererHugoL10N, self.hg_config), self.files,
+                       file_jobs=file_jobs)
+        g.catalogs = resolve_catalogs({'de': {'site': {'Some text': 'Etwas Text', 'Note': 'Hinweis'}}})
+        lang_g = HugoLangG(g, 'de')
+        fm_result, content_result = HugoDomainG(lang_g, lang_g.get_l10n_func('site')).render_content_file(
+            'content/big.md')
+        return fm_result.localized, content_result.localized, content_result.total_count, content_result.l10n_count
+
+    def test_bounds(self):
+        mdi = make_mdi(RendererHugoL10N, self.hg_config)
+        tokens = mdi.parse(self.text)[1:]
+        self.assertEqual(chunks.chunk_bounds(tokens, 1), [])
+        self.assertEqual(chunks.chunk_bounds(mdi.parse(BLOCKS), 4), [])
+        bounds = chunks.chunk_bounds(tokens, 4)
+        self.assertEqual(len(bounds), 4)
+        # chunks follow each other, start at top-level blocks, and end at the hg_stop shortcode
+        self.assertEqual([start for start, _ in bounds[1:]], [end for _, end in bounds[:-1]])
+        self.assertTrue(all(tokens[start].level == 0 for start, _ in bounds))
+        self.assertEqual(tokens[bounds[-1][1]].children[0].meta['name'], 'hg_stop')
+
+    def test_same_results(self):
+        self.assertEqual(self._entries(4), self._entries(1))
+        self.assertEqual(self._render(4), self._render(1))
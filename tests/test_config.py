@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import copy
+import os
+import tempfile
+import unittest
+
+from hugo_gettext import utils
+from hugo_gettext.config import Config
+
+HUGO_CONFIG = {
+    'languages': {'en': {'title': 'My Site'}},
+    'i18n': {'package': 'site', 'configFragments': 'config/_default/languages.{lang}.toml'},
+}
+
+
+class ConfigFragmentsTestCase(unittest.TestCase):
+    def test_fragments(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, utils.working_dir(tmp_dir):
+            hg_config = Config(copy.deepcopy(HUGO_CONFIG), 'config.toml', paths=[])
+            original_hugo_config = hg_config.copy_hugo_config()
+            self.assertEqual(original_hugo_config, {'languages': HUGO_CONFIG['languages']})
+            languages = hg_config.hugo_config['languages']
+            languages['de'] = {'languageCode': 'de', 'title': 'Meine Seite'}
+            languages['fr'] = {'languageCode': 'fr', 'title': 'Mon site'}
+            files = utils.StagedSiteFiles()
+            hg_config.write_hugo_config(original_hugo_config, files)
+            # fragments are staged with target files
+            self.assertFalse(os.path.exists('config/_default/languages.de.toml'))
+            files.commit()
+            # only fragments are written
+            self.assertFalse(os.path.exists('config.toml'))
+            self.assertEqual(utils.read_file('config/_default/languages.de.toml'),
+                             {'languageCode': 'de', 'title': 'Meine Seite'})
+
+            # fragments whose content doesn't change aren't written
+            os.utime('config/_default/languages.de.toml', (0, 0))
+            languages['fr']['title'] = 'Mon beau site'
+            files = utils.StagedSiteFiles()
+            hg_config.write_hugo_config(original_hugo_config, files)
+            files.commit()
+            self.assertEqual(os.path.getmtime('config/_default/languages.de.toml'), 0)
+            self.assertEqual(utils.read_file('config/_default/languages.fr.toml')['title'], 'Mon beau site')
+
+            # fragments of languages that aren't generated anymore are removed
+            del languages['fr']
+            files = utils.StagedSiteFiles()
+            hg_config.write_hugo_config(original_hugo_config, files)
+            files.commit()
+            self.assertTrue(os.path.exists('config/_default/languages.de.toml'))
+            self.assertFalse(os.path.exists('config/_default/languages.fr.toml'))
+
+    def test_yaml_fragments_of_toml_config(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, utils.working_dir(tmp_dir):
+            with open('hugo.toml', 'w') as f:
+                f.write('[languages.en]\ntitle = "My Site"\n[[languages.en.menu.main]]\nname = "Home"\nurl = "/"\n\n'
+                        '[i18n]\npackage = "site"\nconfigFragments = "config/_default/languages.{lang}.yaml"\n')
+            hg_config = Config.from_config_file('hugo.toml')
+            original_hugo_config = hg_config.copy_hugo_config()
+            # sections are added to the round-trip document, as generation does
+            languages = hg_config.hugo_config['languages']
+            languages['de'] = {'languageCode': 'de', 'title': 'Meine Seite'}
+            languages['de']['menu'] = {'main': [copy.deepcopy(languages['en']['menu']['main'][0])]}
+            languages['de']['menu']['main'][0]['name'] = 'Startseite'
+            files = utils.StagedSiteFiles()
+            hg_config.write_hugo_config(original_hugo_config, files)
+            files.commit()
+            with open('config/_default/languages.de.yaml') as f:
+                self.assertNotIn('!!', f.read())
+            self.assertEqual(utils.read_file('config/_default/languages.de.yaml'),
+                             {'languageCode': 'de', 'title': 'Meine Seite',
+                              'menu': {'main': [{'name': 'Startseite', 'url': '/'}]}})
@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from hugo_gettext import utils
+from hugo_gettext.api import generate_outputs
+from hugo_gettext.generation.g_lang import HugoLangG
+from hugo_gettext.generation.g_selection import Selection
+from .test_api import HUGO_CONFIG, SOURCES, CATALOGS
+
+DATA_SOURCES = {**SOURCES, 'data/places.yaml': 'home:\n  name: Welcome\n  description: Untranslated\n'}
+DATA_CATALOGS = {**CATALOGS, 'fr': {'site': {'Welcome': 'Bienvenue', 'Hello world': 'Bonjour le monde'}}}
+
+
+class DataFilesTestCase(unittest.TestCase):
+    def test_generate_data_files(self):
+        loaded, localized = {}, []
+        read_data_files, generate_data_file = utils.MemorySiteFiles.read_data_files, HugoLangG.generate_data_file
+
+        def spy_read_data_files(files, paths):
+            for path, data in read_data_files(files, paths):
+                loaded[path] = id(data)
+                yield path, data
+
+        def spy_generate_data_file(lang_g, path, data):
+            localized.append((path, lang_g.lang_code, id(data)))
+            generate_data_file(lang_g, path, data)
+
+        with mock.patch.object(utils.MemorySiteFiles, 'read_data_files', spy_read_data_files), \
+                mock.patch.object(HugoLangG, 'generate_data_file', spy_generate_data_file):
+            outputs = generate_outputs(HUGO_CONFIG, DATA_SOURCES, DATA_CATALOGS).outputs
+        # each data file is localized for every language before the next one is loaded
+        self.assertEqual([(path, lang_code) for path, lang_code, _ in localized],
+                         [('data/people.yaml', 'de'), ('data/people.yaml', 'fr'),
+                          ('data/places.yaml', 'de'), ('data/places.yaml', 'fr')])
+        # the last language takes the loaded data itself, the others a copy
+        for path, lang_code, data_id in localized:
+            self.assertEqual(data_id == loaded[path], lang_code == 'fr', (path, lang_code))
+
+        # data files are the same as when languages are generated one by one
+        for lang_code in DATA_CATALOGS:
+            lang_outputs = generate_outputs(HUGO_CONFIG, DATA_SOURCES, DATA_CATALOGS,
+                                            selection=Selection([lang_code])).outputs
+            paths = [path for path in lang_outputs if path.startswith(f'data/{lang_code}/')]
+            self.assertEqual(sorted(paths), [f'data/{lang_code}/people.yaml', f'data/{lang_code}/places.yaml'])
+            self.assertEqual({path: outputs[path] for path in paths}, {path: lang_outputs[path] for path in paths})
+        self.assertEqual(outputs['data/fr/places.yaml'],
+                         {'home': {'name': 'Bienvenue\n', 'description': 'Untranslated'}})
+
+    def test_read_data_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, utils.working_dir(tmp_dir):
+            os.makedirs('data')
+            for path in ('data/a.yaml', 'data/b.yaml'):
+                with open(path, 'w') as f:
+                    f.write(f'name: {path}\n')
+            with mock.patch.object(utils, 'read_file', wraps=utils.read_file) as read_file:
+                data_files = utils.read_data_files(['data/a.yaml', 'data/missing.yaml', 'data/b.yaml'])
+                # nothing is loaded until it's asked for, then one file at a time
+                self.assertEqual(read_file.call_count, 0)
+                self.assertEqual(next(data_files), ('data/a.yaml', {'name': 'data/a.yaml'}))
+                self.assertEqual(read_file.call_count, 1)
+                self.assertEqual(list(data_files), [('data/b.yaml', {'name': 'data/b.yaml'})])
+                self.assertEqual(read_file.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
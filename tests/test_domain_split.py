@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import json
+import os
+import tempfile
+import unittest
+
+from hugo_gettext import utils
+from hugo_gettext.api import extract_entries, generate_outputs
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.domain_split import DomainSplit, SHARD_MAP_PATH
+from hugo_gettext.extraction.index import Extraction
+from hugo_gettext.extraction.renderer_hugo_i18n import RendererHugoI18N
+
+PATHS = ['content/_index.md', 'content/blog/a.md', 'content/blog/b.md', 'content/docs/guide/x.md',
+         'content/docs/ref/y.md', 'content/docs/z.md']
+
+SHARD_CONFIG = {'i18n': {'package': 'site',
+                         'content': {'default': {'globs': ['content/*.md', 'content/*/*.md'],
+                                                 'split': {'maxMessages': 4}}}}}
+SHARD_SOURCES = {
+    'content/_index.md': 'Home\n',
+    'content/blog/a.md': 'First\n\nShared\n',
+    'content/blog/b.md': 'Shared\n\nSecond\n',
+    'content/docs/x.md': 'Shared\n',
+}
+
+
+def _config(split):
+    domain_config = {'globs': ['content/*.md', 'content/*/*.md', 'content/*/*/*.md'], 'split': split}
+    return Config({'i18n': {'package': 'site', 'content': {'default': domain_config}}}, paths=PATHS)
+
+
+class DomainSplitTestCase(unittest.TestCase):
+    def test_directory(self):
+        hg_config = _config({'depth': 2})
+        self.assertEqual(hg_config.content, {
+            'default': ['content/_index.md', 'content/blog/a.md', 'content/blog/b.md', 'content/docs/z.md'],
+            'site-docs-guide': ['content/docs/guide/x.md'],
+            'site-docs-ref': ['content/docs/ref/y.md'],
+        })
+        self.assertEqual(hg_config.domain_parents, {'site-docs-guide': 'default', 'site-docs-ref': 'default'})
+
+    def test_shards(self):
+        hg_config = _config({'maxMessages': 10})
+        # units not assigned yet stay in the domain
+        self.assertEqual(list(hg_config.content), ['default'])
+        hg_config.shard_map = {'site': {'blog': 1, 'docs': 2}}
+        self.assertEqual(hg_config.split_content(), {
+            'default': ['content/_index.md'],
+            'site-1': ['content/blog/a.md', 'content/blog/b.md'],
+            'site-2': ['content/docs/guide/x.md', 'content/docs/ref/y.md', 'content/docs/z.md'],
+        })
+
+    def test_pack(self):
+        split = DomainSplit({'maxMessages': 10}, 'content')
+        shards = split.pack({'a': 4, 'b': 7, 'c': 5}, {})
+        self.assertEqual(shards, {'a': 1, 'b': 2, 'c': 1})
+        # assignments are kept even when shards grow over the limit, and removed units are dropped
+        shards = split.pack({'a': 12, 'b': 2, 'd': 3, 'e': 20}, shards)
+        self.assertEqual(shards, {'a': 1, 'b': 2, 'd': 2, 'e': 3})
+
+    def test_extract_shards(self):
+        shard_map = {}
+        entries = extract_entries(SHARD_CONFIG, SHARD_SOURCES, shard_map=shard_map)
+        # both units fit in the first shard, their entries are merged
+        self.assertEqual(shard_map, {'site': {'blog': 1, 'docs': 1}})
+        self.assertEqual(list(entries), ['site', 'site-1'])
+        self.assertEqual([e.msgid for e in entries['site']], ['Home'])
+        self.assertEqual([e.msgid for e in entries['site-1']], ['First', 'Shared', 'Second'])
+        self.assertEqual(entries['site-1'][1].occurrences,
+                         [('content/blog/a.md', 3), ('content/blog/b.md', 1), ('content/docs/x.md', 1)])
+
+        # assignments are kept
+        shard_map = {'site': {'blog': 2, 'docs': 1}}
+        entries = extract_entries(SHARD_CONFIG, SHARD_SOURCES, shard_map=shard_map)
+        self.assertEqual(shard_map, {'site': {'blog': 2, 'docs': 1}})
+        self.assertEqual([e.msgid for e in entries['site-1']], ['Shared'])
+        self.assertEqual([e.msgid for e in entries['site-2']], ['First', 'Shared', 'Second'])
+
+        # generation uses the shards' catalogs
+        catalogs = {'de': {'site': {'Home': 'Start'}, 'site-1': {'Shared': 'Geteilt'}}}
+        outputs = generate_outputs(SHARD_CONFIG, SHARD_SOURCES, catalogs, shard_map=shard_map).outputs
+        self.assertEqual(outputs['content/docs/x.de.md'], 'Geteilt\n')
+        self.assertNotIn('content/blog/a.de.md', outputs)
+
+    def test_write_shard_map(self):
+        hg_config = Config(SHARD_CONFIG, paths=SHARD_SOURCES.keys(), shard_map={'site': {'docs': 2}})
+        self.assertEqual(hg_config.content['site-2'], ['content/docs/x.md'])
+        extraction = Extraction(hg_config, make_mdi(RendererHugoI18N, hg_config), utils.MemorySiteFiles(SHARD_SOURCES))
+        with tempfile.TemporaryDirectory() as tmp_dir, utils.working_dir(tmp_dir):
+            extraction.extract('pot')
+            # units not assigned yet go to the first shard with room for them
+            self.assertEqual(sorted(os.listdir('pot')), ['site-2.pot', 'site.pot'])
+            with open(SHARD_MAP_PATH) as f:
+                self.assertEqual(json.load(f), {'site': {'blog': 2, 'docs': 2}})
+        self.assertEqual(hg_config.content['site-2'], ['content/blog/a.md', 'content/blog/b.md', 'content/docs/x.md'])
@@ -0,0 +1,128 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import os
+import tempfile
+import unittest
+
+from hugo_gettext import utils
+from hugo_gettext.build_cache import text_digest
+from hugo_gettext.config import Config
+from hugo_gettext.generation.g_journal import GenerationJournal, run_key
+from hugo_gettext.generation.g_selection import Selection
+from .test_api import HUGO_CONFIG
+
+
+def _write_mo(text: str):
+    os.makedirs('locale/de/LC_MESSAGES', exist_ok=True)
+    with open('locale/de/LC_MESSAGES/site.mo', 'w') as f:
+        f.write(text)
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume(self):
+        with utils.working_dir(self.tmp_dir.name):
+            _write_mo('v1')
+            journal = GenerationJournal('run')
+            journal.lang_started('de')
+            journal.file_done('de', 'content/a.md', True, 'a')
+            journal.file_done('de', 'content/b.md', False, 'b')
+            journal.lang_done('de', 1, True, {'title': 'Meine Seite'})
+            journal.lang_started('fr')
+            journal.file_done('fr', 'content/a.md', False, 'a')
+            journal.close()
+
+            journal = GenerationJournal('run')
+            self.assertTrue(journal.load())
+            self.assertEqual(journal.langs, {'de': {'file_l10n_count': 1, 'data_qualified': True,
+                                                    'section': {'title': 'Meine Seite'}}})
+            self.assertEqual(journal.file_written('fr', 'content/a.md'), False)
+            self.assertIsNone(journal.file_written('fr', 'content/b.md'))
+            # another run
+            self.assertFalse(GenerationJournal('other run').load())
+
+            # changed catalogs
+            _write_mo('v2')
+            self.assertFalse(GenerationJournal('run').load())
+            _write_mo('v1')
+
+            # target files started being moved into place
+            journal.committing()
+            journal.close()
+            self.assertFalse(GenerationJournal('run').load())
+            journal.close(finished=True)
+            self.assertFalse(os.path.exists(journal.path))
+
+    def test_changed_sources(self):
+        files = utils.MemorySiteFiles({'content/a.md': 'A\n', 'content/b.md': 'B\n'})
+        with utils.working_dir(self.tmp_dir.name):
+            _write_mo('v1')
+            journal = GenerationJournal('run')
+            journal.lang_started('de')
+            for path in ('content/a.md', 'content/b.md'):
+                journal.file_done('de', path, True, journal.source_digest(files, path))
+            journal.lang_done('de', 2, True, None)
+            journal.lang_started('fr')
+            journal.file_done('fr', 'content/a.md', True, text_digest('A\n'))
+            journal.close()
+
+            files.sources['content/b.md'] = 'Changed\n'
+            journal = GenerationJournal('run')
+            self.assertTrue(journal.load())
+            journal.check_sources(files)
+            # the changed file is rendered again, and its language is generated again
+            self.assertEqual(journal.langs, {})
+            self.assertTrue(journal.file_written('de', 'content/a.md'))
+            self.assertIsNone(journal.file_written('de', 'content/b.md'))
+            self.assertTrue(journal.file_written('fr', 'content/a.md'))
+
+            # a file done after its language was done means the language is generated again
+            journal.file_done('de', 'content/b.md', True, journal.source_digest(files, 'content/b.md'))
+            journal.close()
+            journal = GenerationJournal('run')
+            self.assertTrue(journal.load())
+            self.assertEqual(journal.langs, {})
+            journal.close(finished=True)
+
+    def test_changed_conditions(self):
+        files = utils.MemorySiteFiles({
+            'content/a.md': 'A\n',
+            'content/b.md': '---\ni18n_configs:\n  conditions:\n  - content/a.md\n---\nB\n',
+            'content/c.md': '---\ni18n_configs:\n  conditions:\n  - content/b.md: 0.9\n---\nC\n',
+            'content/d.md': '---\ni18n_configs:\n  conditions:\n  - strings\n---\nD\n',
+        })
+        with utils.working_dir(self.tmp_dir.name):
+            _write_mo('v1')
+            journal = GenerationJournal('run')
+            journal.lang_started('de')
+            for path in files.sources:
+                journal.file_done('de', path, True, journal.source_digest(files, path))
+            journal.close()
+
+            files.sources['content/a.md'] = 'Changed\n'
+            journal = GenerationJournal('run')
+            self.assertTrue(journal.load())
+            journal.check_sources(files)
+            # pages whose conditions depend on the changed page, directly or not, are generated again
+            self.assertEqual(list(journal.files['de']), ['content/d.md'])
+            journal.close(finished=True)
+
+    def test_run_key(self):
+        with utils.working_dir(self.tmp_dir.name):
+            os.makedirs('i18n')
+            with open('i18n/en.toml', 'w') as f:
+                f.write('[readMore]\nother = "Read more"\n')
+            hg_config = Config(HUGO_CONFIG, paths=['i18n/en.toml'])
+            key = run_key(hg_config, Selection())
+            self.assertEqual(run_key(hg_config, Selection()), key)
+            self.assertNotEqual(run_key(hg_config, Selection(['de'])), key)
+            # pages whose conditions depend on strings are generated again along with strings
+            with open('i18n/en.toml', 'w') as f:
+                f.write('[readMore]\nother = "Read on"\n')
+            self.assertNotEqual(run_key(hg_config, Selection()), key)
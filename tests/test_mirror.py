@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from hugo_gettext import utils
+
+FILES = ['content/_index.md', 'content/logo.png', 'content/blog/cover.png',
+         'content/post/index.md', 'content/post/image.png', 'content/post/other.md', 'content/post/data/table.csv']
+
+
+class MirrorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for path in FILES:
+            os.makedirs(os.path.dirname(f'{self.tmp_dir.name}/{path}'), exist_ok=True)
+            with open(f'{self.tmp_dir.name}/{path}', 'w') as f:
+                f.write(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_bundle_resources(self):
+        with utils.working_dir(self.tmp_dir.name):
+            files = utils.SiteFiles()
+            # a branch bundle has no resources in subdirectories, a leaf bundle does
+            self.assertEqual(files.bundle_resources('content/_index.md'), ['content/logo.png'])
+            self.assertEqual(files.bundle_resources('content/post/index.md'),
+                             ['content/post/data/table.csv', 'content/post/image.png'])
+            self.assertEqual(files.bundle_resources('content/post/other.md'), [])
+        files = utils.MemorySiteFiles({path: path for path in FILES})
+        self.assertEqual(files.bundle_resources('content/post/index.md'),
+                         ['content/post/data/table.csv', 'content/post/image.png'])
+
+    def test_staged_mirror(self):
+        with utils.working_dir(self.tmp_dir.name):
+            files = utils.StagedSiteFiles()
+            files.mirror_file('content/post/image.png', 'content-trans/de/post/image.png')
+            files.mirror_file('content/logo.png', 'content-trans/de/logo.png')
+            self.assertEqual(files.commit(), (2, 0, 0))
+            self.assertTrue(os.path.samefile('content/post/image.png', 'content-trans/de/post/image.png'))
+
+            # mirrors are kept in the list of target files, and left as they are when they are mirrors already
+            files = utils.StagedSiteFiles()
+            files.mirror_file('content/post/image.png', 'content-trans/de/post/image.png')
+            self.assertEqual(files.commit(), (0, 1, 1))
+            self.assertFalse(os.path.exists('content-trans/de/logo.png'))
+
+            # a copy with the same size and modification time is a mirror too
+            os.remove('content-trans/de/post/image.png')
+            with open('content-trans/de/post/image.png', 'w') as f:
+                f.write('content/post/image.png')
+            self.assertFalse(utils.is_mirror('content/post/image.png', 'content-trans/de/post/image.png'))
+            src_stat = os.stat('content/post/image.png')
+            os.utime('content-trans/de/post/image.png', ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+            self.assertTrue(utils.is_mirror('content/post/image.png', 'content-trans/de/post/image.png'))
+
+    def test_mirror_fallbacks(self):
+        def fail_link(error_number):
+            def link(_src, _dst):
+                raise OSError(error_number, os.strerror(error_number))
+            return link
+
+        def reflink(src_path, path):
+            # a clone with its own modification time
+            reflinks.append(src_path)
+            shutil.copyfile(src_path, path)
+            os.utime(path, ns=(0, 0))
+            return True
+
+        reflinks = []
+        with utils.working_dir(self.tmp_dir.name), mock.patch.object(utils, '_reflink', reflink):
+            with mock.patch.object(os, 'link', fail_link(errno.EMLINK)):
+                self.assertEqual(utils.mirror_file('content/logo.png', 'content-trans/de/logo.png'), 'reflink')
+            self.assertTrue(utils.is_mirror('content/logo.png', 'content-trans/de/logo.png'))
+
+            # across devices, no reflink is tried
+            with mock.patch.object(os, 'link', fail_link(errno.EXDEV)):
+                self.assertEqual(utils.mirror_file('content/post/image.png', 'content-trans/de/post/image.png'),
+                                 'copy')
+            self.assertTrue(utils.is_mirror('content/post/image.png', 'content-trans/de/post/image.png'))
+            self.assertEqual(reflinks, ['content/logo.png'])
+            self.assertFalse(os.path.exists('content-trans/de/post/image.png.hg-tmp'))
@@ -0,0 +1,36 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import copy
+import unittest
+
+from hugo_gettext.api import extract_entries, generate_outputs
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.extraction.index import Extraction
+from hugo_gettext.extraction.renderer_hugo_i18n import RendererHugoI18N
+from hugo_gettext.generation.g_catalog import resolve_catalogs
+from hugo_gettext.generation.index import Generation
+from hugo_gettext.generation.renderer_hugo_l10n import RendererHugoL10N
+from hugo_gettext.one_pass import OnePass
+from hugo_gettext.utils import MemorySiteFiles, SourceCache
+from .test_api import HUGO_CONFIG, SOURCES, CATALOGS
+
+
+class OnePassTestCase(unittest.TestCase):
+    def test_one_pass(self):
+        hg_config = Config(copy.deepcopy(HUGO_CONFIG), paths=SOURCES.keys())
+        files = MemorySiteFiles(SOURCES)
+        mdi = make_mdi(RendererHugoL10N, hg_config)
+        sources = SourceCache(files, mdi, 1024 * 1024)
+        e = Extraction(hg_config, make_mdi(RendererHugoI18N, hg_config), files, sources=sources)
+        g = Generation(files.read_obj('i18n/en.toml'), hg_config, mdi, files, sources=sources)
+        g.catalogs = resolve_catalogs(CATALOGS)
+        domain_es = OnePass(e, g).run(list(CATALOGS))
+
+        # the same as extraction, then generation
+        self.assertEqual({domain_name: [(entry.msgid, entry.occurrences) for entry in domain_e.entries]
+                          for domain_name, domain_e in domain_es.items()},
+                         {domain_name: [(entry.msgid, entry.occurrences) for entry in entries]
+                          for domain_name, entries in extract_entries(HUGO_CONFIG, SOURCES).items()})
+        self.assertEqual(files.outputs, generate_outputs(HUGO_CONFIG, SOURCES, CATALOGS).outputs)
+        self.assertEqual(hg_config.hugo_config['languages']['de']['title'], 'Meine Seite')
@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import argparse
+import os
+import tempfile
+import unittest
+from typing import Dict
+from unittest import mock
+
+import polib
+
+from hugo_gettext import pipeline, utils
+from hugo_gettext.api import generate_outputs
+from hugo_gettext.pipeline import MemoryScheduler, build
+from .test_api import HUGO_CONFIG, SOURCES, CATALOGS
+
+
+def write_site(root: str, sources: Dict[str, str] = SOURCES, catalogs: Dict = CATALOGS):
+    """Write a site with the config of `HUGO_CONFIG` and PO files of `catalogs` in `po`
+    """
+    with utils.working_dir(root):
+        utils.write_file('hugo.yaml', HUGO_CONFIG)
+        for path, text in sources.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(text)
+        for lang_code, lang_catalogs in catalogs.items():
+            os.makedirs(f'po/{lang_code}', exist_ok=True)
+            for domain_name, translations in lang_catalogs.items():
+                po = polib.POFile()
+                po.metadata = {'Content-Type': 'text/plain; charset=utf-8'}
+                for msgid, msgstr in translations.items():
+                    po.append(polib.POEntry(msgid=msgid, msgstr=msgstr))
+                po.save(f'po/{lang_code}/{domain_name}.po')
+
+
+def assert_site_outputs(test_case: unittest.TestCase, root: str, outputs: Dict):
+    """Assert that the target files of the site in `root` are `outputs`, as given by `generate_outputs`
+    """
+    with utils.working_dir(root):
+        for path, output in outputs.items():
+            if path.startswith('content/'):
+                test_case.assertEqual(utils.SiteFiles().read_text(path), output, path)
+            else:
+                test_case.assertEqual(utils.read_file(path), output, path)
+
+
+def build_args(**kwargs) -> argparse.Namespace:
+    args = {'dir': 'po', 'customs': None, 'config': None, 'keep_locale': False, 'jobs': 1, 'compact': False,
+            'text_cache_size': None, 'cache': None, 'max_memory': None, 'progress': None}
+    return argparse.Namespace(**{**args, **kwargs})
+
+
+class PipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        write_site(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build(self):
+        with utils.working_dir(self.tmp_dir.name):
+            build(build_args())
+            self.assertFalse(os.path.exists(utils.StagedSiteFiles.staging_dir))
+            self.assertFalse(os.path.exists('locale'))
+            self.assertEqual(utils.read_file('hugo.yaml')['languages']['de']['title'], 'Meine Seite')
+        expected = generate_outputs(HUGO_CONFIG, SOURCES, CATALOGS)
+        assert_site_outputs(self, self.tmp_dir.name, expected.outputs)
+
+    def test_build_failure(self):
+        with utils.working_dir(self.tmp_dir.name):
+            # built after de, whose PO file is larger
+            os.makedirs('po/fr')
+            with open('po/fr/site.po', 'w') as f:
+                f.write('msgid\n')
+            with self.assertRaises(Exception):
+                build(build_args())
+            # what de staged is discarded, nothing is moved into place
+            self.assertFalse(os.path.exists(utils.StagedSiteFiles.staging_dir))
+            self.assertFalse(os.path.exists('content/_index.de.md'))
+
+    def test_build_memory_budget(self):
+        catalogs = {**CATALOGS, 'fr': {'site': {'Welcome': 'Bienvenue', 'Hello world': 'Bonjour le monde'}}}
+        write_site(self.tmp_dir.name, catalogs=catalogs)
+        picks, observed, data_batches = [], [], []
+        pick, observe, load_catalogs = MemoryScheduler.pick, MemoryScheduler.observe, pipeline.load_catalogs
+
+        def spy_pick(scheduler, pending, running):
+            picks.append((len(running), lang_code := pick(scheduler, pending, running)))
+            return lang_code
+
+        def spy_observe(scheduler, lang_code, memory):
+            observed.append(lang_code)
+            observe(scheduler, lang_code, memory)
+
+        def spy_load_catalogs(lang_codes, *args, **kwargs):
+            data_batches.append(lang_codes)
+            return load_catalogs(lang_codes, *args, **kwargs)
+
+        with utils.working_dir(self.tmp_dir.name), mock.patch.object(MemoryScheduler, 'pick', spy_pick), \
+                mock.patch.object(MemoryScheduler, 'observe', spy_observe), \
+                mock.patch.object(pipeline, 'load_catalogs', spy_load_catalogs):
+            # no two languages fit in the budget together, neither when building nor when generating data files
+            build(build_args(jobs=2, max_memory=1))
+        self.assertEqual({lang_code for running, lang_code in picks if running}, {None})
+        self.assertEqual(sorted(observed), ['de', 'fr'])
+        self.assertEqual(sorted(data_batches), [['de'], ['fr']])
+        assert_site_outputs(self, self.tmp_dir.name, generate_outputs(HUGO_CONFIG, SOURCES, catalogs).outputs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import os
+import tempfile
+import unittest
+
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.extraction.e_domain import HugoDomainE
+from hugo_gettext.extraction.index import Extraction
+from hugo_gettext.extraction.renderer_hugo_i18n import RendererHugoI18N
+from hugo_gettext.utils import MemorySiteFiles
+
+
+class PotTestCase(unittest.TestCase):
+    def test_unchanged(self):
+        hg_config = Config({'i18n': {'package': 'test'}}, paths=[])
+        e = Extraction(hg_config, make_mdi(RendererHugoI18N, hg_config), MemorySiteFiles({}))
+
+        def domain_e(*msgids):
+            d = HugoDomainE(e)
+            for i, msgid in enumerate(msgids):
+                d.add_entry('content/a.md', msgid, i)
+            return d
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pot_path = os.path.join(tmp_dir, 'test.pot')
+            self.assertTrue(domain_e('Hello', 'World').to_pot(pot_path))
+            with open(pot_path) as f:
+                text = f.read()
+            # the creation date aside, nothing changes, so the file isn't written
+            self.assertFalse(domain_e('Hello', 'World').to_pot(pot_path))
+            with open(pot_path) as f:
+                self.assertEqual(f.read(), text)
+            # a new message, or a moved one
+            self.assertTrue(domain_e('Hello', 'World', 'Again').to_pot(pot_path))
+            self.assertTrue(domain_e('World', 'Hello', 'Again').to_pot(pot_path))
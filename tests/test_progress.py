@@ -0,0 +1,43 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import json
+import os
+import tempfile
+import unittest
+
+from hugo_gettext.progress import Progress, JSONLinesSink, PhaseStarted, FileProcessed, LanguageDone, PhaseFinished
+
+
+class ProgressTestCase(unittest.TestCase):
+    def test_events(self):
+        events = []
+        progress = Progress([events.append])
+        with progress.phase('generate', 1):
+            progress.file_processed('generate', 'content/_index.md', 'de')
+            progress.language_done('generate', 'de', 0.5, 1, 2)
+        self.assertEqual([type(e) for e in events], [PhaseStarted, FileProcessed, LanguageDone, PhaseFinished])
+        self.assertEqual(events[-1].count, 1)
+        self.assertEqual(events[1].to_dict()['event'], 'file_processed')
+
+    def test_phase_failure(self):
+        events = []
+        progress = Progress([events.append])
+        with self.assertRaises(ValueError):
+            with progress.phase('generate', 1):
+                progress.file_processed('generate', 'content/_index.md', 'de')
+                raise ValueError
+        self.assertEqual([type(e) for e in events], [PhaseStarted, FileProcessed, PhaseFinished])
+        self.assertEqual((events[-1].count, events[-1].failed), (1, True))
+
+    def test_json_lines_sink(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'events.ndjson')
+            sink = JSONLinesSink(path)
+            with Progress([sink]).phase('extract', 0):
+                pass
+            sink.close()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line['event'] for line in lines], ['phase_started', 'phase_finished'])
+        self.assertEqual(lines[1]['phase'], 'extract')
@@ -10,8 +10,12 @@ from mdit_py_hugo.shortcode import shortcode_plugin
 from mdit_py_plugins.deflist import deflist_plugin
 from mdit_py_plugins.front_matter import front_matter_plugin
 
+from hugo_gettext.config import Config
 from hugo_gettext.generation.g_domain import HugoDomainG
+from hugo_gettext.generation.g_lang import HugoLangG
+from hugo_gettext.generation.index import Generation
 from hugo_gettext.generation.renderer_hugo_l10n import RendererHugoL10N
+from hugo_gettext.utils import MemorySiteFiles
 
 
 class RendererHugoL10NTestCase(unittest.TestCase):
@@ -19,8 +23,9 @@ class RendererHugoL10NTestCase(unittest.TestCase):
            .enable('table').use(deflist_plugin).use(attribute_plugin))
 
     def _prep_test(self, f_obj):
+        g = Generation({}, Config({'i18n': {'package': 'test'}}, paths=[]), self.mdi, MemorySiteFiles({}))
         env = {
-            'domain_generation': HugoDomainG(None, lambda s: s)
+            'domain_generation': HugoDomainG(HugoLangG(g, 'de'), lambda s: s)
         }
         # skip front matter
         tokens = self.mdi.parse(f_obj.read(), env)[1:]
@@ -33,3 +38,48 @@ class RendererHugoL10NTestCase(unittest.TestCase):
             tokens, content_result, localized_tokens = self._prep_test(f_obj)
             self.assertEqual([token.attrs for token in tokens if token.type != 'heading_close'],
                              [token.attrs for token in localized_tokens if token.type != 'heading_close'])
+
+    def test_segments(self):
+        g = Generation({}, Config({'i18n': {'package': 'test'}}, paths=[]), self.mdi, MemorySiteFiles({}))
+        lang_g = HugoLangG(g, 'de')
+        env = {
+            'domain_generation': HugoDomainG(lang_g, {'Edit this page': 'Diese Seite bearbeiten'}.get)
+        }
+        _, content_result = self.mdi.render('Edit this page\n\n- Edit this page\n\n| Edit this page |\n|---|\n', env)
+        self.assertEqual(content_result.localized,
+                         'Diese Seite bearbeiten\n- Diese Seite bearbeiten\n\n| Diese Seite bearbeiten |\n| --- |\n\n')
+        self.assertEqual((content_result.total_count, content_result.l10n_count), (3, 3))
+        self.assertEqual((lang_g.l10n_segments.hits, lang_g.l10n_segments.misses), (2, 1))
+
+    def test_segments_by_domain(self):
+        g = Generation({}, Config({'i18n': {'package': 'test'}}, paths=[]), self.mdi, MemorySiteFiles({}))
+        lang_g = HugoLangG(g, 'de')
+        # domains with no catalog get a new identity function every time, segments are keyed by domain names
+        for domain_name in ('test', 'test', 'other'):
+            self.mdi.render('Edit this page\n', {'domain_generation': lang_g.make_domain_g(domain_name)})
+        self.assertEqual((lang_g.l10n_segments.hits, lang_g.l10n_segments.misses), (1, 2))
+
+    def test_count(self):
+        g = Generation({}, Config({'i18n': {'package': 'test', 'shortcodes': {'params': {'alert': ['title']}}}},
+                                  paths=[]),
+                       self.mdi, MemorySiteFiles({}))
+        translations = {'A title': 'Ein Titel', 'Some text': 'Etwas Text', 'Note': 'Hinweis', 'Ref title': 'Ref-Titel',
+                        'Print it': 'Ausgeben'}
+        lang_g = HugoLangG(g, 'de')
+        domain_g = HugoDomainG(lang_g, lambda s: translations.get(s, s))
+        text = ('---\ntitle: A title\ndescription: Untranslated\n---\n'
+                'Some text\n\nMore text\n\n{{< alert title="Note" >}}\n\n<div>Block</div>\n\n'
+                '```python\n# Print\n# it\nprint(1)\n\n# Not translated\n```\n\n'
+                '[link][ref]\n\n[ref]: /url "Ref title"\n\n{{< hg_stop >}}\n\nNot counted\n')
+        env = {'domain_generation': domain_g, 'parse_fence': True}
+        tokens = self.mdi.parse(text, env)
+        # counting gives the counts of rendering, without the text
+        rendered = self.mdi.renderer.render(tokens, self.mdi.options, env)
+        segments = (lang_g.l10n_segments.hits, lang_g.l10n_segments.misses)
+        counted = self.mdi.renderer.count(tokens, env)
+        # counting caches no segment
+        self.assertEqual((lang_g.l10n_segments.hits, lang_g.l10n_segments.misses), segments)
+        self.assertEqual([(r.total_count, r.l10n_count) for r in counted],
+                         [(r.total_count, r.l10n_count) for r in rendered])
+        self.assertEqual([(r.total_count, r.l10n_count) for r in counted], [(2, 1), (8, 4)])
+        self.assertEqual([r.localized for r in counted], ['', ''])
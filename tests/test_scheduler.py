@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import unittest
+
+from hugo_gettext.pipeline import MemoryScheduler, WORKER_BASE_MEMORY, data_batches
+
+
+class MemorySchedulerTestCase(unittest.TestCase):
+    def test_pick(self):
+        scheduler = MemoryScheduler({'de': 60, 'fr': 50, 'it': 20, 'ja': 10}, max_memory=WORKER_BASE_MEMORY + 100)
+        pending = ['de', 'fr', 'it', 'ja']
+        # the largest language that fits in the memory left
+        self.assertEqual(scheduler.pick(pending, []), 'de')
+        self.assertEqual(scheduler.pick(['fr', 'it', 'ja'], ['de']), 'it')
+        self.assertEqual(scheduler.pick(['fr', 'ja'], ['de', 'it']), 'ja')
+        self.assertIsNone(scheduler.pick(['fr'], ['de', 'it', 'ja']))
+        # a language larger than the budget still runs when nothing else does
+        self.assertEqual(MemoryScheduler({'de': 200}, max_memory=100).pick(['de'], []), 'de')
+        # no budget
+        self.assertEqual(MemoryScheduler({'de': 60, 'fr': 50}).pick(['fr'], ['de']), 'fr')
+
+    def test_base_memory(self):
+        # workers have their base memory whether they're busy or idle
+        estimates = {'de': 60, 'fr': 30}
+        self.assertEqual(MemoryScheduler(estimates, WORKER_BASE_MEMORY * 2 + 100, jobs=2).pick(['fr'], ['de']), 'fr')
+        self.assertIsNone(MemoryScheduler(estimates, WORKER_BASE_MEMORY * 2 + 100, jobs=3).pick(['fr'], ['de']))
+
+    def test_observe(self):
+        scheduler = MemoryScheduler({'de': 60, 'fr': 50, 'it': 20}, max_memory=WORKER_BASE_MEMORY + 100)
+        # a worker gains twice its estimate
+        scheduler.observe('de', 120)
+        self.assertEqual(scheduler.estimate('fr'), 100)
+        self.assertIsNone(scheduler.pick(['fr'], ['it']))
+        # then half of it, the scale goes down again
+        scheduler.observe('it', 10)
+        self.assertEqual(scheduler.scale, 1.25)
+        self.assertEqual(scheduler.pick(['fr'], ['it']), 'fr')
+        # unknown memory
+        scheduler.observe('fr', 0)
+        self.assertEqual(scheduler.scale, 1.25)
+
+    def test_observe_little(self):
+        # a worker reusing memory freed by its previous languages gains almost nothing
+        estimates = {'de': 60, 'fr': 50, 'it': 20}
+        scheduler = MemoryScheduler(estimates, max_memory=WORKER_BASE_MEMORY + 100)
+        for lang_code in estimates:
+            scheduler.observe(lang_code, 1)
+        self.assertEqual(scheduler.scale, 1)
+        self.assertEqual(scheduler.estimate('fr'), 50)
+        # the budget still holds
+        self.assertIsNone(scheduler.pick(['fr'], ['de']))
+        self.assertEqual(data_batches(['de', 'fr', 'it'], {lc: int(m * scheduler.scale) for lc, m in estimates.items()},
+                                      30, WORKER_BASE_MEMORY + 100), [['de'], ['fr', 'it']])
+
+    def test_data_batches(self):
+        catalog_memory = {'de': 60, 'fr': 50, 'it': 20}
+        self.assertEqual(data_batches(['de', 'fr', 'it'], catalog_memory, 30), [['de', 'fr', 'it']])
+        self.assertEqual(data_batches(['de', 'fr', 'it'], catalog_memory, 30, WORKER_BASE_MEMORY + 100),
+                         [['de'], ['fr', 'it']])
+        # a language larger than the budget still gets its data files
+        self.assertEqual(data_batches(['de', 'fr'], catalog_memory, 30, 10), [['de'], ['fr']])
+        self.assertEqual(data_batches([], catalog_memory, 30, 10), [])
@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: 2023 Phu Hung Nguyen <phuhnguyen@outlook.com>
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+import tempfile
+import threading
+import unittest
+from http.server import HTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from hugo_gettext import utils
+from hugo_gettext.config import Config, make_mdi
+from hugo_gettext.generation.index import Generation
+from hugo_gettext.generation.renderer_hugo_l10n import RendererHugoL10N
+from hugo_gettext.serving import RenderCache, Renderer, RenderRequestHandler
+from .test_catalog import write_mo
+
+HUGO_CONFIG = {
+    'languages': {'en': {'title': 'My Site'}},
+    'i18n': {
+        'package': 'site',
+        'others': ['strings'],
+        'content': {'default': {'globs': ['content/*.md']}}
+    }
+}
+SOURCES = {
+    'content/a.md': 'Hello world\n',
+    'content/b.md': '---\ntitle: Welcome\ni18n_configs:\n  conditions:\n  - content/a.md\n  - strings\n---\n'
+                    'Hello world\n',
+    'i18n/en.toml': '[readMore]\nother = "Read more"\n',
+}
+TRANSLATIONS = {'Welcome': 'Willkommen', 'Hello world': 'Hallo Welt', 'Read more': 'Mehr lesen'}
+
+
+class RenderCacheTestCase(unittest.TestCase):
+    def test_size_in_bytes(self):
+        cache = RenderCache(10)
+        stamp = (('content/a.md',), (1,), ())
+        cache.put(('content/a.md', 'de'), stamp, 'äääää')
+        self.assertEqual(cache.lru.size, 10)
+        cache.put(('content/b.md', 'de'), stamp, 'ab')
+        self.assertIsNone(cache.get(('content/a.md', 'de'), stamp))
+        self.assertEqual(cache.get(('content/b.md', 'de'), stamp), 'ab')
+
+    def test_stamp(self):
+        cache = RenderCache(100)
+        cache.put(('content/b.md', 'de'), (('content/b.md', 'content/a.md'), (1, 2), ()), 'text')
+        self.assertEqual(cache.dependencies(('content/b.md', 'de')), ('content/b.md', 'content/a.md'))
+        self.assertEqual(cache.get(('content/b.md', 'de'), (('content/b.md', 'content/a.md'), (1, 2), ())), 'text')
+        # a changed dependency drops the entry
+        self.assertIsNone(cache.get(('content/b.md', 'de'), (('content/b.md', 'content/a.md'), (1, 3), ())))
+        self.assertEqual(cache.dependencies(('content/b.md', 'de')), ())
+
+
+class ServingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with utils.working_dir(self.tmp_dir.name):
+            write_mo('locale', 'de', 'site', TRANSLATIONS)
+        hg_config = Config(HUGO_CONFIG, paths=SOURCES.keys())
+        self.files = utils.MemorySiteFiles(dict(SOURCES))
+        g = Generation({}, hg_config, make_mdi(RendererHugoL10N, hg_config), self.files)
+        self.renderer = Renderer(hg_config, g, 1024 * 1024)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_render(self):
+        with utils.working_dir(self.tmp_dir.name):
+            text = self.renderer.render('content/b.md', 'de')
+            self.assertIn('title: Willkommen', text)
+            self.assertNotIn('warning', text)
+            self.assertTrue(text.endswith('Hallo Welt\n'))
+            self.assertEqual(self.renderer.render('content/b.md', 'de'), text)
+            self.assertEqual(self.renderer.cache.lru.hits, 1)
+
+            # files that conditions depend on invalidate the cached text
+            self.files.sources['content/a.md'] = 'Untranslated\n'
+            self.assertIn('warning: true', self.renderer.render('content/b.md', 'de'))
+            self.files.sources['content/a.md'] = SOURCES['content/a.md']
+            self.assertEqual(self.renderer.render('content/b.md', 'de'), text)
+            self.files.sources['i18n/en.toml'] = '[readMore]\nother = "Read more"\n[back]\nother = "Back"\n'
+            self.assertIn('warning: true', self.renderer.render('content/b.md', 'de'))
+            self.assertEqual(self.renderer.cache.lru.hits, 1)
+
+            self.assertIsNone(self.renderer.render('content/c.md', 'de'))
+            self.assertIsNone(self.renderer.render('content/a.md', 'fr'))
+
+    def test_handler(self):
+        RenderRequestHandler.renderer = self.renderer
+        with utils.working_dir(self.tmp_dir.name), HTTPServer(('127.0.0.1', 0), RenderRequestHandler) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            url = f'http://127.0.0.1:{server.server_port}'
+            try:
+                with urlopen(f'{url}/render?path=content/a.md&lang=de') as response:
+                    self.assertEqual(response.status, 200)
+                    self.assertEqual(response.headers['Content-Type'], 'text/markdown; charset=utf-8')
+                    self.assertEqual(response.read().decode(), 'Hallo Welt\n')
+                with self.assertRaises(HTTPError) as cm:
+                    urlopen(f'{url}/render?path=content/c.md&lang=de')
+                self.assertEqual(cm.exception.code, 404)
+                cm.exception.close()
+                with self.assertRaises(HTTPError) as cm:
+                    urlopen(f'{url}/render?path=content/a.md')
+                self.assertEqual(cm.exception.code, 400)
+                cm.exception.close()
+            finally:
+                server.shutdown()
+                thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()